@@ -0,0 +1,191 @@
+import re
+import json
+import math
+import time
+from collections import Counter
+from threading import Lock
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, aliased
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import ClinicalQueryMessage, ClinicalQuerySession
+import logging
+
+logger = logging.getLogger(__name__)
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "had", "has", "have",
+    "how", "in", "is", "it", "list", "me", "of", "on", "or", "show", "that", "the", "their", "there", "to",
+    "was", "were", "what", "when", "which", "who", "with",
+}
+
+def tokenize(text: str):
+    """Lowercase word tokens; subject IDs like 02-002 and CDISC variable names stay whole"""
+    return [t for t in re.findall(r"[a-z0-9]+(?:[-_][a-z0-9]+)*", (text or "").lower()) if t not in _STOPWORDS]
+
+class FewShotIndex:
+    """
+    In-memory BM25 index over positively rated question -> SQL pairs of one project folder.
+    Documents can be added and removed one at a time as feedback changes.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}
+        self.doc_freq = Counter()
+        self.total_length = 0
+        self.loaded_at = time.monotonic()
+
+    def add(self, message_id: int, question: str, query: str):
+        self.remove(message_id)
+        terms = Counter(tokenize(question))
+        if not terms or not query:
+            return
+        self.docs[message_id] = (question, query, terms, sum(terms.values()))
+        self.doc_freq.update(terms.keys())
+        self.total_length += sum(terms.values())
+
+    def remove(self, message_id: int):
+        doc = self.docs.pop(message_id, None)
+        if doc:
+            self.doc_freq.subtract(doc[2].keys())
+            self.total_length -= doc[3]
+
+    def search(self, question: str, k: int, min_score: float = 0.0):
+        """Top-k (question, query, score), best first; identical queries are returned once"""
+        if not self.docs:
+            return []
+        terms = set(tokenize(question))
+        n = len(self.docs)
+        avg_length = self.total_length / n
+        scored = []
+        for question_text, query, doc_terms, length in self.docs.values():
+            score = 0.0
+            for term in terms:
+                tf = doc_terms.get(term)
+                if not tf:
+                    continue
+                idf = math.log(1 + (n - self.doc_freq[term] + 0.5) / (self.doc_freq[term] + 0.5))
+                score += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+            if score > min_score:
+                scored.append((score, question_text, query))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        results = []
+        seen = set()
+        for score, question_text, query in scored:
+            normalized = " ".join(query.split()).lower()
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+            results.append((question_text, query, round(score, 3)))
+            if len(results) == k:
+                break
+        return results
+
+_indexes = {}
+_indexes_lock = Lock()
+
+def _index_key(ProjectNumber: str, FolderName: str):
+    return (ProjectNumber.lower(), (FolderName or "").lower())
+
+def _pair_for(db: Session, message: ClinicalQueryMessage):
+    """The question asked for an assistant message (the group's first one) and the SQL it executed"""
+    question = (
+        db.query(ClinicalQueryMessage.Content)
+        .filter(
+            ClinicalQueryMessage.SessionId == message.SessionId,
+            ClinicalQueryMessage.QnAGroupId == message.QnAGroupId,
+            ClinicalQueryMessage.Sender == "user"
+        )
+        .order_by(ClinicalQueryMessage.Id)
+        .limit(1)
+        .scalar()
+    )
+    try:
+        query = json.loads(message.Content).get("query", "")
+    except (TypeError, ValueError, AttributeError):
+        query = ""
+    return question, query
+
+def _load_index(db: Session, ProjectNumber: str, FolderName: str) -> FewShotIndex:
+    question_msg = aliased(ClinicalQueryMessage)
+    rows = (
+        db.query(ClinicalQueryMessage.Id, ClinicalQueryMessage.Content, ClinicalQueryMessage.Metadata, question_msg.Content)
+        .join(ClinicalQuerySession, ClinicalQueryMessage.SessionId == ClinicalQuerySession.Id)
+        .join(question_msg, (question_msg.SessionId == ClinicalQueryMessage.SessionId)
+              & (question_msg.QnAGroupId == ClinicalQueryMessage.QnAGroupId)
+              & (question_msg.Sender == "user"))
+        .filter(
+            ClinicalQuerySession.ProjectNumber == ProjectNumber,
+            ClinicalQueryMessage.Sender == "assistant",
+            ClinicalQueryMessage.FeedbackType == "Positive",
+            or_(ClinicalQueryMessage.FlowType.is_(None), ClinicalQueryMessage.FlowType != "STANDARD")
+        )
+        .order_by(ClinicalQueryMessage.Id, question_msg.Id)
+        .all()
+    )
+    index = FewShotIndex()
+    seen = set()
+    for message_id, content, metadata, question in rows:
+        # A group with several user messages is indexed under its first question, as in _pair_for
+        if message_id in seen or (metadata or {}).get("FolderName", "").lower() != (FolderName or "").lower():
+            continue
+        seen.add(message_id)
+        try:
+            query = json.loads(content).get("query", "")
+        except (TypeError, ValueError, AttributeError):
+            continue
+        index.add(message_id, question, query)
+    return index
+
+def get_few_shot_index(ProjectNumber: str, FolderName: str) -> FewShotIndex:
+    """
+    Index for a project folder, built from the database on first use and rebuilt
+    after FEW_SHOT_REFRESH_SECONDS so feedback given through other workers is picked up.
+    """
+    key = _index_key(ProjectNumber, FolderName)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and time.monotonic() - index.loaded_at < settings.FEW_SHOT_REFRESH_SECONDS:
+            return index
+    db = SessionLocal()
+    try:
+        index = _load_index(db, ProjectNumber, FolderName)
+    finally:
+        db.close()
+    with _indexes_lock:
+        _indexes[key] = index
+    return index
+
+def get_few_shot_examples(ProjectNumber: str, FolderName: str, Question: str):
+    """Top FEW_SHOT_TOP_K similar rated question -> SQL pairs; empty when the index is unavailable"""
+    try:
+        index = get_few_shot_index(ProjectNumber, FolderName)
+        with _indexes_lock:
+            return index.search(Question, settings.FEW_SHOT_TOP_K, settings.FEW_SHOT_MIN_SCORE)
+    except Exception as e:
+        logger.warning(f"[WARNING] Few-shot retrieval failed for {ProjectNumber}_{FolderName}: {str(e)}")
+        return []
+
+def update_few_shot_index(db: Session, message: ClinicalQueryMessage):
+    """Apply a feedback change to the loaded index of the message's project folder"""
+    if message.Sender != "assistant" or (message.FlowType or "").upper() == "STANDARD":
+        return
+    session = db.query(ClinicalQuerySession).filter(ClinicalQuerySession.Id == message.SessionId).first()
+    if not session:
+        return
+    key = _index_key(session.ProjectNumber, (message.Metadata or {}).get("FolderName", ""))
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is None:
+        # Not loaded in this worker yet; the first retrieval builds it with this feedback included
+        return
+    if message.FeedbackType == "Positive":
+        question, query = _pair_for(db, message)
+        with _indexes_lock:
+            index.add(message.Id, question, query)
+    else:
+        with _indexes_lock:
+            index.remove(message.Id)
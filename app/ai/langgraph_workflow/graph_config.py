@@ -1,15 +1,13 @@
 import os
-from typing import Literal
+from typing import Literal, Optional
 import re
 import json
 from langgraph.graph import END, START, MessagesState, StateGraph
 from langgraph.prebuilt import ToolNode
-from langchain.chat_models import init_chat_model
 from langchain_community.utilities import SQLDatabase
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from app.core.config import settings
 from langchain_core.messages import ToolMessage, AIMessage
-from langgraph.checkpoint.redis import RedisSaver
 # from langgraph.store.redis import RedisStore
 # from langgraph.store.base import BaseStore
 
@@ -19,35 +17,38 @@ import time
 from app.ai.prompts.generate_query import get_prompt as get_generate_query_prompt
 from app.ai.prompts.check_query import get_prompt as get_check_query_prompt
 from app.ai.prompts.summary_query import get_prompts as get_summary_prompt
+from app.ai.langgraph_workflow.graph_memory import compact_memory, get_checkpointer
+from app.services.dataset_version import get_dataset_version
+from app.services.result_cache import run_cached
+from app.standard_query.sql_runner import RowCountingSQLDatabase
+from app.ai.llm_gateway import invoke_llm
+from app.ai.llm_clients import get_chat_model
+from app.ai.langgraph_workflow.sql_validator import validate_sql, get_schema_catalog, VALIDATION_FAILED_PREFIX
+from app.services.value_index import find_value_index, build_value_index_in_background
 load_dotenv()
 
 is_redis = settings.REDIS_CONFIG
-def build_agent(ProjectNumber: str, FolderName: str, LlmType: str, ModelName: str, Type: str):
+
+def build_agent(ProjectNumber: str, FolderName: str, LlmType: str, ModelName: str, Type: str, cached_query: Optional[str] = None, node_models: Optional[dict] = None, few_shot_examples: Optional[list] = None, db: Optional[SQLDatabase] = None, llm=None):
+    # db and llm can be supplied to run the graph against another database or chat model (benchmarks)
     schema = f"{ProjectNumber}_{FolderName}"
     sql_server_conn_str = settings.DATABASE_URL_FILES
     start_time = time.time()
-    db = SQLDatabase.from_uri(sql_server_conn_str, schema=schema, sample_rows_in_table_info=0)
+    if db is None:
+        db = RowCountingSQLDatabase.from_uri(sql_server_conn_str, schema=schema, sample_rows_in_table_info=0)
     # print("⏱️ SQLDatabase init took", time.time() - start_time, "seconds")
-    # 🧠 Decide LLM config based on LlmType
-    if LlmType == "Azure OpenAI":
-        deployment_name = ModelName
-        model_provider = "azure_openai"
-    elif LlmType == "OpenAI":
-        deployment_name = ModelName  # or your preferred OpenAI model
-        model_provider = "openai"
-    else:
-        raise ValueError(f"Unsupported LLM type: {LlmType}")
-    
-    api_key = settings.AZURE_OPENAI_API_KEY
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY not found in .env")
-
-    llm = init_chat_model(
-        deployment_name,
-        model_provider=model_provider,
-        temperature=0,
-        api_key=api_key,
-    )
+    chat_model = llm
+    if llm is None:
+        llm = get_chat_model(LlmType, ModelName)
+    # Per-node routing: cheap nodes can run on a smaller deployment than generate_query
+    node_models = node_models or {}
+
+    def llm_for(node: str):
+        node_llm_type, node_model_name = node_models.get(node, (LlmType, ModelName))
+        if chat_model is not None:
+            return chat_model, node_model_name
+        return get_chat_model(node_llm_type, node_model_name), node_model_name
+
     # print("✅ LLM initialized with:", LlmType)
     toolkit = SQLDatabaseToolkit(db=db, llm=llm)
     tools = toolkit.get_tools()
@@ -80,13 +81,28 @@ def build_agent(ProjectNumber: str, FolderName: str, LlmType: str, ModelName: st
         return {"messages": [tool_call_message, tool_message]}
 
 
+    # Replay SQL from the question cache, skipping table selection and query generation
+    def use_cached_query(state: MessagesState):
+        print("use_cached_query....................")
+        tool_call = {
+            "name": "sql_db_query",
+            "args": {"query": cached_query},
+            "id": f"cached_{int(time.time() * 1000)}",
+            "type": "tool_call",
+        }
+        return {"messages": [AIMessage(content="", tool_calls=[tool_call])]}
+
+    def route_start(state: MessagesState) -> Literal["use_cached_query", "list_tables"]:
+        return "use_cached_query" if cached_query else "list_tables"
+
     # Example: force a model to create a tool call
     def call_get_schema(state: MessagesState):
         print("call_get_schema....................")
         # Note that LangChain enforces that all models accept `tool_choice="any"`
         # as well as `tool_choice=<string name of tool>`.
-        llm_with_tools = llm.bind_tools([get_schema_tool])
-        response = llm_with_tools.invoke(state["messages"])
+        node_llm, node_deployment = llm_for("call_get_schema")
+        llm_with_tools = node_llm.bind_tools([get_schema_tool])
+        response = invoke_llm(llm_with_tools, state["messages"], node_deployment, node="call_get_schema")
         sanitized_response = AIMessage(
             content=response.content or "",  # Ensure content is not None
             tool_calls=response.tool_calls
@@ -95,15 +111,28 @@ def build_agent(ProjectNumber: str, FolderName: str, LlmType: str, ModelName: st
 
     def generate_query(state: MessagesState):
         print("Generate query....................")
-        generate_query_system_prompt=get_generate_query_prompt(db.dialect,schema)
+        question = next((msg.content for msg in reversed(state["messages"]) if msg.type == "human"), "")
+        value_hints = []
+        try:
+            # Never scan the schema on the request path: without a built index the query goes out without hints
+            dataset_version = get_dataset_version(ProjectNumber, FolderName)
+            value_index = find_value_index(schema, dataset_version)
+            if value_index is None:
+                build_value_index_in_background(db._engine, schema, dataset_version)
+            else:
+                value_hints = value_index.resolve(question, settings.VALUE_INDEX_MAX_HINTS, settings.VALUE_INDEX_MIN_SIMILARITY)
+        except Exception as e:
+            print("Value index unavailable:", str(e))
+        generate_query_system_prompt=get_generate_query_prompt(db.dialect,schema,few_shot_examples,value_hints)
         system_message = {
             "role": "system",
             "content": generate_query_system_prompt,
         }
         # We do not force a tool call here, to allow the model to
         # respond naturally when it obtains the solution.
-        llm_with_tools = llm.bind_tools([run_query_tool])
-        response = llm_with_tools.invoke([system_message] + state["messages"])
+        node_llm, node_deployment = llm_for("generate_query")
+        llm_with_tools = node_llm.bind_tools([run_query_tool])
+        response = invoke_llm(llm_with_tools, [system_message] + state["messages"], node_deployment, node="generate_query")
         sanitized_response = AIMessage(
             content=response.content or "",  # Ensure content is not None
             tool_calls=response.tool_calls
@@ -121,8 +150,9 @@ def build_agent(ProjectNumber: str, FolderName: str, LlmType: str, ModelName: st
         # Generate an artificial user message to check
         tool_call = state["messages"][-1].tool_calls[0]
         user_message = {"role": "user", "content": tool_call["args"]["query"]}
-        llm_with_tools = llm.bind_tools([run_query_tool])
-        response = llm_with_tools.invoke([system_message, user_message])
+        node_llm, node_deployment = llm_for("check_query")
+        llm_with_tools = node_llm.bind_tools([run_query_tool])
+        response = invoke_llm(llm_with_tools, [system_message, user_message], node_deployment, node="check_query")
         response.id = state["messages"][-1].id
 
         return {"messages": [response]}
@@ -140,6 +170,59 @@ def build_agent(ProjectNumber: str, FolderName: str, LlmType: str, ModelName: st
             return "execute_query"
         # Otherwise, we're ready to wrap the results
         return "wrap_tooltips"
+    # Validate generated SQL locally; invalid SQL goes back to generate_query with the errors
+    def validate_query(state: MessagesState):
+        print("validate_query....................")
+        last_message = state["messages"][-1]
+        tool_call = next((tc for tc in last_message.tool_calls if tc["name"] == "sql_db_query"), None)
+        if tool_call is None:
+            return {"messages": []}
+
+        try:
+            catalog = get_schema_catalog(db, schema, get_dataset_version(ProjectNumber, FolderName))
+            result = validate_sql(tool_call["args"].get("query", ""), schema, catalog, settings.SQL_MAX_ROWS)
+        except Exception as e:
+            # Never block execution because the validator itself failed
+            print("SQL validation skipped:", str(e))
+            return {"messages": []}
+
+        if result.ok:
+            if result.query == tool_call["args"].get("query"):
+                return {"messages": []}
+            # Same message id, so the checkpointed tool call is replaced with the limited query
+            updated_calls = [
+                {**tc, "args": {**tc["args"], "query": result.query}} if tc["id"] == tool_call["id"] else tc
+                for tc in last_message.tool_calls
+            ]
+            return {"messages": [AIMessage(content=last_message.content, tool_calls=updated_calls, id=last_message.id)]}
+
+        # Count earlier rejections in this turn; after the limit the query is sent as-is
+        failures = 0
+        for msg in reversed(state["messages"]):
+            if msg.type == "human":
+                break
+            if isinstance(msg, ToolMessage) and str(msg.content).startswith(VALIDATION_FAILED_PREFIX):
+                failures += 1
+        if failures >= settings.SQL_VALIDATION_MAX_ATTEMPTS:
+            print("SQL validation attempts exhausted, executing query")
+            return {"messages": []}
+
+        print("SQL validation failed:", result.errors)
+        # Every tool call needs a response before the model is called again
+        return {
+            "messages": [
+                ToolMessage(
+                    content=result.message() if tc["id"] == tool_call["id"] else "Not executed.",
+                    name=tc["name"],
+                    tool_call_id=tc["id"]
+                )
+                for tc in last_message.tool_calls
+            ]
+        }
+
+    def route_after_validation(state: MessagesState) -> Literal["execute_query", "generate_query"]:
+        return "generate_query" if isinstance(state["messages"][-1], ToolMessage) else "execute_query"
+
     # Create a combined execute node
     def execute_query(state: MessagesState):
         print("execute_query....................")
@@ -168,7 +251,7 @@ def build_agent(ProjectNumber: str, FolderName: str, LlmType: str, ModelName: st
         
         try:
             # Execute the query
-            result = db.run_no_throw(query, fetch='all', include_columns=True)
+            result = run_cached(db, schema, get_dataset_version(ProjectNumber, FolderName), query, fetch='all', include_columns=True)
             print("Query result:", result)
             # Check if result is an error string
             if isinstance(result, str) and result.lower().startswith("error"):
@@ -283,7 +366,8 @@ def build_agent(ProjectNumber: str, FolderName: str, LlmType: str, ModelName: st
             state["messages"].clear()
             filtered_messages = truncate_tool_messages(copied_messages)
             try:
-                llm_response = llm.invoke(summary_prompt)
+                node_llm, node_deployment = llm_for("wrap_tooltips")
+                llm_response = invoke_llm(node_llm, summary_prompt, node_deployment, node="wrap_tooltips")
                 return {"messages": filtered_messages + [AIMessage(content=llm_response.content)]}
             except Exception as e:
                 error_msg = f"Error generating narrative: {str(e)}"
@@ -291,40 +375,50 @@ def build_agent(ProjectNumber: str, FolderName: str, LlmType: str, ModelName: st
 
     # Update graph builder
     builder = StateGraph(MessagesState)
+    builder.add_node("compact_memory", compact_memory)
+    builder.add_node("use_cached_query", use_cached_query)
     builder.add_node("list_tables", list_tables)
     builder.add_node("call_get_schema", call_get_schema)
     builder.add_node("get_schema", get_schema_node)
     builder.add_node("generate_query", generate_query)
     builder.add_node("check_query", check_query)
+    builder.add_node("validate_query", validate_query)
     builder.add_node("execute_query", execute_query)  # Combined execution node
     builder.add_node("wrap_tooltips", wrap_tooltips)
 
     # Define graph edges
-    builder.add_edge(START, "list_tables")
+    builder.add_edge(START, "compact_memory")
+    builder.add_edge("use_cached_query", "execute_query")
     builder.add_edge("list_tables", "call_get_schema")
     builder.add_edge("call_get_schema", "get_schema")
     builder.add_edge("get_schema", "generate_query")
-    builder.add_edge("check_query", "execute_query")
     builder.add_edge("execute_query", "wrap_tooltips")
     builder.add_edge("wrap_tooltips", END)
 
     # Conditional edges
+    builder.add_conditional_edges(
+        "compact_memory",
+        route_start,
+        {"use_cached_query": "use_cached_query", "list_tables": "list_tables"}
+    )
     builder.add_conditional_edges(
         "generate_query",
         should_continue,
-        {"execute_query": "execute_query", "wrap_tooltips": "wrap_tooltips"}
+        {"execute_query": "validate_query", "wrap_tooltips": "wrap_tooltips"}
     )
     builder.add_conditional_edges(
         "check_query",
         should_continue,
-        {"execute_query": "execute_query", "wrap_tooltips": "wrap_tooltips"}
+        {"execute_query": "validate_query", "wrap_tooltips": "wrap_tooltips"}
+    )
+    builder.add_conditional_edges(
+        "validate_query",
+        route_after_validation,
+        {"execute_query": "execute_query", "generate_query": "generate_query"}
     )
     if is_redis:
         print(f"RUNNING REDIS")
-        redis_url = settings.REDIS_URL
-        with RedisSaver.from_conn_string(redis_url) as saver:
-            saver.setup()
-            return builder.compile(checkpointer=saver)
+        return builder.compile(checkpointer=get_checkpointer())
 
         
     else:
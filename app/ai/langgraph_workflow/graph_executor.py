@@ -1,27 +1,77 @@
 from app.ai.langgraph_workflow.graph_config import build_agent
+from app.ai.langgraph_workflow.graph_memory import record_session_metrics, thread_has_history
+from app.ai.langgraph_workflow.sql_cache import get_cached_sql, put_cached_sql
+from app.services.dataset_version import get_dataset_version
+from app.ai.llm_gateway import collect_node_metrics
+from app.ai.langgraph_workflow.few_shot import get_few_shot_examples
+from app.ai.langgraph_workflow.graph_metrics import NodeTimer
+from app.services.result_cache import collect_query_metrics
+from app.services.query_metrics import build_run_metrics
 import json
+import time
 from bs4 import BeautifulSoup
 from app.core.config import settings
 is_redis = settings.REDIS_CONFIG
-def run_agent(ProjectNumber: str, FolderName: str, Question: str, LlmType: str, ModelName: str,SessionId:int,Type: str):
+def _executed_query_succeeded(messages) -> bool:
+    """Check the SQL tool result of the current turn only"""
+    for msg in reversed(messages):
+        if msg.type == "human":
+            return False
+        if msg.type == "tool" and msg.name == "sql_db_query":
+            content = str(msg.content)
+            return not (content.startswith("Query execution failed") or content.startswith("No valid SQL query"))
+    return False
+
+def run_agent(ProjectNumber: str, FolderName: str, Question: str, LlmType: str, ModelName: str,SessionId:int,Type: str, node_models: dict = None):
+    """
+    Run the AI graph for one question.
+
+    node_models optionally routes individual graph nodes to other models (see llm_routing).
+    Returns the JSON answer and a dict of run details (SQL cache outcome, per-node
+    timings, tokens and SQL execution metrics) for the message Metadata.
+    """
     print(f"Running agent for project: {ProjectNumber}, folder: {FolderName}, question: {Question}, SessionId: {SessionId}")
-    
-    agent = build_agent(ProjectNumber, FolderName, LlmType, ModelName, Type)
+    schema = f"{ProjectNumber}_{FolderName}"
+    run_info = {"SqlCache": "bypass"}
+
+    # Follow-up questions depend on the conversation, so only standalone questions use the SQL cache
+    cached_query = None
+    dataset_version = None
+    use_sql_cache = not (is_redis and thread_has_history(str(SessionId)))
+    if use_sql_cache:
+        dataset_version = get_dataset_version(ProjectNumber, FolderName)
+        # The SQL comes from generate_query, so key the cache on the model that node runs on
+        query_llm_type, query_model_name = (node_models or {}).get("generate_query", (LlmType, ModelName))
+        cached_query = get_cached_sql(schema, dataset_version, Question, query_llm_type, query_model_name, Type)
+        run_info["SqlCache"] = "hit" if cached_query else "miss"
+
+    # Similar rated question -> SQL pairs for the generate_query prompt
+    few_shot_examples = None
+    if not cached_query:
+        few_shot_examples = get_few_shot_examples(ProjectNumber, FolderName, Question)
+        run_info["FewShotExamples"] = len(few_shot_examples)
+
+    agent = build_agent(ProjectNumber, FolderName, LlmType, ModelName, Type, cached_query=cached_query, node_models=node_models, few_shot_examples=few_shot_examples)
 
     config = {"configurable": {"thread_id": str(SessionId)}} if is_redis else {}
     final_result = None
     json_output = {}
+    timer = NodeTimer()
+    start = time.perf_counter()
     try:
-        final_result = agent.invoke(
-            {"messages": [{"role": "user", "content": Question}]},
-            config=config
-        )
+        with collect_node_metrics() as node_metrics, collect_query_metrics() as queries:
+            final_result = agent.invoke(
+                {"messages": [{"role": "user", "content": Question}]},
+                config={**config, "callbacks": [timer]}
+            )
     except Exception as e:
         print(f"❌ Error invoking agent: {e}")
         json_output["summary"] = f"Error: {str(e)}"
         json_output["readable_summary"] = f"Error: {str(e)}"
         json_output["query"] = ""
     else:
+        if is_redis:
+            record_session_metrics(str(SessionId), final_result['messages'])
         # Extract required information from agent output
         last_ai_content = ""
         last_query = ""
@@ -41,6 +91,8 @@ def run_agent(ProjectNumber: str, FolderName: str, Question: str, LlmType: str,
 
         json_output["summary"] = last_ai_content
         json_output["query"] = last_query
+        if use_sql_cache and not cached_query and last_query and _executed_query_succeeded(final_result['messages']):
+            put_cached_sql(schema, dataset_version, Question, query_llm_type, query_model_name, Type, last_query)
         # For Log 
         if Type == "Summary":
             soup = BeautifulSoup(last_ai_content, "html.parser")
@@ -55,5 +107,6 @@ def run_agent(ProjectNumber: str, FolderName: str, Question: str, LlmType: str,
             json_output["readable_summary"] = "Table"
             
             
+    run_info["Metrics"] = build_run_metrics((time.perf_counter() - start) * 1000, timer.summary(), node_metrics, queries)
     # print(f"pretty_print:{final_result}")
-    return json.dumps(json_output, indent=2)
\ No newline at end of file
+    return json.dumps(json_output, indent=2), run_info
\ No newline at end of file
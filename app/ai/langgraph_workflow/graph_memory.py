@@ -0,0 +1,207 @@
+import re
+import json
+import time
+from threading import Lock
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, RemoveMessage
+from langgraph.graph import MessagesState, StateGraph, START, END
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from langgraph.checkpoint.redis import RedisSaver
+from app.core.config import settings
+from app.utils.redis_client import get_redis_client
+
+MEMORY_SUMMARY_ID = "conversation_memory_summary"
+SESSION_METRICS_PREFIX = "session_metrics"
+TRUNCATED_TOOL_LENGTH = 200
+
+_checkpointer = None
+_checkpointer_lock = Lock()
+
+def get_checkpointer():
+    """
+    Return the process-wide Redis checkpointer.
+
+    Checkpoint keys are written with a TTL (CHECKPOINT_TTL_MINUTES) that is
+    refreshed whenever the thread is read, so idle sessions expire on their own.
+    """
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            saver = RedisSaver(
+                redis_url=settings.REDIS_URL,
+                ttl={
+                    "default_ttl": settings.CHECKPOINT_TTL_MINUTES,
+                    "refresh_on_read": True,
+                },
+            )
+            saver.setup()
+            _checkpointer = saver
+    return _checkpointer
+
+def thread_has_history(thread_id: str) -> bool:
+    """True when the checkpointed thread already holds messages from earlier turns"""
+    checkpoint = get_checkpointer().get_tuple({"configurable": {"thread_id": thread_id}})
+    return bool(checkpoint and checkpoint.checkpoint.get("channel_values", {}).get("messages"))
+
+def _message_size(msg) -> int:
+    """Approximate serialized size of a message in bytes"""
+    content = msg.content if isinstance(msg.content, str) else json.dumps(msg.content, default=str)
+    size = len(content.encode("utf-8"))
+    tool_calls = getattr(msg, "tool_calls", None)
+    if tool_calls:
+        size += len(json.dumps(tool_calls, default=str).encode("utf-8"))
+    return size
+
+def estimate_tokens(messages) -> int:
+    """Rough token estimate (~4 bytes per token) used for session metrics"""
+    return sum(_message_size(m) for m in messages) // 4
+
+def _split_turns(messages):
+    """Split messages into the existing summary and a list of turns, each starting with a user message"""
+    summary = None
+    turns = []
+    for msg in messages:
+        if msg.id == MEMORY_SUMMARY_ID:
+            summary = msg
+            continue
+        if isinstance(msg, HumanMessage) or not turns:
+            turns.append([msg])
+        else:
+            turns[-1].append(msg)
+    return summary, turns
+
+def _plain_text(content: str, limit: int) -> str:
+    text = re.sub(r'<span class="display-none">.*?</span>', "", str(content))
+    text = re.sub(r'<div class="tooltiptext">.*?</div>', "", text)
+    text = re.sub(r"<[^>]+>", "", text)
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+def _summarize_turn(turn) -> str:
+    """Compact one turn into a single line: question, SQL used and final answer"""
+    question = ""
+    query = ""
+    answer = ""
+    for msg in turn:
+        if isinstance(msg, HumanMessage) and not question:
+            question = _plain_text(msg.content, 300)
+        elif isinstance(msg, AIMessage):
+            for tool_call in msg.tool_calls or []:
+                if tool_call["name"] == "sql_db_query":
+                    query = " ".join(str(tool_call["args"].get("query", "")).split())
+            if msg.content and not msg.tool_calls:
+                answer = _plain_text(msg.content, 300)
+    parts = [f"Q: {question}"]
+    if query:
+        parts.append(f"SQL: {query}")
+    if answer:
+        parts.append(f"A: {answer}")
+    return " | ".join(parts)
+
+def _truncate_tool_messages(turn):
+    truncated = []
+    for msg in turn:
+        if isinstance(msg, ToolMessage) and isinstance(msg.content, str) and len(msg.content) > TRUNCATED_TOOL_LENGTH:
+            msg = msg.model_copy(update={"content": msg.content[:TRUNCATED_TOOL_LENGTH] + "..."})
+        truncated.append(msg)
+    return truncated
+
+def compact_messages(messages, window_turns: int, max_bytes: int, summary_max_chars: int):
+    """
+    Bound the conversation kept in a checkpoint.
+
+    Keeps the last `window_turns` turns verbatim and folds everything older into a
+    running summary message. If the kept turns still exceed `max_bytes`, tool
+    results of older kept turns are truncated and, if needed, whole turns are
+    folded into the summary as well. The latest turn is never touched.
+
+    Returns the replacement message list, or None when nothing has to change.
+    """
+    summary, turns = _split_turns(messages)
+    window_turns = max(window_turns, 1)
+    total_size = sum(_message_size(m) for m in messages)
+    if len(turns) <= window_turns and total_size <= max_bytes:
+        return None
+
+    old_turns = turns[:-window_turns]
+    kept_turns = turns[-window_turns:]
+
+    def kept_size():
+        return sum(_message_size(m) for turn in kept_turns for m in turn)
+
+    if kept_size() > max_bytes:
+        kept_turns = [_truncate_tool_messages(turn) for turn in kept_turns[:-1]] + [kept_turns[-1]]
+    while kept_size() > max_bytes and len(kept_turns) > 1:
+        old_turns.append(kept_turns.pop(0))
+
+    lines = summary.content.splitlines()[1:] if summary else []
+    lines.extend(_summarize_turn(turn) for turn in old_turns)
+    # Drop the oldest lines first when the summary itself grows past its budget
+    while lines and sum(len(line) + 1 for line in lines) > summary_max_chars:
+        lines.pop(0)
+
+    compacted = [RemoveMessage(id=REMOVE_ALL_MESSAGES)]
+    if lines:
+        compacted.append(SystemMessage(
+            content="Summary of earlier questions in this conversation:\n" + "\n".join(lines),
+            id=MEMORY_SUMMARY_ID,
+        ))
+    compacted.extend(m for turn in kept_turns for m in turn)
+    return compacted
+
+def compact_memory(state: MessagesState):
+    """Graph node: compact the checkpointed thread before the new turn is processed"""
+    compacted = compact_messages(
+        state["messages"],
+        settings.MEMORY_WINDOW_TURNS,
+        settings.MEMORY_MAX_CHECKPOINT_BYTES,
+        settings.MEMORY_SUMMARY_MAX_CHARS,
+    )
+    if compacted is None:
+        return {"messages": []}
+    print("compact_memory....................")
+    return {"messages": compacted}
+
+def record_turn(thread_id: str, question: str, answer: str):
+    """
+    Append a question/answer pair to a checkpointed thread without running the agent.
+
+    Used when a request was served from another caller's in-flight result, so the
+    session still has the turn for follow-up questions.
+    """
+    builder = StateGraph(MessagesState)
+    builder.add_node("compact_memory", compact_memory)
+    builder.add_edge(START, "compact_memory")
+    builder.add_edge("compact_memory", END)
+    graph = builder.compile(checkpointer=get_checkpointer())
+    result = graph.invoke(
+        {"messages": [HumanMessage(content=question), AIMessage(content=answer)]},
+        config={"configurable": {"thread_id": thread_id}}
+    )
+    return result["messages"]
+
+def record_session_metrics(thread_id: str, messages):
+    """Store per-session size metrics for the thread alongside its checkpoints"""
+    summary, turns = _split_turns(messages)
+    metrics = {
+        "message_count": len(messages),
+        "turns_in_window": len(turns),
+        "has_summary": int(summary is not None),
+        "checkpoint_bytes": sum(_message_size(m) for m in messages),
+        "estimated_tokens": estimate_tokens(messages),
+        "updated_at": int(time.time()),
+    }
+    try:
+        r = get_redis_client()
+        key = f"{SESSION_METRICS_PREFIX}:{thread_id}"
+        pipe = r.pipeline()
+        pipe.hset(key, mapping=metrics)
+        pipe.hincrby(key, "invocations", 1)
+        pipe.expire(key, settings.CHECKPOINT_TTL_MINUTES * 60)
+        pipe.execute()
+    except Exception as e:
+        print(f"Failed to record session metrics for {thread_id}: {e}")
+    return metrics
+
+def get_session_metrics(thread_id: str) -> dict:
+    r = get_redis_client()
+    return r.hgetall(f"{SESSION_METRICS_PREFIX}:{thread_id}")
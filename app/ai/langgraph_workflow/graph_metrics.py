@@ -0,0 +1,50 @@
+import time
+from threading import Lock
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class NodeTimer(BaseCallbackHandler):
+    """
+    Callback handler that records wall-clock time per LangGraph node.
+
+    Pass it in the invoke config: agent.invoke(inputs, config={"callbacks": [timer]}).
+    Only the node runs themselves are timed, not the runnables nested inside
+    them, so times add up to the graph's total. A node that runs several times
+    in one turn (e.g. generate_query after a rejected query) is summed.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self._started = {}
+        self._lock = Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            with self._lock:
+                self._started[run_id] = (node, time.perf_counter())
+
+    def record(self, node: str, ms: float):
+        """Add a timed step that does not run as a graph node"""
+        with self._lock:
+            entry = self.timings.setdefault(node, {"runs": 0, "ms": 0.0})
+            entry["runs"] += 1
+            entry["ms"] += ms
+
+    def _finish(self, run_id):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is not None:
+            node, start = started
+            self.record(node, (time.perf_counter() - start) * 1000)
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, parent_run_id=None, **kwargs):
+        self._finish(run_id)
+
+    def summary(self) -> dict:
+        """Per-node runs and milliseconds, rounded for reporting"""
+        with self._lock:
+            return {node: {"runs": entry["runs"], "ms": round(entry["ms"], 2)} for node, entry in self.timings.items()}
@@ -0,0 +1,55 @@
+import re
+import hashlib
+import unicodedata
+from typing import Optional
+from app.core.config import settings
+from app.utils.local_cache import LocalTTLCache
+from app.utils.redis_client import get_redis_client
+
+SQL_CACHE_PREFIX = "sqlcache"
+
+_local_cache = LocalTTLCache(max_entries=settings.SQL_CACHE_LOCAL_ENTRIES, ttl_seconds=settings.SQL_CACHE_TTL_SECONDS)
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question so trivially different phrasings share a cache entry:
+    unicode/quote folding, case folding, whitespace collapsing and trailing punctuation.
+    Subject IDs, numbers and hyphenated terms are left intact.
+    """
+    text = unicodedata.normalize("NFKC", question or "")
+    text = text.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
+    text = text.casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    text = re.sub(r"[\s?.!;,]+$", "", text)
+    return text
+
+def _cache_key(schema: str, dataset_version: str, question: str, LlmType: str, ModelName: str, ViewType: str) -> str:
+    raw = "|".join([schema.lower(), LlmType, ModelName, ViewType, normalize_question(question)])
+    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    return f"{SQL_CACHE_PREFIX}:{schema.lower()}:{dataset_version}:{digest}"
+
+def get_cached_sql(schema: str, dataset_version: str, question: str, LlmType: str, ModelName: str, ViewType: str) -> Optional[str]:
+    """Look up previously generated SQL, checking the in-process tier before Redis"""
+    key = _cache_key(schema, dataset_version, question, LlmType, ModelName, ViewType)
+    query = _local_cache.get(key)
+    if query is not None:
+        return query
+    if settings.REDIS_CONFIG:
+        try:
+            query = get_redis_client().get(key)
+        except Exception as e:
+            print(f"SQL cache lookup failed: {e}")
+            return None
+        if query:
+            _local_cache.set(key, query)
+            return query
+    return None
+
+def put_cached_sql(schema: str, dataset_version: str, question: str, LlmType: str, ModelName: str, ViewType: str, query: str) -> None:
+    key = _cache_key(schema, dataset_version, question, LlmType, ModelName, ViewType)
+    _local_cache.set(key, query)
+    if settings.REDIS_CONFIG:
+        try:
+            get_redis_client().set(key, query, ex=settings.SQL_CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"SQL cache write failed: {e}")
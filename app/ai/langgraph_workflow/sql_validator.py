@@ -0,0 +1,141 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError
+from sqlalchemy import inspect
+from app.utils.local_cache import LocalTTLCache
+
+VALIDATION_FAILED_PREFIX = "Query validation failed"
+
+# Statement types that must never reach the database from the AI flow
+_FORBIDDEN = tuple(
+    getattr(exp, name) for name in (
+        "Insert", "Update", "Delete", "Merge", "Drop", "Create", "Alter", "AlterTable",
+        "TruncateTable", "Command", "Grant", "Set", "Use", "Transaction", "Commit", "Rollback",
+    ) if hasattr(exp, name)
+)
+
+_catalog_cache = LocalTTLCache(max_entries=256, ttl_seconds=3600)
+
+@dataclass
+class ValidationResult:
+    ok: bool
+    query: str
+    errors: List[str] = field(default_factory=list)
+
+    def message(self) -> str:
+        return f"{VALIDATION_FAILED_PREFIX}:\n" + "\n".join(f"- {error}" for error in self.errors)
+
+class SchemaCatalog:
+    """Table names of a schema plus lazily loaded, cached column names per table"""
+
+    def __init__(self, tables: Iterable[str], load_columns: Callable[[str], Iterable[str]]):
+        self.tables = {table.lower(): table for table in tables}
+        self._load_columns = load_columns
+        self._columns = {}
+
+    def has_table(self, table: str) -> bool:
+        return table.lower() in self.tables
+
+    def columns(self, table: str) -> set:
+        key = table.lower()
+        if key not in self._columns:
+            self._columns[key] = {column.lower() for column in self._load_columns(self.tables[key])}
+        return self._columns[key]
+
+def get_schema_catalog(db, schema: str, dataset_version: str) -> SchemaCatalog:
+    """Catalog for the project schema, shared per dataset version so re-ingested tables are re-read"""
+    key = f"{schema.lower()}:{dataset_version}"
+    catalog = _catalog_cache.get(key)
+    if catalog is None:
+        inspector = inspect(db._engine)
+        catalog = SchemaCatalog(
+            db.get_usable_table_names(),
+            lambda table: [column["name"] for column in inspector.get_columns(table, schema=schema)],
+        )
+        _catalog_cache.set(key, catalog)
+    return catalog
+
+def _parse_errors(error: ParseError) -> List[str]:
+    errors = []
+    for detail in error.errors[:3]:
+        location = f" (line {detail.get('line')}, column {detail.get('col')})" if detail.get("line") else ""
+        description = re.sub(r"<Token token_type: [^,]+, text: ([^,]*),.*?>", r"'\1'", str(detail.get("description")))
+        errors.append(f"Syntax error{location}: {description}")
+    return errors or [f"Syntax error: {error}"]
+
+def _available(columns: set, limit: int = 40) -> str:
+    names = sorted(columns)
+    return ", ".join(names[:limit]) + (", ..." if len(names) > limit else "")
+
+def _inject_top(query: str, max_rows: int) -> str:
+    return re.sub(r"^\s*SELECT\s+(DISTINCT\s+)?", lambda m: f"SELECT {m.group(1) or ''}TOP {max_rows} ", query, count=1, flags=re.IGNORECASE)
+
+def validate_sql(query: str, schema: str, catalog: SchemaCatalog, max_rows: Optional[int] = None) -> ValidationResult:
+    """
+    Check generated T-SQL locally before it is sent to the database.
+
+    Rejects anything that is not a single read-only query, tables outside the
+    project schema or missing from it, and columns that do not exist on the
+    table they are qualified with (or on any referenced table, when unqualified).
+    Checks are skipped where they cannot be decided locally (CTEs, derived
+    tables), so a valid query is never rejected. A TOP limit is added to plain
+    SELECTs that have none.
+    """
+    try:
+        statements = [s for s in sqlglot.parse(query, read="tsql") if s is not None]
+    except ParseError as e:
+        return ValidationResult(False, query, _parse_errors(e))
+
+    if len(statements) != 1:
+        return ValidationResult(False, query, ["Exactly one SELECT statement must be generated per query."])
+    statement = statements[0]
+    if not isinstance(statement, exp.Query) or any(isinstance(node, _FORBIDDEN) for node in statement.walk()):
+        return ValidationResult(False, query, ["Only read-only SELECT queries are allowed; DML/DDL statements are rejected."])
+
+    errors = []
+    cte_names = {cte.alias_or_name.lower() for cte in statement.find_all(exp.CTE)}
+    has_derived_sources = bool(cte_names) or any(isinstance(node.this, exp.Subquery) for node in statement.find_all(exp.From, exp.Join))
+
+    # alias or table name -> real table name
+    sources = {}
+    for table in statement.find_all(exp.Table):
+        name = table.name
+        if not name or name.lower() in cte_names:
+            continue
+        if table.db and table.db.lower() != schema.lower():
+            errors.append(f"Table '{table.db}.{name}' is outside the project schema; use {schema}.{name}.")
+            continue
+        if not catalog.has_table(name):
+            errors.append(f"Unknown table '{name}' in schema {schema}. Available tables: {_available(set(catalog.tables.values()))}")
+            continue
+        sources[table.alias_or_name.lower()] = name
+        sources[name.lower()] = name
+
+    select_aliases = {alias.alias.lower() for alias in statement.find_all(exp.Alias)}
+    referenced = set(sources.values())
+    for column in statement.find_all(exp.Column):
+        name = column.name
+        if not name or column.is_star:
+            continue
+        qualifier = column.table.lower() if column.table else ""
+        if qualifier:
+            table = sources.get(qualifier)
+            if table and name.lower() not in catalog.columns(table):
+                errors.append(f"Unknown column '{name}' in table {table}. Available columns: {_available(catalog.columns(table))}")
+        elif not has_derived_sources and referenced and name.lower() not in select_aliases:
+            if not any(name.lower() in catalog.columns(table) for table in referenced):
+                errors.append(f"Unknown column '{name}' in {', '.join(sorted(referenced))}.")
+
+    if errors:
+        return ValidationResult(False, query, list(dict.fromkeys(errors)))
+
+    if max_rows and isinstance(statement, exp.Select) and not any(statement.args.get(arg) for arg in ("limit", "fetch", "offset")):
+        single_row_aggregate = not statement.args.get("group") and any(
+            isinstance(projection.unalias(), exp.AggFunc) for projection in statement.expressions
+        )
+        if not single_row_aggregate:
+            query = _inject_top(query, max_rows)
+    return ValidationResult(True, query)
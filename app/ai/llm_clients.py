@@ -0,0 +1,86 @@
+from threading import Lock
+import httpx
+from langchain.chat_models import init_chat_model
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Map the LLMProvider names used across the app to langchain model providers
+MODEL_PROVIDERS = {
+    "Azure OpenAI": "azure_openai",
+    "OpenAI": "openai",
+}
+
+_models = {}
+_models_lock = Lock()
+_http_client = None
+_http_async_client = None
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("[WARNING] h2 is not installed, LLM clients fall back to HTTP/1.1 keep-alive")
+        return False
+
+def _http_clients():
+    """Shared HTTP clients (one sync, one async) used by every chat model"""
+    global _http_client, _http_async_client
+    if _http_client is None:
+        http2 = _http2_available()
+        limits = httpx.Limits(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_SECONDS,
+        )
+        timeout = httpx.Timeout(settings.LLM_HTTP_TIMEOUT_SECONDS, connect=10.0)
+        _http_client = httpx.Client(http2=http2, limits=limits, timeout=timeout)
+        _http_async_client = httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout)
+    return _http_client, _http_async_client
+
+def get_chat_model(LlmType: str, ModelName: str, temperature: float = 0):
+    """
+    Return the process-wide chat model for (provider, deployment, temperature).
+
+    Models are created once and share pooled HTTP/2 keep-alive connections, so
+    requests no longer pay a TLS handshake per question. Chat models hold no
+    per-call state, so the same instance is safe to use from the threadpool and
+    from async code (ainvoke uses the shared AsyncClient).
+    """
+    model_provider = MODEL_PROVIDERS.get(LlmType)
+    if model_provider is None:
+        raise ValueError(f"Unsupported LLM type: {LlmType}")
+
+    key = (model_provider, ModelName, temperature)
+    with _models_lock:
+        llm = _models.get(key)
+        if llm is None:
+            api_key = settings.AZURE_OPENAI_API_KEY
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY not found in .env")
+            http_client, http_async_client = _http_clients()
+            llm = init_chat_model(
+                ModelName,
+                model_provider=model_provider,
+                temperature=temperature,
+                api_key=api_key,
+                max_retries=0,  # 429s, timeouts and 5xx errors are retried by the LLM gateway
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+            _models[key] = llm
+        return llm
+
+async def close_llm_clients():
+    """Close the pooled connections on application shutdown"""
+    global _http_client, _http_async_client
+    with _models_lock:
+        _models.clear()
+        http_client, http_async_client = _http_client, _http_async_client
+        _http_client = _http_async_client = None
+    if http_client is not None:
+        http_client.close()
+    if http_async_client is not None:
+        await http_async_client.aclose()
@@ -0,0 +1,407 @@
+import re
+import json
+import time
+import heapq
+import random
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Condition, Lock, Thread
+import openai
+from app.core.config import settings
+from app.utils.redis_client import get_redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower value is served first
+INTERACTIVE = 0
+BATCH = 1
+
+LLM_BUDGET_PREFIX = "llm_budget"
+LLM_COOLDOWN_PREFIX = "llm_cooldown"
+LLM_NODE_METRICS_KEY = "llm_node_metrics"
+
+_priority = ContextVar("llm_priority", default=INTERACTIVE)
+_run_metrics = ContextVar("llm_run_metrics", default=None)
+_node_totals = {}
+_pending_node_metrics = {}
+_node_flush_state = {"at": time.monotonic(), "running": False}
+_node_totals_lock = Lock()
+
+@contextmanager
+def llm_priority(priority: int):
+    """Run the enclosed LLM calls in the given lane (INTERACTIVE or BATCH)"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+@contextmanager
+def collect_node_metrics():
+    """Collect per-node LLM latency and token usage for the calls made inside the block"""
+    metrics = {}
+    token = _run_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _run_metrics.reset(token)
+
+def _record_node_call(node: str, deployment: str, latency_ms: int, usage: dict):
+    prompt_tokens = int(usage.get("input_tokens", 0)) if usage else 0
+    completion_tokens = int(usage.get("output_tokens", 0)) if usage else 0
+    run_metrics = _run_metrics.get()
+    if run_metrics is not None:
+        entry = run_metrics.setdefault(node, {"model": deployment, "calls": 0, "latency_ms": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        entry["calls"] += 1
+        entry["latency_ms"] += latency_ms
+        entry["prompt_tokens"] += prompt_tokens
+        entry["completion_tokens"] += completion_tokens
+
+    counters = {"calls": 1, "latency_ms": latency_ms, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+    # Counted in process; the shared hash in Redis is updated from a background
+    # thread at most every LLM_NODE_METRICS_FLUSH_SECONDS, off the LLM call path
+    flush = False
+    with _node_totals_lock:
+        totals = _node_totals.setdefault((node, deployment), dict.fromkeys(counters, 0))
+        for name, value in counters.items():
+            totals[name] += value
+            if settings.REDIS_CONFIG:
+                field = f"{node}|{deployment}|{name}"
+                _pending_node_metrics[field] = _pending_node_metrics.get(field, 0) + value
+        if (
+            settings.REDIS_CONFIG and not _node_flush_state["running"]
+            and time.monotonic() - _node_flush_state["at"] >= settings.LLM_NODE_METRICS_FLUSH_SECONDS
+        ):
+            _node_flush_state["running"] = flush = True
+    if flush:
+        Thread(target=flush_node_metrics, name="llm-node-metrics", daemon=True).start()
+
+def flush_node_metrics():
+    """Add the node counters recorded since the last flush to the shared Redis hash"""
+    with _node_totals_lock:
+        pending = dict(_pending_node_metrics)
+        _pending_node_metrics.clear()
+    try:
+        if pending:
+            pipe = get_redis_client().pipeline()
+            for field, value in pending.items():
+                pipe.hincrby(LLM_NODE_METRICS_KEY, field, int(value))
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"[WARNING] Could not record LLM node metrics: {str(e)}")
+        # Kept for the next flush
+        with _node_totals_lock:
+            for field, value in pending.items():
+                _pending_node_metrics[field] = _pending_node_metrics.get(field, 0) + value
+    finally:
+        with _node_totals_lock:
+            _node_flush_state.update(at=time.monotonic(), running=False)
+
+def get_node_metrics() -> dict:
+    """Per node and deployment: calls, average latency and average tokens"""
+    totals = {}
+    if settings.REDIS_CONFIG:
+        flush_node_metrics()
+        for field, value in get_redis_client().hgetall(LLM_NODE_METRICS_KEY).items():
+            node, deployment, name = field.rsplit("|", 2)
+            totals.setdefault((node, deployment), {})[name] = int(value)
+    else:
+        with _node_totals_lock:
+            totals = {key: dict(value) for key, value in _node_totals.items()}
+
+    result = {}
+    for (node, deployment), counters in totals.items():
+        calls = counters.get("calls", 0) or 1
+        result.setdefault(node, {})[deployment] = {
+            "calls": counters.get("calls", 0),
+            "avg_latency_ms": round(counters.get("latency_ms", 0) / calls, 1),
+            "avg_prompt_tokens": round(counters.get("prompt_tokens", 0) / calls, 1),
+            "avg_completion_tokens": round(counters.get("completion_tokens", 0) / calls, 1),
+        }
+    return result
+
+def estimate_prompt_tokens(messages) -> int:
+    """Rough token estimate (~4 characters per token) of a prompt passed to invoke()"""
+    if isinstance(messages, str):
+        text = messages
+    else:
+        parts = []
+        for msg in messages:
+            if isinstance(msg, dict):
+                parts.append(str(msg.get("content", "")))
+            else:
+                content = getattr(msg, "content", msg)
+                parts.append(content if isinstance(content, str) else json.dumps(content, default=str))
+                if getattr(msg, "tool_calls", None):
+                    parts.append(json.dumps(msg.tool_calls, default=str))
+        text = "".join(parts)
+    return len(text) // 4 + 1
+
+def _parse_duration(value: str) -> float:
+    """Parse OpenAI style reset durations such as '6ms', '1.5s' or '1m30s' into seconds"""
+    total = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|s|m|h)", value):
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total
+
+def retry_after_seconds(error, attempt: int) -> float:
+    """Delay before retrying a failed call: the server's hint if it sent one, else capped exponential backoff with jitter"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+        resets = [_parse_duration(headers[h]) for h in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens") if headers.get(h)]
+        if resets:
+            return max(resets)
+    except (TypeError, ValueError):
+        pass
+    backoff = min(settings.LLM_BACKOFF_MAX_SECONDS, settings.LLM_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(backoff / 2, backoff)
+
+def _deployment_limits(deployment: str):
+    limits = {}
+    if settings.LLM_DEPLOYMENT_LIMITS:
+        try:
+            limits = json.loads(settings.LLM_DEPLOYMENT_LIMITS).get(deployment, {})
+        except ValueError:
+            logger.warning("[WARNING] LLM_DEPLOYMENT_LIMITS is not valid JSON, using defaults")
+    return (
+        int(limits.get("rpm", settings.LLM_REQUESTS_PER_MINUTE)),
+        int(limits.get("tpm", settings.LLM_TOKENS_PER_MINUTE)),
+        int(limits.get("concurrency", settings.LLM_MAX_CONCURRENCY)),
+    )
+
+class DeploymentGate:
+    """
+    Admission control for one model deployment.
+
+    Callers queue by (lane, arrival) and are admitted when a concurrency slot is
+    free, no 429 cool-down is active and the per-minute request/token budget has
+    room. Budgets live in Redis when REDIS_CONFIG is on so all workers share them;
+    otherwise they are tracked per process. Batch callers may only use
+    LLM_BATCH_BUDGET_SHARE of a minute's budget, leaving the rest for /Query.
+    """
+
+    def __init__(self, deployment: str, rpm: int, tpm: int, max_concurrency: int, use_redis: bool = None):
+        self.deployment = deployment
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.use_redis = settings.REDIS_CONFIG if use_redis is None else use_redis
+        self._cond = Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._cooldown_until = 0.0
+        self._window = None
+        self._window_requests = 0
+        self._window_tokens = 0
+        self.stats = {"calls": 0, "rate_limited": 0, "retries": 0, "queued_ms": 0}
+
+    def _budget_keys(self, window: int):
+        return f"{LLM_BUDGET_PREFIX}:{self.deployment}:{window}:req", f"{LLM_BUDGET_PREFIX}:{self.deployment}:{window}:tok"
+
+    def _try_reserve(self, tokens: int, priority: int):
+        """
+        Take one request and the tokens from the current minute's budget; returns
+        the reservation (window, shared) or None when the budget is exhausted.
+        """
+        share = 1.0 if priority == INTERACTIVE else settings.LLM_BATCH_BUDGET_SHARE
+        rpm_limit = max(1, int(self.rpm * share))
+        tpm_limit = max(1, int(self.tpm * share))
+        window = int(time.time() // 60)
+        if self.use_redis:
+            try:
+                req_key, tok_key = self._budget_keys(window)
+                pipe = get_redis_client().pipeline()
+                pipe.incr(req_key)
+                pipe.incrby(tok_key, tokens)
+                pipe.expire(req_key, 120)
+                pipe.expire(tok_key, 120)
+                requests, used_tokens, _, _ = pipe.execute()
+                # A single oversized prompt is still admitted into an empty window
+                if requests <= rpm_limit and (used_tokens <= tpm_limit or used_tokens == tokens):
+                    return window, True
+                self._cancel_reservation((window, True), tokens)
+                return None
+            except Exception as e:
+                logger.warning(f"[WARNING] Shared LLM budget unavailable for {self.deployment}, using local budget: {str(e)}")
+        with self._cond:
+            if self._window != window:
+                self._window, self._window_requests, self._window_tokens = window, 0, 0
+            if self._window_requests + 1 > rpm_limit:
+                return None
+            if self._window_tokens and self._window_tokens + tokens > tpm_limit:
+                return None
+            self._window_requests += 1
+            self._window_tokens += tokens
+            return window, False
+
+    def _cancel_reservation(self, reservation, tokens: int):
+        window, shared = reservation
+        if shared:
+            try:
+                req_key, tok_key = self._budget_keys(window)
+                pipe = get_redis_client().pipeline()
+                pipe.decr(req_key)
+                pipe.decrby(tok_key, tokens)
+                pipe.execute()
+            except Exception:
+                pass
+            return
+        with self._cond:
+            if self._window == window:
+                self._window_requests = max(0, self._window_requests - 1)
+                self._window_tokens = max(0, self._window_tokens - tokens)
+
+    def _shared_cooldown(self) -> float:
+        if not self.use_redis:
+            return 0.0
+        try:
+            value = get_redis_client().get(f"{LLM_COOLDOWN_PREFIX}:{self.deployment}")
+            return float(value) if value else 0.0
+        except Exception:
+            return 0.0
+
+    def _is_next(self, ticket) -> bool:
+        return self._queue[0] == ticket and self._active < self.max_concurrency
+
+    def acquire(self, priority: int, tokens: int):
+        start = time.monotonic()
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+        try:
+            while True:
+                with self._cond:
+                    while not self._is_next(ticket):
+                        self._cond.wait(timeout=0.5)
+                # The cool-down and budget live in Redis: check them without holding the lock
+                wait = max(self._cooldown_until, self._shared_cooldown()) - time.time()
+                reservation = self._try_reserve(tokens, priority) if wait <= 0 else None
+                if reservation:
+                    with self._cond:
+                        if self._is_next(ticket):
+                            heapq.heappop(self._queue)
+                            self._active += 1
+                            self.stats["calls"] += 1
+                            self.stats["queued_ms"] += int((time.monotonic() - start) * 1000)
+                            return
+                    # A higher-priority caller arrived or the slot was taken meanwhile
+                    self._cancel_reservation(reservation, tokens)
+                    continue
+                if wait <= 0:
+                    # Budget exhausted: wait for the next minute window
+                    wait = 60 - time.time() % 60 + random.uniform(0, 0.25)
+                with self._cond:
+                    self._cond.wait(timeout=min(wait, 1.0))
+        finally:
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def release(self, token_adjustment: int = 0):
+        """Free the slot and correct the token budget with the actual usage"""
+        if token_adjustment and self.use_redis:
+            try:
+                _, tok_key = self._budget_keys(int(time.time() // 60))
+                get_redis_client().incrby(tok_key, token_adjustment)
+            except Exception:
+                pass
+        with self._cond:
+            if token_adjustment and not self.use_redis:
+                self._window_tokens = max(0, self._window_tokens + token_adjustment)
+            self._active -= 1
+            self._cond.notify_all()
+
+    def cool_down(self, seconds: float):
+        """Pause admissions for this deployment after a 429, in every worker"""
+        until = time.time() + seconds
+        with self._cond:
+            self._cooldown_until = max(self._cooldown_until, until)
+            self.stats["rate_limited"] += 1
+        if self.use_redis:
+            try:
+                r = get_redis_client()
+                key = f"{LLM_COOLDOWN_PREFIX}:{self.deployment}"
+                current = r.get(key)
+                if not current or float(current) < until:
+                    r.set(key, until, px=max(1, int(seconds * 1000)))
+            except Exception:
+                pass
+
+_gates = {}
+_gates_lock = Lock()
+
+def get_gate(deployment: str) -> DeploymentGate:
+    with _gates_lock:
+        gate = _gates.get(deployment)
+        if gate is None:
+            rpm, tpm, concurrency = _deployment_limits(deployment)
+            gate = DeploymentGate(deployment, rpm, tpm, concurrency)
+            _gates[deployment] = gate
+        return gate
+
+def get_gateway_stats() -> dict:
+    with _gates_lock:
+        gates = list(_gates.values())
+    return {
+        gate.deployment: {**gate.stats, "active": gate._active, "queued": len(gate._queue), "rpm": gate.rpm, "tpm": gate.tpm}
+        for gate in gates
+    }
+
+def invoke_llm(llm, messages, deployment: str, node: str = None):
+    """
+    Invoke a chat model (or a tool-bound runnable) through the gateway.
+
+    The call waits for admission on the deployment's gate in the caller's
+    priority lane. On a 429 the whole deployment cools down for the time the
+    server asks for and the call is retried; connection errors, timeouts and
+    5xx responses are retried after the same backoff without a cool-down. Both
+    are retried up to LLM_MAX_RETRIES times. Clients should be created with
+    max_retries=0 so the SDK does not retry on its own. When `node` is given,
+    latency and token usage are recorded for it.
+    """
+    gate = get_gate(deployment)
+    priority = _priority.get()
+    estimated = estimate_prompt_tokens(messages) + settings.LLM_EXPECTED_OUTPUT_TOKENS
+    attempt = 0
+    while True:
+        gate.acquire(priority, estimated)
+        used = estimated
+        pause = 0.0
+        try:
+            start = time.perf_counter()
+            response = llm.invoke(messages)
+            usage = getattr(response, "usage_metadata", None)
+            if usage and usage.get("total_tokens"):
+                used = usage["total_tokens"]
+            if node:
+                _record_node_call(node, deployment, int((time.perf_counter() - start) * 1000), usage)
+            return response
+        except openai.RateLimitError as e:
+            if attempt >= settings.LLM_MAX_RETRIES:
+                raise
+            delay = retry_after_seconds(e, attempt)
+            logger.warning(f"[WARNING] 429 from {deployment}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+            gate.cool_down(delay)
+            gate.stats["retries"] += 1
+            attempt += 1
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            # APITimeoutError is an APIConnectionError
+            if attempt >= settings.LLM_MAX_RETRIES:
+                raise
+            pause = retry_after_seconds(e, attempt)
+            logger.warning(f"[WARNING] {type(e).__name__} from {deployment}, retrying in {pause:.2f}s (attempt {attempt + 1})")
+            gate.stats["retries"] += 1
+            attempt += 1
+        finally:
+            gate.release(used - estimated)
+        # Transient errors wait outside the gate so the slot is free meanwhile
+        time.sleep(pause)
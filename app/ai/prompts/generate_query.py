@@ -1,5 +1,5 @@
-def get_prompt(dialect:str,schema_name:str)->str:
-    return f"""
+def get_prompt(dialect:str,schema_name:str,examples:list=None,value_hints:list=None)->str:
+    prompt = f"""
 “You are a clinical data expert. Answer using CDISC SDTM and ADaM standards. Respond with SQL code and explain which domain is used.”
     You are an agent designed to interact with a SQL database.
     Given an input question, create a syntactically correct {dialect} query to run,
@@ -32,4 +32,16 @@ def get_prompt(dialect:str,schema_name:str)->str:
     Always map clinical concepts to CDISC-standard variables with controlled terminology (e.g., AEOUT). If both the standard column and a derived flag (e.g., AESDTH) are present, use only the standard column and ignore the flag. If only the flag exists, use the flag.
      
     Table and Columns: Use only the table and columns provided by the AI as the context for query generation. Do not select or switch to any other table.
-    """
\ No newline at end of file
+    """
+    if value_hints:
+        # Observed column values that match phrases of the question
+        prompt += "\n    Observed values in this study matching terms in the question (filter on these exact values):\n"
+        for hint in value_hints:
+            prompt += f"\n    - {hint['table']}.{hint['column']} = '{hint['value']}' (for \"{hint['phrase']}\")"
+        prompt += "\n"
+    if examples:
+        # Rated question -> SQL pairs from this study, most similar first
+        prompt += "\n    Examples of similar questions answered correctly for this study (adapt them, do not copy blindly):\n"
+        for question, query, _score in examples:
+            prompt += f"\n    Question: {question}\n    SQL: {query}\n"
+    return prompt
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form,status,Body, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form,status,Body, Query, BackgroundTasks
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
-from app.schemas.project import ProjectCreate, ProjectResponse, ProjectCheckResponse, FileDeleteItem, QueryRequest, QuerySessionOut, MessageOut, UpdateLLMConfigInput, UserOut
+from app.schemas.project import ProjectCreate, ProjectResponse, ProjectCheckResponse, FileDeleteItem, QueryRequest, QuerySessionOut, MessageOut, UpdateLLMConfigInput, UpdateLLMNodeConfigInput, UserOut
 from app.services.project_service import get_project, create_project, process_uploaded_file,get_all_projects,get_deleted_projects,get_username_from_user_id,get_project_active
 from app.db.session import get_db, get_files_db, get_websocket_db
 from datetime import date,datetime,timezone
@@ -11,7 +11,7 @@ import os
 import logging
 import time
 from app.core.security import azure_ad_dependency, websocket_auth
-from app.models.user import User ,Project, ClinicalQuerySession , ClinicalQueryMessage, LLMProvider, LLMModel, UserLLMConfig,UploadBatch, UploadBatchFile, DomainClassification
+from app.models.user import User ,Project, ClinicalQuerySession , ClinicalQueryMessage, LLMProvider, LLMModel, UserLLMConfig, LLMNodeModelConfig,UploadBatch, UploadBatchFile, DomainClassification
 from app.services.user_service import get_or_create_user, create_default_llm_config_if_not_exists
 from azure.storage.blob import ContainerClient, BlobServiceClient
 from app.core.config import settings
@@ -24,9 +24,20 @@ from sqlalchemy import text
 from app.ai.langgraph_workflow.graph_executor import run_agent
 from fastapi import APIRouter, WebSocket, Depends
 import asyncio
-from redis import Redis
 from redis.commands.json.path import Path
-from app.standard_query.query_processor import process_standard_query
+from app.utils.redis_client import get_redis_client
+from app.standard_query.query_processor import process_standard_query, polish_standard_summary
+from app.ai.langgraph_workflow.graph_memory import get_session_metrics
+from app.services.dataset_version import bump_dataset_version, get_dataset_version
+from app.services.result_cache import get_result_cache_metrics
+from app.services.query_coalescing import query_flight_key, run_coalesced
+from app.ai.llm_gateway import get_gateway_stats, get_node_metrics
+from app.services.llm_routing import resolve_node_models, ROUTABLE_NODES
+from app.ai.langgraph_workflow.few_shot import update_few_shot_index
+from app.services.value_index import build_value_index, get_value_index
+from app.services.date_columns import provision_date_columns
+from app.services.table_indexes import index_report, provision_table_indexes
+from app.services.query_metrics import aggregate_query_metrics
 import json
 
 
@@ -546,6 +557,11 @@ def list_project_folder_files(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error accessing Azure Blob: {str(e)}")
 
+def _dataset_columns(desc_rows) -> str:
+    """Select list of a dataset's own columns; computed ones (the persisted ISO dates) are left out"""
+    columns = [f"[{row.ColumnName}]" for row in desc_rows if not row.IsComputed]
+    return ", ".join(columns) or "*"
+
 @router.get("/DownloadExcelFromDB")
 def download_excel_from_db(
     project_number: str,
@@ -579,7 +595,7 @@ def download_excel_from_db(
         # 3. Pull column descriptions
         desc_rows = db_files.execute(
             text("""
-                SELECT c.name AS ColumnName, CAST(ep.value AS NVARCHAR(4000)) AS Description
+                SELECT c.name AS ColumnName, CAST(ep.value AS NVARCHAR(4000)) AS Description, c.is_computed AS IsComputed
                 FROM sys.columns c
                 JOIN sys.tables t   ON c.object_id = t.object_id
                 JOIN sys.schemas s  ON t.schema_id = s.schema_id
@@ -588,15 +604,16 @@ def download_excel_from_db(
                    AND ep.minor_id = c.column_id
                    AND ep.name = 'MS_Description'
                 WHERE s.name = :schema AND t.name = :table
+                ORDER BY c.column_id
             """),
             {"schema": schema, "table": table},
         ).fetchall()
-        desc_map = {r.ColumnName.upper(): (r.Description or r.ColumnName) for r in desc_rows}
+        desc_map = {r.ColumnName.upper(): (r.Description or r.ColumnName) for r in desc_rows if not r.IsComputed}
 
         # 4. Get data from database
         query_start = time.time()
         df = pd.read_sql(
-            text(f"SELECT * FROM [{schema}].[{table}]"),
+            text(f"SELECT {_dataset_columns(desc_rows)} FROM [{schema}].[{table}]"),
             db_files.bind
         )
         logger.info(f"Data retrieved in {time.time() - query_start:.2f}s")
@@ -675,6 +692,7 @@ def delete_blob_files(files: List[FileDeleteItem], db: Session = Depends(get_fil
             db.execute(drop_stmt)
             db.commit()
             dropped_tables.append(f"{schema}.{table}")
+            bump_dataset_version(file.project_number, file.foldername)
         except Exception as e:
             logger.warning(f"[DB Drop] Failed: {schema}.{table} - {str(e)}")
             failed_to_drop.append({
@@ -706,7 +724,7 @@ def view_sas_datasets(
         # Pull column descriptions
         desc_rows = db.execute(
             text("""
-                SELECT c.name AS ColumnName, CAST(ep.value AS NVARCHAR(4000)) AS Description
+                SELECT c.name AS ColumnName, CAST(ep.value AS NVARCHAR(4000)) AS Description, c.is_computed AS IsComputed
                 FROM sys.columns c
                 JOIN sys.tables t   ON c.object_id = t.object_id
                 JOIN sys.schemas s  ON t.schema_id = s.schema_id
@@ -715,14 +733,15 @@ def view_sas_datasets(
                    AND ep.minor_id = c.column_id
                    AND ep.name = 'MS_Description'
                 WHERE s.name = :schema AND t.name = :table
+                ORDER BY c.column_id
             """),
             {"schema": schema, "table": table},
         ).fetchall()
         
-        column_descriptions = {row.ColumnName: row.Description for row in desc_rows}
+        column_descriptions = {row.ColumnName: row.Description for row in desc_rows if not row.IsComputed}
 
         query = f"""
-            SELECT * FROM [{schema}].[{table}]
+            SELECT {_dataset_columns(desc_rows)} FROM [{schema}].[{table}]
             ORDER BY TRY_CAST(ROWID AS INT)
             OFFSET {offset} ROWS FETCH NEXT {page_size} ROWS ONLY
         """
@@ -745,7 +764,7 @@ def view_sas_datasets(
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 @router.post("/Query", tags=["AI"])
-def query_langgraph(req: QueryRequest, db: Session = Depends(get_db),
+def query_langgraph(req: QueryRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db),
     current_user: dict = Depends(azure_ad_dependency)):
     start_time = time.time()
     try:
@@ -796,19 +815,31 @@ def query_langgraph(req: QueryRequest, db: Session = Depends(get_db),
         db.commit()
 
         # Step 4: Generate LLM response
+        # Identical requests already in flight (other sessions/workers) share one execution
+        node_models = resolve_node_models(db, user.UserId, req.LlmType, req.ModelName)
+        fast_summary = settings.STANDARD_QUERY_FAST_SUMMARY if req.FastSummary is None else req.FastSummary
+        flight_key = query_flight_key(req.ProjectNumber, req.FolderName, req.Question, req.LlmType, req.ModelName, req.Type, req.FlowType, req.STANDARD_QUERY_DATA, node_models, fast_summary)
         if req.FlowType and req.FlowType.upper() == "STANDARD":
-            answer,table_response = process_standard_query(req.ProjectNumber, req.FolderName, req.Question,req.LlmType, req.ModelName,req.STANDARD_QUERY_DATA,session.Id)
+            (answer,table_response,run_info), coalesced = run_coalesced(flight_key, session.Id, req.Question,
+                lambda: process_standard_query(req.ProjectNumber, req.FolderName, req.Question,req.LlmType, req.ModelName,req.STANDARD_QUERY_DATA,session.Id, node_models, fast_summary))
             answer_dict = json.loads(table_response)
             StandardTableContent = answer_dict
         else:
             # Existing AI flow
-            answer = run_agent(req.ProjectNumber, req.FolderName, req.Question, req.LlmType, req.ModelName, session.Id, req.Type)
+            (answer, run_info), coalesced = run_coalesced(flight_key, session.Id, req.Question,
+                lambda: run_agent(req.ProjectNumber, req.FolderName, req.Question, req.LlmType, req.ModelName, session.Id, req.Type, node_models))
             StandardTableContent = None
         usage = {
             "FolderName": req.FolderName,
             "ModelName": req.ModelName,
             "LLMType": req.LlmType,
         }
+        usage.update(run_info)
+        if coalesced:
+            usage["Coalesced"] = True
+            # Only the request that ran the flow polishes its narrative; a shared answer keeps the templated one
+            if usage.get("SummaryStatus") == "pending":
+                usage["SummaryStatus"] = "ready"
 
         # Step 5: Add assistant message
         assistant_msg = ClinicalQueryMessage(
@@ -829,6 +860,11 @@ def query_langgraph(req: QueryRequest, db: Session = Depends(get_db),
         db.commit()
         db.refresh(assistant_msg)
 
+        # Templated narrative returned now; the LLM narrative replaces it after the response is sent
+        if usage.get("SummaryStatus") == "pending":
+            summary_llm_type, summary_model_name = node_models.get("generate_summary", (req.LlmType, req.ModelName))
+            background_tasks.add_task(polish_standard_summary, assistant_msg.Id, req.Question, summary_llm_type, summary_model_name, session.Id)
+
         # Step 6: Update session timestamp
         db.query(ClinicalQuerySession).filter_by(Id=session.Id).update({
             "UpdatedAt": func.now()
@@ -996,6 +1032,69 @@ def update_user_llm_config(
         "ModelId": config_data.ModelId
     }
 
+@router.get("/LlmNodeConfig", tags=["AI"])
+def get_llm_node_config(UserId: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Model used by each graph node. Without UserId the defaults for all users are returned.
+    """
+    configs = (
+        db.query(LLMNodeModelConfig)
+        .options(joinedload(LLMNodeModelConfig.Provider), joinedload(LLMNodeModelConfig.Model))
+        .filter(LLMNodeModelConfig.UserId == UserId if UserId is not None else LLMNodeModelConfig.UserId.is_(None))
+        .all()
+    )
+    return [
+        {
+            "UserId": c.UserId,
+            "NodeName": c.NodeName,
+            "ProviderId": c.ProviderId,
+            "ProviderName": c.Provider.Name,
+            "ModelId": c.ModelId,
+            "ModelName": c.Model.ModelName,
+            "IsActive": c.IsActive
+        }
+        for c in configs
+    ]
+
+@router.put("/LlmNodeConfigUpdate", tags=["AI"], response_model=dict)
+def update_llm_node_config(config_data: UpdateLLMNodeConfigInput, db: Session = Depends(get_db)):
+    """
+    Route a graph node to a model, for one user or (UserId null) for everyone.
+    """
+    if config_data.NodeName not in ROUTABLE_NODES:
+        raise HTTPException(status_code=400, detail=f"Unknown node '{config_data.NodeName}'. Available nodes: {', '.join(ROUTABLE_NODES)}")
+
+    model = db.query(LLMModel).filter(
+        LLMModel.Id == config_data.ModelId,
+        LLMModel.ProviderId == config_data.ProviderId,
+        LLMModel.IsActive == True
+    ).first()
+    if not model:
+        raise HTTPException(status_code=400, detail="Invalid provider/model combination")
+
+    node_config = db.query(LLMNodeModelConfig).filter(
+        LLMNodeModelConfig.UserId == config_data.UserId if config_data.UserId is not None else LLMNodeModelConfig.UserId.is_(None),
+        LLMNodeModelConfig.NodeName == config_data.NodeName
+    ).first()
+    if not node_config:
+        node_config = LLMNodeModelConfig(UserId=config_data.UserId, NodeName=config_data.NodeName)
+        db.add(node_config)
+
+    node_config.ProviderId = config_data.ProviderId
+    node_config.ModelId = config_data.ModelId
+    node_config.IsActive = config_data.IsActive
+    node_config.UpdatedAt = datetime.now(timezone.utc)
+    db.commit()
+
+    return {
+        "message": "LLM node configuration updated successfully",
+        "UserId": config_data.UserId,
+        "NodeName": config_data.NodeName,
+        "ProviderId": config_data.ProviderId,
+        "ModelId": config_data.ModelId,
+        "IsActive": config_data.IsActive
+    }
+
 @router.get("/LlmProviders", tags=["AI"])
 def get_llm_providers(db: Session = Depends(get_db)):
     providers = db.query(LLMProvider).filter(LLMProvider.IsActive == True).all()
@@ -1121,6 +1220,12 @@ def update_feedback_for_message(
         db.commit()
         db.refresh(message)
 
+        # Keep the few-shot example index of this worker in step with the feedback
+        try:
+            update_few_shot_index(db, message)
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not update few-shot index for message {message.Id}: {str(e)}")
+
         return {
             "message": "Feedback updated successfully.",
             "ClinicalQueryMessageId": message.Id,
@@ -1221,48 +1326,269 @@ async def websocket_status(
             await websocket.close()
 
 @router.get("/redis/keys", tags=["Redis"])
-def list_redis_keys(pattern: str = "*"):
+def list_redis_keys(
+    pattern: str = "*",
+    cursor: int = 0,
+    page_size: int = Query(100, ge=1, le=1000)
+):
     """
-    List all Redis keys matching the given pattern (default is all).
+    List Redis keys matching the given pattern (default is all), one SCAN page at a time.
+    Pass the returned next_cursor back as cursor to fetch the next page; 0 means the scan is complete.
     """
     try:
-        r = Redis.from_url(settings.REDIS_URL)
-        keys = r.keys(pattern)
-        #print("keys",keys)
-        decoded_keys = [key.decode() for key in keys]
-        return {"keys": decoded_keys}
+        r = get_redis_client()
+        next_cursor, keys = r.scan(cursor=cursor, match=pattern, count=page_size)
+        return {
+            "keys": list(keys),
+            "next_cursor": next_cursor,
+            "complete": next_cursor == 0
+        }
     except Exception as e:
         return {"error": str(e)}
 
 @router.delete("/redis/delete-all", response_model=dict, tags=["Redis"])
-def delete_all_keys():
-    redis_client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
-    redis_client.flushdb()  # Use flushall() if you want to clear ALL databases
-    return {"status": "success", "message": "All Redis keys in current DB deleted"}
+def delete_all_keys(
+    pattern: str = "*",
+    batch_size: int = Query(500, ge=1, le=5000)
+):
+    """
+    Delete Redis keys matching the given pattern (default is all) using SCAN and batched UNLINK,
+    so the server is never blocked for the whole keyspace.
+    """
+    redis_client = get_redis_client()
+    deleted = 0
+    batch = []
+    for key in redis_client.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            deleted += redis_client.unlink(*batch)
+            batch = []
+    if batch:
+        deleted += redis_client.unlink(*batch)
+    return {"status": "success", "message": f"Deleted {deleted} Redis keys matching '{pattern}'", "deleted": deleted}
+
+def _checkpoint_values(r, keys: list, summary: bool) -> dict:
+    """Values of checkpoint keys fetched in bulk with JSON.MGET, or only their memory size with summary"""
+    if not keys:
+        return {}
+    if summary:
+        pipe = r.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key)
+        sizes = pipe.execute(raise_on_error=False)
+        return {key: {"bytes": size if not isinstance(size, Exception) else None} for key, size in zip(keys, sizes)}
+    try:
+        values = r.json().mget(keys, Path.root_path())
+    except Exception:
+        # Fall back to a pipelined JSON.GET so one bad key does not fail the whole page
+        pipe = r.pipeline(transaction=False)
+        for key in keys:
+            pipe.json().get(key, Path.root_path())
+        values = pipe.execute(raise_on_error=False)
+    return {
+        key: f"[Error reading ReJSON] {str(value)}" if isinstance(value, Exception) else value
+        for key, value in zip(keys, values)
+    }
 
 @router.get("/redis/checkpoint/{thread_id}", tags=["Redis"])
-def get_rejson_checkpoints(thread_id: str):
+def get_rejson_checkpoints(
+    thread_id: str,
+    cursor: Optional[int] = None,
+    page_size: int = Query(100, ge=1, le=1000),
+    summary: bool = False
+):
     """
     Get all ReJSON checkpoint keys and values for a given thread ID.
+    Keys are found with SCAN and values fetched in bulk with JSON.MGET; with summary=true only the
+    memory size of each key is returned. Pass cursor (0 for the first page) to page through the keys;
+    the response then has the page under "checkpoints" with "next_cursor" and "complete".
     """
     try:
-        r = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        r = get_redis_client()
         pattern = f"checkpoint_blob:{thread_id}:*"
-        keys = r.keys(pattern)
-        result = {}
 
-        for key in keys:
-            try:
-                value = r.json().get(key, Path.root_path())
-                result[key] = value
-            except Exception as e:
-                result[key] = f"[Error reading ReJSON] {str(e)}"
+        if cursor is None:
+            result = {}
+            keys = []
+            for key in r.scan_iter(match=pattern, count=page_size):
+                keys.append(key)
+                if len(keys) >= page_size:
+                    result.update(_checkpoint_values(r, keys, summary))
+                    keys = []
+            result.update(_checkpoint_values(r, keys, summary))
+            return result
+
+        next_cursor, keys = r.scan(cursor=cursor, match=pattern, count=page_size)
+        return {
+            "thread_id": thread_id,
+            "checkpoints": _checkpoint_values(r, list(keys), summary),
+            "next_cursor": next_cursor,
+            "complete": next_cursor == 0
+        }
 
-        return result
+    except Exception as e:
+        return {"error": str(e)}
 
+@router.get("/redis/session-metrics/{thread_id}", tags=["Redis"])
+def get_redis_session_metrics(thread_id: str):
+    """
+    Get conversation memory size metrics (messages, bytes, estimated tokens) for a session thread.
+    """
+    try:
+        metrics = get_session_metrics(thread_id)
+        if not metrics:
+            raise HTTPException(status_code=404, detail=f"No session metrics found for thread {thread_id}")
+        return {"thread_id": thread_id, **metrics}
+    except HTTPException:
+        raise
     except Exception as e:
         return {"error": str(e)}
 
+@router.get("/redis/result-cache-metrics", tags=["Redis"])
+def get_redis_result_cache_metrics():
+    """
+    Get query result cache counters: hits, misses, bytes saved and DB time avoided.
+    """
+    try:
+        metrics = get_result_cache_metrics()
+        lookups = metrics.get("hits", 0) + metrics.get("misses", 0)
+        metrics["hit_rate"] = round(metrics.get("hits", 0) / lookups, 4) if lookups else 0.0
+        return metrics
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/llm-gateway/stats", tags=["AI"])
+def llm_gateway_stats():
+    """
+    Per-deployment LLM gateway counters for this worker: calls, 429s, retries, queue time and current load.
+    """
+    return get_gateway_stats()
+
+@router.get("/llm-gateway/node-metrics", tags=["AI"])
+def llm_node_metrics():
+    """
+    Calls, average latency and average tokens per graph node and model.
+    """
+    try:
+        return get_node_metrics()
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/MessageSummary/{MessageId}", tags=["AI"])
+def message_summary(MessageId: int, db: Session = Depends(get_db)):
+    """
+    Current summary of an assistant message and whether the LLM narrative has replaced the templated one.
+    """
+    message = db.query(ClinicalQueryMessage).filter(ClinicalQueryMessage.Id == MessageId).first()
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    metadata = message.Metadata or {}
+    try:
+        summary = json.loads(message.Content).get("summary", "")
+    except (TypeError, ValueError):
+        summary = message.Content
+    return {
+        "Id": message.Id,
+        "SummaryStatus": metadata.get("SummaryStatus", "ready"),
+        "NarrativeSource": metadata.get("NarrativeSource", "llm"),
+        "summary": summary
+    }
+
+@router.get("/QueryMetrics", tags=["AI"])
+def query_metrics(ProjectNumber: Optional[str] = None, days: int = 7, db: Session = Depends(get_db)):
+    """
+    p50/p95 of /Query latency, SQL time and tokens per project, model and flow, and per graph node,
+    from the metrics stored on assistant messages of the last `days` days.
+    """
+    try:
+        return aggregate_query_metrics(db, ProjectNumber, days)
+    except Exception as e:
+        logger.error(f"Query metrics aggregation failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Query metrics aggregation failed: {str(e)}")
+
+@router.post("/BuildValueIndex", tags=["AI"])
+def build_value_index_endpoint(project_number: str, foldername: str, db: Session = Depends(get_files_db)):
+    """
+    Build the controlled-terminology value index of a project folder.
+    Called by the ingestion pipeline after new datasets are processed, so the first question does not pay for the scan.
+    """
+    schema = f"{project_number}_{foldername}"
+    try:
+        index = build_value_index(db.get_bind(), schema, get_dataset_version(project_number, foldername))
+        return {
+            "schema": schema.lower(),
+            "columns": {source: len(values) for source, values in index.values.items()},
+            "indexed_values": len(index.entries)
+        }
+    except Exception as e:
+        logger.error(f"Value index build failed for {schema}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Value index build failed: {str(e)}")
+
+@router.post("/ProvisionDateColumns", tags=["AI"])
+def provision_date_columns_endpoint(project_number: str, foldername: str, db: Session = Depends(get_files_db)):
+    """
+    Add persisted ISO date columns (LBDT, VSDT, AESTDT, CMSTDT, PRSTDT) and covering indexes to the domain tables of a project folder.
+    Called by the ingestion pipeline after each load; the standard queries filter on the new columns once they exist.
+    """
+    schema = f"{project_number}_{foldername}"
+    try:
+        report = provision_date_columns(db.get_bind(), schema)
+        if any("added" in entry.values() for entry in report["tables"].values()):
+            bump_dataset_version(project_number, foldername)
+        return {"schema": schema.lower(), **report}
+    except Exception as e:
+        logger.error(f"Date column provisioning failed for {schema}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Date column provisioning failed: {str(e)}")
+
+@router.post("/ProvisionIndexes", tags=["AI"])
+def provision_indexes_endpoint(project_number: str, foldername: str, tablename: Optional[str] = None, db: Session = Depends(get_files_db)):
+    """
+    Index a project folder's tables after a load: clustered index on an INT ROWID (or clustered columnstore
+    for the large tables in INDEX_COLUMNSTORE_TABLES), USUBJID lookup indexes, then the persisted date columns.
+    Called by the ingestion pipeline after each table is loaded; pass tablename to index only that table.
+    """
+    schema = f"{project_number}_{foldername}"
+    try:
+        tables = provision_table_indexes(db.get_bind(), schema, tablename)
+        dates = provision_date_columns(db.get_bind(), schema)
+        changed = any(
+            state == "added" or entry.get("rowid") == "converted"
+            for entry in tables["tables"].values() for state in entry["indexes"].values()
+        ) or any("added" in entry.values() for entry in dates["tables"].values())
+        if changed:
+            bump_dataset_version(project_number, foldername)
+        return {"schema": schema.lower(), "status": tables["status"], "tables": tables["tables"], "date_columns": dates["tables"]}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Index provisioning failed for {schema}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Index provisioning failed: {str(e)}")
+
+@router.get("/IndexReport", tags=["AI"])
+def index_report_endpoint(project_number: str, foldername: str, db: Session = Depends(get_files_db)):
+    """
+    Per-table index state of a project folder: rows, ROWID type, heap or not, current indexes and planned ones missing.
+    """
+    schema = f"{project_number}_{foldername}"
+    try:
+        return {"schema": schema.lower(), **index_report(db.get_bind(), schema)}
+    except Exception as e:
+        logger.error(f"Index report failed for {schema}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Index report failed: {str(e)}")
+
+@router.get("/ResolveValues", tags=["AI"])
+def resolve_values(project_number: str, foldername: str, phrase: str, db: Session = Depends(get_files_db)):
+    """
+    Map free text to observed controlled-terminology values of the project folder.
+    """
+    schema = f"{project_number}_{foldername}"
+    try:
+        index = get_value_index(db.get_bind(), schema, get_dataset_version(project_number, foldername))
+        return index.resolve(phrase, settings.VALUE_INDEX_MAX_HINTS, settings.VALUE_INDEX_MIN_SIMILARITY)
+    except Exception as e:
+        logger.error(f"Value lookup failed for {schema}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Value lookup failed: {str(e)}")
+
 @router.get("/DownloadAllQueryHistory", tags=["AI"])
 def download_all_query_history(UserId: int, db: Session = Depends(get_db)):
     try:
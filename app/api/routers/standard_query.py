@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session, joinedload
-from app.db.session import get_db, get_files_db
-from typing import Optional
+from app.db.session import get_db
+from app.db.base import engine_files
+from typing import Literal, Optional
 import os
 import logging
 import json
@@ -10,9 +11,22 @@ import ast
 import pandas as pd
 from io import BytesIO
 from app.core.security import azure_ad_dependency
-from app.models.user import QueryModule, QueryCategory, PredefinedQuery, QueryPlaceholder, LabAnalytes, ClinicalQueryMessage
-from sqlalchemy import text
-from datetime import datetime
+from app.models.user import QueryModule, QueryCategory, PredefinedQuery, QueryPlaceholder, ClinicalQueryMessage, NarrativeJob, Project, User
+from datetime import date, datetime
+from app.services.subject_index import get_subject_index, refresh_subject_index, subjects_in_all, find_subject
+from app.services.subject_timeline import get_subject_timeline, refresh_subject_timelines
+from app.services.placeholder_values import PlaceholderSource, resolve_placeholder_values
+from app.services.query_catalog import clear_query_catalog, get_query_catalog
+from app.standard_query.templates import get_template_registry, reload_template_registry
+from app.standard_query.cohort import cohort_statement, stream_cohort
+from app.standard_query.graph_data import graph_series
+from app.services.dataset_version import get_dataset_version
+from app.services.date_columns import persisted_date_columns
+from app.services.narrative_jobs import (
+    build_job_bundle, cancel_narrative_job, create_narrative_job, job_status, requeue_narrative_job, start_narrative_job,
+)
+from app.schemas.project import CohortQueryRequest, NarrativeJobRequest
+from app.core.config import settings
 
 
 
@@ -30,70 +44,41 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(dependencies=[Depends(azure_ad_dependency)])
 
+def _catalog_response(request: Request, catalog, payload):
+    """JSON with the catalog version as ETag; 304 when the client already has it"""
+    etag = f'"{catalog.version}"'
+    if etag in [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(payload, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def _has_source(placeholder) -> bool:
+    """Free-text placeholders (and the seeded 'NULL' sources) have no values to look up"""
+    if (placeholder.InputType or "").strip().lower() == "text-field":
+        return False
+    return all(
+        name and name.strip().upper() != "NULL"
+        for name in (placeholder.SourceTable, placeholder.SourceColumn)
+    )
+
 @router.get("/GetQueryModules", tags=["Predefined Template Query"])
-def get_query_modules(db: Session = Depends(get_db)):
-    modules = db.query(QueryModule).filter(QueryModule.Status == True).all()
-    
-    result = {
-        "modules": [
-            {
-                "id": module.Id,
-                "name": module.Name,
-                "categories": [
-                    {"id": cat.Id, "Name": cat.Name, "LBCAT": cat.LBCAT}
-                    for cat in module.categories if cat.Status == True
-                ]
-            }
-            for module in modules
-        ]
-    }
-    
-    return result
+def get_query_modules(request: Request, db: Session = Depends(get_db)):
+    catalog = get_query_catalog(db)
+    return _catalog_response(request, catalog, {"modules": catalog.modules})
 
 @router.get("/GetPredefinedQueries", tags=["Predefined Template Query"])
-def get_predefined_queries(CategoryId: int, db: Session = Depends(get_db)):
-    queries = db.query(PredefinedQuery).filter(
-        PredefinedQuery.CategoryId == CategoryId,
-        PredefinedQuery.Status == True
-    ).all()
-    
-    result = []
-    for query in queries:
-        placeholders = db.query(QueryPlaceholder).filter(
-            QueryPlaceholder.QueryId == query.Id
-        ).all()
-        
-        placeholder_data = []
-       
-        for p in placeholders:
-            category_filter = None
-            categoryColumn = None 
-            if p.CategoryFilter:
-                category = db.query(QueryCategory).filter(QueryCategory.Id == p.CategoryFilter).first()
-                category_filter = category.LBCAT if category else None
-                
-                if category_filter:
-                    categoryColumn = "LBCAT"
-            placeholder_data.append({
-                "id": p.Id,
-                "placeholder": p.PlaceholderText,
-                "inputType": p.InputType,
-                "sourceTable": p.SourceTable,
-                "sourceColumn": p.SourceColumn,
-                "categoryFilter": category_filter,
-                "categoryColumn": categoryColumn
-            })
-        
-        result.append({
-            "queryId": query.Id,
-            "templateText": query.TemplateText,
-            "datasetType": query.DatasetType,
-            "tablesInvolved": query.TablesInvolved,
-            "queryType": query.QueryType,
-            "placeholders": placeholder_data
-        })
-    
-    return result
+def get_predefined_queries(CategoryId: int, request: Request, db: Session = Depends(get_db)):
+    catalog = get_query_catalog(db)
+    return _catalog_response(request, catalog, catalog.queries.get(CategoryId, []))
+
+@router.post("/ReloadQueryCatalog", tags=["Predefined Template Query"])
+def reload_query_catalog(db: Session = Depends(get_db)):
+    """
+    Reload the query catalog and the standard query templates after the QueryModule tables were edited.
+    """
+    clear_query_catalog()
+    catalog = get_query_catalog(db)
+    registry = reload_template_registry(db)
+    return {"version": catalog.version, "modules": len(catalog.modules), "templateModules": sorted(registry.modules)}
 
 @router.get("/GetSubjects", tags=["Predefined Template Query"])
 def get_subjects(
@@ -101,40 +86,69 @@ def get_subjects(
     DatasetType: str,
     Tables: str,
     USUBJID: Optional[str] = None,
-    db: Session = Depends(get_files_db)
+    db: Session = Depends(get_db)
 ):
-    schema = f"{ProjectNumber}_{DatasetType.lower()}"
-    table_list = [t.strip().lower() for t in Tables.split(",") if t.strip()]
+    # Subjects and the tables they appear in come from the schema's subject index, not the domain tables
+    index = get_subject_index(db, engine_files, ProjectNumber, DatasetType.lower())
+    table_list = [t.strip().upper() for t in Tables.split(",") if t.strip()]
     
     # Case 1: Validate specific USUBJID across all tables
     if USUBJID:
-        checks = [f"EXISTS (SELECT 1 FROM [{schema}].[{table}] WHERE USUBJID = :usubjid)" for table in table_list]
-        condition = " AND ".join(checks)
-        
-        query = text(f"SELECT CASE WHEN {condition} THEN 1 ELSE 0 END AS is_match")
-        print("check",query)
-        result = db.execute(query, {"usubjid": USUBJID}).scalar()
-        
-        if result == 1:
+        subject = find_subject(index, USUBJID)
+        if subject is not None and set(table_list) <= index[subject]:
             return {"USUBJID": USUBJID, "exists": True}
         else:
             raise HTTPException(status_code=404, detail=f"USUBJID {USUBJID} not found in all specified tables")
     
-    # Case 2: Single table - return all unique USUBJIDs
-    if len(table_list) == 1:
-        query = text(f"SELECT DISTINCT USUBJID FROM [{schema}].[{table_list[0]}] WHERE USUBJID IS NOT NULL")
-        print("singletable",query)
-    
-    # Case 3: Multiple tables - return intersection
-    else:
-        base = f"SELECT DISTINCT t0.USUBJID FROM [{schema}].[{table_list[0]}] t0"
-        joins = "".join([f" INNER JOIN [{schema}].[{table}] t{i} ON t0.USUBJID = t{i}.USUBJID" 
-                       for i, table in enumerate(table_list[1:], 1)])
-        query = text(f"{base}{joins} WHERE t0.USUBJID IS NOT NULL")
-        print("multipletable",query)
-    result = db.execute(query).fetchall()
-    return [row[0] for row in result]
+    # Case 2/3: Subjects present in every requested table
+    return subjects_in_all(index, table_list)
+
+@router.post("/RefreshSubjectIndex", tags=["Predefined Template Query"])
+def refresh_subject_index_endpoint(ProjectNumber: str, DatasetType: str, db: Session = Depends(get_db)):
+    """
+    Rebuild the subject index of a project schema. Called by the ingestion pipeline after each load.
+    """
+    schema = f"{ProjectNumber}_{DatasetType.lower()}"
+    try:
+        index = refresh_subject_index(db, engine_files, ProjectNumber, DatasetType.lower())
+        return {"schema": schema.lower(), "subjects": len(index)}
+    except Exception as e:
+        logger.error(f"Subject index refresh failed for {schema}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Subject index refresh failed: {str(e)}")
+
+
+@router.get("/GetSubjectTimeline", tags=["Predefined Template Query"])
+def get_subject_timeline_endpoint(
+    ProjectNumber: str,
+    DatasetType: str,
+    USUBJID: str,
+    StartDate: Optional[date] = None,
+    EndDate: Optional[date] = None,
+    Domains: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    A subject's AE, EX, CM, PR and DS events in date order with study days and source ROWIDs,
+    or only the events overlapping StartDate..EndDate. Domains is comma separated.
+    """
+    if StartDate and EndDate and StartDate > EndDate:
+        raise HTTPException(status_code=400, detail="StartDate must not be after EndDate")
+    domains = [d for d in Domains.split(",") if d.strip()] if Domains else None
+    events = get_subject_timeline(db, engine_files, ProjectNumber, DatasetType.lower(), USUBJID, StartDate, EndDate, domains)
+    return {"USUBJID": USUBJID, "events": events}
 
+@router.post("/RefreshSubjectTimelines", tags=["Predefined Template Query"])
+def refresh_subject_timelines_endpoint(ProjectNumber: str, DatasetType: str, db: Session = Depends(get_db)):
+    """
+    Rebuild the subject timelines of a project schema. Called by the ingestion pipeline after each load.
+    """
+    schema = f"{ProjectNumber}_{DatasetType.lower()}"
+    try:
+        events = refresh_subject_timelines(db, engine_files, ProjectNumber, DatasetType.lower())
+        return {"schema": schema.lower(), "events": events}
+    except Exception as e:
+        logger.error(f"Subject timeline refresh failed for {schema}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Subject timeline refresh failed: {str(e)}")
 
 @router.get("/GetPlaceholderValues", tags=["Predefined Template Query"])
 def get_placeholder_values(
@@ -148,136 +162,207 @@ def get_placeholder_values(
     AdditionalColumn: Optional[str] = None,
     AdditionalFilterValue: Optional[str] = None,
     CategoryId: Optional[int] = None,
-    db_files: Session = Depends(get_files_db),
     db_main: Session = Depends(get_db)
 ):
-    schema = f"{ProjectNumber}_{DatasetType.lower()}"
-    
-    # Handle multiple category filter values
-    if categoryFilterValue and ',' in categoryFilterValue:
-        category_values = [v.strip() for v in categoryFilterValue.split(',')]
-        category_in_list = "','".join(category_values)
-        category_condition = f"{categoryColumn} IN ('{category_in_list}')"
-    else:
-        category_condition = f"{categoryColumn} = :category_filter"
-    
-    # Case 1: Both category and additional filters
-    if categoryColumn and categoryFilterValue and AdditionalFilterValue and AdditionalColumn:
-        if ',' in categoryFilterValue:
-            category_values = [v.strip() for v in categoryFilterValue.split(',')]
-            category_in_list = "','".join(category_values)
-            query = text(f"""
-                SELECT DISTINCT {sourceColumn}
-                FROM [{schema}].[{sourceTable}]
-                WHERE USUBJID = :usubjid 
-                  AND {categoryColumn} IN ('{category_in_list}')
-                  AND {AdditionalColumn} = :additional_filter
-            """)
-            result = db_files.execute(query, {
-                "usubjid": USUBJID,
-                "additional_filter": AdditionalFilterValue
-            }).fetchall()
-        else:
-            query = text(f"""
-                SELECT DISTINCT {sourceColumn}
-                FROM [{schema}].[{sourceTable}]
-                WHERE USUBJID = :usubjid 
-                  AND {categoryColumn} = :category_filter 
-                  AND {AdditionalColumn} = :additional_filter
-            """)
-            result = db_files.execute(query, {
-                "usubjid": USUBJID,
-                "category_filter": categoryFilterValue,
-                "additional_filter": AdditionalFilterValue
-            }).fetchall()
-        
-        db_values = [row[0] for row in result if row[0] is not None and row[0] != '']
-        
-        # Special handling for AEENDTC when values are empty
-        if not db_values and sourceColumn.upper() == 'AEENDTC':
-            db_values = ["ONGOING"]
-        if not db_values and sourceColumn.upper() == 'PRCAT':
-            db_values = ["No categories"]
-        if not db_values and sourceColumn.upper() == 'CMCAT':
-            db_values = ["No categories"]
-        if not db_values and sourceColumn.upper() == 'CMINDC':
-            db_values = ["No indications"]
-        if not db_values and sourceColumn.upper() == 'PRINDC':
-            db_values = ["No indications"]
-            
-    # Case 2: Only category filter
-    elif categoryColumn and categoryFilterValue:
-        if ',' in categoryFilterValue:
-            category_values = [v.strip() for v in categoryFilterValue.split(',')]
-            category_in_list = "','".join(category_values)
-            query = text(f"""
-                SELECT DISTINCT {sourceColumn} 
-                FROM [{schema}].[{sourceTable}] 
-                WHERE USUBJID = :usubjid AND {categoryColumn} IN ('{category_in_list}')
-            """)
-            result = db_files.execute(query, {
-                "usubjid": USUBJID
-            }).fetchall()
-        else:
-            query = text(f"""
-                SELECT DISTINCT {sourceColumn} 
-                FROM [{schema}].[{sourceTable}] 
-                WHERE USUBJID = :usubjid AND {categoryColumn} = :category_filter
-            """)
-            result = db_files.execute(query, {
-                "usubjid": USUBJID, 
-                "category_filter": categoryFilterValue
-            }).fetchall()
-        
-        db_values = [row[0] for row in result if row[0] is not None and row[0] != '']
-        
-        # Special handling for empty values
-        if not db_values and sourceColumn.upper() == 'AEENDTC':
-            db_values = ["ONGOING"]
-        if not db_values and sourceColumn.upper() == 'PRCAT':
-            db_values = ["No categories"]
-        if not db_values and sourceColumn.upper() == 'CMCAT':
-            db_values = ["No categories"]
-        if not db_values and sourceColumn.upper() == 'CMINDC':
-            db_values = ["No indications"]
-        if not db_values and sourceColumn.upper() == 'PRINDC':
-            db_values = ["No indications"]
-    
-    # Case 3: No filters
-    else:
-        query = text(f"""
-            SELECT DISTINCT {sourceColumn} 
-            FROM [{schema}].[{sourceTable}] 
-            WHERE USUBJID = :usubjid
-        """)
-        result = db_files.execute(query, {"usubjid": USUBJID}).fetchall()
-        db_values = [row[0] for row in result if row[0] is not None and row[0] != '']
-        
-        # Special handling for empty values
-        if not db_values and sourceColumn.upper() == 'AEENDTC':
-            db_values = ["ONGOING"]
-        if not db_values and sourceColumn.upper() == 'PRCAT':
-            db_values = ["No categories"]
-        if not db_values and sourceColumn.upper() == 'CMCAT':
-            db_values = ["No categories"]
-        if not db_values and sourceColumn.upper() == 'CMINDC':
-            db_values = ["No indications"]
-        if not db_values and sourceColumn.upper() == 'PRINDC':
-            db_values = ["No indications"]
-            
-    
-    # Filter against LabAnalytes if CategoryId provided
-    if CategoryId:
-        lab_analytes = db_main.query(LabAnalytes).filter(
-            LabAnalytes.CategoryId == CategoryId
-        ).first()
-        
-        if lab_analytes and lab_analytes.LabTest:
-            allowed_tests_lower = [test.lower() for test in lab_analytes.LabTest]
-            filtered_values = [val for val in db_values if val.lower() in allowed_tests_lower]
-            return {"values": filtered_values}
-    
-    return {"values": db_values}
+    # Multiple category filter values are comma separated
+    source = PlaceholderSource(
+        table=sourceTable,
+        column=sourceColumn,
+        category_column=categoryColumn if categoryFilterValue else None,
+        category_values=tuple(v.strip() for v in categoryFilterValue.split(',')) if categoryFilterValue else (),
+        additional_column=AdditionalColumn,
+        additional_value=AdditionalFilterValue,
+        analytes_category=CategoryId,
+    )
+    try:
+        values = resolve_placeholder_values(db_main, engine_files, ProjectNumber, DatasetType.lower(), USUBJID, {"values": source})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"values": values["values"]}
+
+@router.get("/GetPlaceholderValuesBatch", tags=["Predefined Template Query"])
+def get_placeholder_values_batch(
+    ProjectNumber: str,
+    DatasetType: str,
+    USUBJID: str,
+    QueryId: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Values of every placeholder of a predefined query for a subject, in one call.
+    Placeholders without a source table (text fields) are returned with no values; dependent
+    refinements (AdditionalColumn) still go through GetPlaceholderValues.
+    """
+    placeholders = db.query(QueryPlaceholder).filter(QueryPlaceholder.QueryId == QueryId).all()
+    category_ids = {p.CategoryFilter for p in placeholders if p.CategoryFilter}
+    categories = {
+        category.Id: category.LBCAT
+        for category in db.query(QueryCategory).filter(QueryCategory.Id.in_(category_ids)).all()
+    } if category_ids else {}
+
+    sources = {}
+    for p in placeholders:
+        if not _has_source(p):
+            continue
+        category_filter = categories.get(p.CategoryFilter)
+        sources[p.Id] = PlaceholderSource(
+            table=p.SourceTable,
+            column=p.SourceColumn,
+            category_column="LBCAT" if category_filter else None,
+            category_values=tuple(v.strip() for v in category_filter.split(',')) if category_filter else (),
+            analytes_category=p.CategoryFilter if category_filter else None,
+        )
+    try:
+        values = resolve_placeholder_values(db, engine_files, ProjectNumber, DatasetType.lower(), USUBJID, sources)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "queryId": QueryId,
+        "placeholders": [
+            {"id": p.Id, "placeholder": p.PlaceholderText, "values": values.get(p.Id, [])}
+            for p in placeholders
+        ]
+    }
+
+@router.post("/StandardQueryCohort", tags=["Predefined Template Query"])
+def standard_query_cohort(req: CohortQueryRequest):
+    """
+    Evaluate a standard query template for a list of subjects, or all of them, in one set-based query.
+    Dated question types are anchored on each subject's adverse events (or the template's own anchor);
+    the combined table is streamed as CSV or JSON, with no per-subject summary or stored message.
+    """
+    schema = f"{req.ProjectNumber}_{req.FolderName}"
+    query_data = req.STANDARD_QUERY_DATA
+    try:
+        compiled = get_template_registry().get(query_data.get("ModuleType"))
+        persisted = persisted_date_columns(engine_files, schema, get_dataset_version(req.ProjectNumber, req.FolderName))
+        sql, params = cohort_statement(
+            compiled, schema, query_data, req.Subjects, req.SeriousOnly, req.AnchorTerms,
+            persisted=compiled.template.domain in persisted,
+        )
+        stream = stream_cohort(engine_files, sql, params, req.Format, settings.COHORT_MAX_ROWS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Cohort query failed for {schema}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Cohort query failed: {str(e)}")
+
+    if req.Format == "json":
+        return StreamingResponse(stream, media_type="application/json")
+    filename = f"Cohort_{compiled.template.domain}_{query_data.get('QuestionType')}_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
+    return StreamingResponse(stream, media_type="text/csv", headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+@router.get("/GetGraphData", tags=["Predefined Template Query"])
+def get_graph_data(
+    ProjectNumber: str,
+    DatasetType: str,
+    USUBJID: str,
+    Domain: Literal["LB", "VS"] = "LB",
+    Tests: Optional[str] = None,
+    Category: Optional[str] = None,
+    MaxPoints: Optional[int] = None,
+    Method: Literal["lttb", "minmax"] = "lttb",
+):
+    """
+    Numeric lab or vital-sign series of a subject for plotting, one per test, as arrays.
+    Each series is downsampled to MaxPoints (LTTB or per-bucket min/max) and flagged L/H/N
+    against LBSTNRLO/LBSTNRHI; the abnormal counts cover every point, not just the ones returned.
+    Tests is comma separated; all tests are returned when it is omitted.
+    """
+    FolderName = DatasetType.lower()
+    schema = f"{ProjectNumber}_{FolderName}"
+    max_points = MaxPoints or settings.GRAPH_MAX_POINTS
+    if max_points < 3:
+        raise HTTPException(status_code=400, detail="MaxPoints must be at least 3")
+    tests = [t.strip() for t in Tests.split(',') if t.strip()] if Tests else None
+    try:
+        persisted = persisted_date_columns(engine_files, schema, get_dataset_version(ProjectNumber, FolderName))
+        series = graph_series(
+            engine_files, schema, Domain, USUBJID, tests, Category,
+            max_points=max_points, method=Method, persisted=Domain in persisted,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Graph data failed for {schema}/{USUBJID}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Graph data failed: {str(e)}")
+    return {"USUBJID": USUBJID, "domain": Domain, "method": Method, "maxPoints": max_points, "series": series}
+
+@router.post("/StartNarrativeJob", tags=["Predefined Template Query"])
+def start_narrative_job_endpoint(req: NarrativeJobRequest, db: Session = Depends(get_db),
+    current_user: dict = Depends(azure_ad_dependency)):
+    """
+    Queue narratives of one standard query template for many subjects and start it in the background.
+    Results are written to a new session, one question/answer pair per subject; poll GetNarrativeJob.
+    """
+    project = db.query(Project).filter_by(ProjectNumber=req.ProjectNumber).first()
+    if not project:
+        raise HTTPException(status_code=404, detail=f"ProjectNumber '{req.ProjectNumber}' not found.")
+    user = db.query(User).filter(User.ObjectId == current_user.get("ObjectId")).first()
+    query_data = req.STANDARD_QUERY_DATA
+    try:
+        compiled = get_template_registry().get(query_data.get("ModuleType"))
+        compiled.shape(query_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    subjects = req.Subjects
+    if not subjects:
+        index = get_subject_index(db, engine_files, req.ProjectNumber, req.FolderName)
+        subjects = subjects_in_all(index, [compiled.template.domain])
+    if not subjects:
+        raise HTTPException(status_code=400, detail="No subjects to process")
+
+    job = create_narrative_job(
+        db, req.ProjectNumber, req.FolderName, req.Question, req.LlmType, req.ModelName,
+        query_data, subjects, user.UserId if user else None,
+    )
+    start_narrative_job(job.Id)
+    return job_status(db, job)
+
+def _get_job(db: Session, JobId: int) -> NarrativeJob:
+    job = db.query(NarrativeJob).filter(NarrativeJob.Id == JobId).first()
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Narrative job {JobId} not found")
+    return job
+
+@router.get("/GetNarrativeJob", tags=["Predefined Template Query"])
+def get_narrative_job(JobId: int, db: Session = Depends(get_db)):
+    return job_status(db, _get_job(db, JobId))
+
+@router.post("/ResumeNarrativeJob", tags=["Predefined Template Query"])
+def resume_narrative_job(JobId: int, RetryFailed: bool = False, db: Session = Depends(get_db)):
+    """
+    Continue an interrupted or cancelled job from its last finished subject; with RetryFailed
+    failed subjects are run again. A job still running elsewhere is left alone.
+    """
+    job = _get_job(db, JobId)
+    if job.Status == "Completed" or (job.Status == "CompletedWithErrors" and not RetryFailed):
+        raise HTTPException(status_code=400, detail=f"Narrative job {JobId} is {job.Status}")
+    requeue_narrative_job(db, JobId)
+    start_narrative_job(JobId, RetryFailed)
+    db.refresh(job)
+    return job_status(db, job)
+
+@router.post("/CancelNarrativeJob", tags=["Predefined Template Query"])
+def cancel_narrative_job_endpoint(JobId: int, db: Session = Depends(get_db)):
+    job = _get_job(db, JobId)
+    if not cancel_narrative_job(db, JobId):
+        raise HTTPException(status_code=400, detail=f"Narrative job {JobId} is {job.Status}")
+    db.refresh(job)
+    return job_status(db, job)
+
+@router.get("/DownloadNarrativeJob", tags=["Predefined Template Query"])
+def download_narrative_job(JobId: int, db: Session = Depends(get_db)):
+    """Excel bundle of a job's narratives and result rows; subjects not yet finished are listed with their status"""
+    job = _get_job(db, JobId)
+    output = build_job_bundle(db, job)
+    filename = f"Narratives_{job.ProjectNumber}_{JobId}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return StreamingResponse(
+        iter([output.getvalue()]),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 @router.get("/GetMessageById", tags=["Predefined Template Query"])
 def get_message_by_id(
@@ -21,6 +21,79 @@ class Settings(BaseSettings):
     LLMProvider: str
     REDIS_URL: str
     REDIS_CONFIG: int
+    # Conversation memory (checkpointed session threads)
+    MEMORY_WINDOW_TURNS: int = 3
+    MEMORY_SUMMARY_MAX_CHARS: int = 2000
+    MEMORY_MAX_CHECKPOINT_BYTES: int = 65536
+    CHECKPOINT_TTL_MINUTES: int = 1440
+    # Caching
+    DATASET_VERSION_CACHE_SECONDS: int = 30
+    SQL_CACHE_TTL_SECONDS: int = 604800
+    SQL_CACHE_LOCAL_ENTRIES: int = 512
+    RESULT_CACHE_TTL_SECONDS: int = 86400
+    RESULT_CACHE_MAX_BYTES: int = 1048576
+    RESULT_CACHE_LOCAL_ENTRIES: int = 256
+    RESULT_CACHE_LOCAL_MAX_ITEM_BYTES: int = 65536
+    RESULT_CACHE_METRICS_FLUSH_SECONDS: float = 10.0
+    # Coalescing of identical in-flight /Query requests
+    SINGLE_FLIGHT_LOCK_SECONDS: int = 300
+    SINGLE_FLIGHT_WAIT_SECONDS: int = 300
+    SINGLE_FLIGHT_RESULT_TTL_SECONDS: int = 30
+    # LLM gateway (per-deployment budgets, shared via Redis when REDIS_CONFIG is on)
+    LLM_REQUESTS_PER_MINUTE: int = 300
+    LLM_TOKENS_PER_MINUTE: int = 150000
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_DEPLOYMENT_LIMITS: str = ""  # JSON, e.g. {"gpt-4o": {"rpm": 480, "tpm": 80000, "concurrency": 16}}
+    LLM_BATCH_BUDGET_SHARE: float = 0.6
+    LLM_EXPECTED_OUTPUT_TOKENS: int = 500
+    LLM_MAX_RETRIES: int = 4
+    LLM_BACKOFF_BASE_SECONDS: float = 1.0
+    LLM_BACKOFF_MAX_SECONDS: float = 30.0
+    LLM_NODE_METRICS_FLUSH_SECONDS: float = 10.0
+    # Local validation of generated SQL
+    SQL_MAX_ROWS: int = 1000
+    SQL_VALIDATION_MAX_ATTEMPTS: int = 2
+    # Standard queries: return a templated narrative and polish it with the LLM in the background
+    STANDARD_QUERY_FAST_SUMMARY: bool = False
+    # Cohort mode: one set-based standard query over many subjects, streamed
+    COHORT_MAX_ROWS: int = 200000
+    # Graph data: points per downsampled lab/vital-sign series
+    GRAPH_MAX_POINTS: int = 500
+    # Batch narrative jobs: subjects processed at once, how often a running job reports it is alive,
+    # and when a silent running job counts as interrupted
+    NARRATIVE_JOB_WORKERS: int = 4
+    NARRATIVE_JOB_HEARTBEAT_SECONDS: float = 60.0
+    NARRATIVE_JOB_STALE_SECONDS: int = 900
+    # Few-shot examples from positively rated answers
+    FEW_SHOT_TOP_K: int = 3
+    FEW_SHOT_MIN_SCORE: float = 1.0
+    FEW_SHOT_REFRESH_SECONDS: int = 600
+    # Controlled-terminology value index (distinct values per schema, built once per ingest)
+    VALUE_INDEX_COLUMNS: str = "AEDECOD,AEBODSYS,AESEV,AESER,AETOXGR,AEOUT,AEREL,LBTEST,LBTESTCD,LBCAT,CMDECOD,CMCLAS,VSTEST,VSTESTCD,DSDECOD,DSCAT,MHDECOD,EXTRT,ARM,ACTARM"
+    VALUE_INDEX_MAX_VALUES: int = 5000
+    VALUE_INDEX_TTL_SECONDS: int = 604800
+    VALUE_INDEX_MIN_SIMILARITY: float = 0.5
+    VALUE_INDEX_MAX_HINTS: int = 10
+    # Indexes provisioned after each load; (max) key columns are narrowed to INDEX_KEY_LENGTH
+    INDEX_KEY_LENGTH: int = 200
+    # Clustered columnstore instead of a ROWID clustered index, e.g. "LB,VS,EG,ADLB"
+    INDEX_COLUMNSTORE_TABLES: str = ""
+    INDEX_COLUMNSTORE_MIN_ROWS: int = 1000000
+    # Persisted ISO date columns and covering indexes added after each load
+    DATE_COLUMNS_CACHE_SECONDS: int = 300
+    # Per-schema subject index for GetSubjects (rebuilt when the dataset version changes)
+    SUBJECT_INDEX_CACHE_SECONDS: int = 600
+    # Placeholder value lookups for the template UI
+    PLACEHOLDER_VALUES_WORKERS: int = 8
+    # Predefined-query catalog (modules, categories, queries, placeholders, lab analytes)
+    QUERY_CATALOG_CACHE_SECONDS: int = 300
+    # How long a worker trusts its copy of the shared catalog reload counter
+    QUERY_CATALOG_VERSION_CACHE_SECONDS: int = 30
+    # Pooled HTTP connections shared by all LLM clients
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE: int = 20
+    LLM_HTTP_KEEPALIVE_SECONDS: float = 120.0
+    LLM_HTTP_TIMEOUT_SECONDS: float = 120.0
     
     class Config:
         env_file = ".env"
@@ -159,6 +159,25 @@ class UserLLMConfig(Base):
         UniqueConstraint('UserId', name='UQ_User_Config'),
         Index("ix_UserLLMConfig_UserId_ModelId", "UserId", "ModelId"),
     )
+
+class LLMNodeModelConfig(Base):
+    __tablename__ = "LLMNodeModelConfig"
+
+    Id = Column(Integer, primary_key=True, autoincrement=True)
+    UserId = Column(Integer, ForeignKey("User.UserId", ondelete="CASCADE"), nullable=True)  # NULL = default for all users
+    NodeName = Column(String(50), nullable=False)  # e.g. 'call_get_schema', 'check_query', 'wrap_tooltips', 'generate_summary'
+    ProviderId = Column(Integer, ForeignKey("LLMProvider.Id", ondelete="NO ACTION"), nullable=False)
+    ModelId = Column(Integer, ForeignKey("LLMModel.Id", ondelete="NO ACTION"), nullable=False)
+    IsActive = Column(Boolean, nullable=False, default=True, server_default='1')
+    CreatedAt = Column(DateTime, nullable=False, default=datetime.now(timezone.utc))
+    UpdatedAt = Column(DateTime, nullable=False, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+
+    Provider = relationship("LLMProvider")
+    Model = relationship("LLMModel")
+
+    __table_args__ = (
+        UniqueConstraint('UserId', 'NodeName', name='UQ_User_Node'),
+    )
 class DomainClassification(Base):
     __tablename__ = "DomainClassification"
 
@@ -304,4 +323,111 @@ class QueryPlaceholder(Base):
     InputType = Column(String(50), nullable=False)
     SourceTable = Column(String(50), nullable=True)
     SourceColumn = Column(String(50), nullable=True)
-    CategoryFilter = Column(Integer, ForeignKey("QueryCategory.Id"), nullable=True)
\ No newline at end of file
+    CategoryFilter = Column(Integer, ForeignKey("QueryCategory.Id"), nullable=True)
+class SubjectIndex(Base):
+    __tablename__ = "SubjectIndex"
+
+    Id = Column(Integer, primary_key=True, autoincrement=True)
+    SchemaName = Column(String(200), nullable=False)       # '<project>_<folder>', lower case
+    USUBJID = Column(String(200), nullable=False)
+    Domains = Column(String(2000), nullable=False)         # e.g. 'AE,DM,LB': tables the subject has rows in
+    DatasetVersion = Column(String(100), nullable=False)   # dataset version the row was built from
+    RefreshedAt = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+Index(
+    "ix_SubjectIndex_SchemaName_USUBJID",
+    SubjectIndex.SchemaName,
+    SubjectIndex.USUBJID,
+    unique=True
+)
+
+class SubjectTimeline(Base):
+    __tablename__ = "SubjectTimeline"
+
+    Id = Column(Integer, primary_key=True, autoincrement=True)
+    SchemaName = Column(String(200), nullable=False)       # '<project>_<folder>', lower case
+    USUBJID = Column(String(200), nullable=False)
+    Seq = Column(Integer, nullable=False)                  # position in the subject's sorted timeline
+    Domain = Column(String(8), nullable=False)             # AE, EX, CM, PR or DS
+    Term = Column(String(500), nullable=True)
+    Category = Column(String(200), nullable=True)
+    Detail = Column(String(500), nullable=True)            # e.g. 'AESEV=MILD; AESER=N'
+    StartDTC = Column(String(50), nullable=True)           # source ISO 8601 value, possibly partial
+    EndDTC = Column(String(50), nullable=True)
+    StartDate = Column(Date, nullable=True)
+    EndDate = Column(Date, nullable=True)
+    StartDay = Column(Integer, nullable=True)              # study day against DM.RFSTDTC, no day 0
+    EndDay = Column(Integer, nullable=True)
+    SourceRowId = Column(String(50), nullable=True)        # ROWID of the source row
+    DatasetVersion = Column(String(100), nullable=False)
+
+Index(
+    "ix_SubjectTimeline_SchemaName_USUBJID_Seq",
+    SubjectTimeline.SchemaName,
+    SubjectTimeline.USUBJID,
+    SubjectTimeline.Seq,
+    unique=True
+)
+
+class NarrativeJob(Base):
+    __tablename__ = "NarrativeJob"
+
+    Id = Column(Integer, primary_key=True, autoincrement=True)
+    ProjectNumber = Column(String(80), ForeignKey("Project.ProjectNumber", ondelete="CASCADE"), nullable=False)
+    FolderName = Column(String(50), nullable=False)
+    SessionId = Column(Integer, ForeignKey("ClinicalQuerySession.Id"), nullable=True)  # session the narratives are written to
+    Question = Column(Text, nullable=False)
+    StandardQueryData = Column(JSON, nullable=False)       # template request; Usubject is set per subject
+    LlmType = Column(String(50), nullable=False)
+    ModelName = Column(String(100), nullable=False)
+    Status = Column(String(30), nullable=False)            # 'Queued', 'Running', 'Completed', 'CompletedWithErrors', 'Cancelled'
+    SubjectCount = Column(Integer, nullable=False, default=0, server_default='0')
+    CompletedCount = Column(Integer, nullable=False, default=0, server_default='0')
+    FailedCount = Column(Integer, nullable=False, default=0, server_default='0')
+    CreatedBy = Column(Integer, ForeignKey("User.UserId"), nullable=True)
+    CreatedAt = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    StartedAt = Column(DateTime, nullable=True)
+    HeartbeatAt = Column(DateTime, nullable=True)          # refreshed while a worker runs the job
+    FinishedAt = Column(DateTime, nullable=True)
+
+    session = relationship("ClinicalQuerySession")
+
+Index(
+    "ix_NarrativeJob_ProjectNumber_CreatedAt",
+    NarrativeJob.ProjectNumber,
+    NarrativeJob.CreatedAt.desc()
+)
+
+Index(
+    "ix_NarrativeJob_Status",
+    NarrativeJob.Status
+)
+
+class NarrativeJobSubject(Base):
+    __tablename__ = "NarrativeJobSubject"
+
+    Id = Column(Integer, primary_key=True, autoincrement=True)
+    JobId = Column(Integer, ForeignKey("NarrativeJob.Id", ondelete="CASCADE"), nullable=False)
+    Seq = Column(Integer, nullable=False)                  # position in the job; QnAGroupId of its messages
+    USUBJID = Column(String(200), nullable=False)
+    Status = Column(String(20), nullable=False)            # 'Pending', 'Running', 'Completed', 'Failed'
+    Attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    MessageId = Column(BigInteger, ForeignKey("ClinicalQueryMessage.Id"), nullable=True)  # assistant message with the narrative
+    ErrorNote = Column(Text, nullable=True)
+    StartedAt = Column(DateTime, nullable=True)
+    FinishedAt = Column(DateTime, nullable=True)
+
+    job = relationship("NarrativeJob", backref="Subjects")
+
+Index(
+    "ix_NarrativeJobSubject_JobId_USUBJID",
+    NarrativeJobSubject.JobId,
+    NarrativeJobSubject.USUBJID,
+    unique=True
+)
+
+Index(
+    "ix_NarrativeJobSubject_JobId_Status",
+    NarrativeJobSubject.JobId,
+    NarrativeJobSubject.Status
+)
@@ -68,6 +68,25 @@ class QueryRequest(BaseModel):
     Type: Literal['Table', 'Summary']
     FlowType: Literal['AI', 'STANDARD'] # New field to specify flow type
     STANDARD_QUERY_DATA: Optional[dict] = None  # Optional field for standard query data
+    FastSummary: Optional[bool] = None  # STANDARD flow: templated narrative now, LLM narrative in the background
+
+class CohortQueryRequest(BaseModel):
+    ProjectNumber: str
+    FolderName: str
+    STANDARD_QUERY_DATA: dict           # ModuleType, QuestionType and filters as for /Query; Usubject and dates are not used
+    Subjects: Optional[List[str]] = None  # all subjects when empty
+    SeriousOnly: bool = False           # AE-anchored question types: only serious events (AESER = 'Y')
+    AnchorTerms: Optional[List[str]] = None  # AE-anchored question types: only these AEDECOD terms
+    Format: Literal['csv', 'json'] = 'csv'
+
+class NarrativeJobRequest(BaseModel):
+    ProjectNumber: str
+    FolderName: str
+    Question: str                       # template text; the subject is appended per narrative
+    LlmType: str
+    ModelName: str
+    STANDARD_QUERY_DATA: dict           # as for /Query; Usubject is set per subject
+    Subjects: Optional[List[str]] = None  # all subjects with rows in the template's domain when empty
 
 
 class QuerySessionOut(BaseModel):
@@ -121,6 +140,13 @@ class UpdateLLMConfigInput(BaseModel):
     ProviderId: int
     ModelId: int
 
+class UpdateLLMNodeConfigInput(BaseModel):
+    UserId: Optional[int] = None  # None = default for all users
+    NodeName: str
+    ProviderId: int
+    ModelId: int
+    IsActive: bool = True
+
 class TableConfig(BaseModel):
     FolderName: str
     TableName: str
@@ -0,0 +1,74 @@
+from sqlalchemy import func
+from app.db.session import SessionLocal
+from app.models.user import UploadBatch, UploadBatchFile
+from app.core.config import settings
+from app.utils.local_cache import LocalTTLCache
+from app.utils.redis_client import get_redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+DATASET_VERSION_PREFIX = "dataset_version"
+
+_version_cache = LocalTTLCache(max_entries=512, ttl_seconds=settings.DATASET_VERSION_CACHE_SECONDS)
+
+def _schema_name(ProjectNumber: str, FolderName: str) -> str:
+    return f"{ProjectNumber}_{FolderName}".lower()
+
+def _processed_stamp(ProjectNumber: str, FolderName: str) -> str:
+    """Latest processed upload for the project folder, as recorded by the ingestion pipeline"""
+    db = SessionLocal()
+    try:
+        last_processed, processed_count = (
+            db.query(func.max(UploadBatchFile.ProcessedAt), func.count(UploadBatchFile.Id))
+            .join(UploadBatch, UploadBatchFile.BatchId == UploadBatch.Id)
+            .filter(
+                UploadBatch.ProjectNumber == ProjectNumber,
+                func.lower(UploadBatchFile.Domain) == FolderName.lower(),
+                UploadBatchFile.ProcessedAt.isnot(None)
+            )
+            .one()
+        )
+        stamp = last_processed.strftime("%Y%m%d%H%M%S") if last_processed else "0"
+        return f"{stamp}.{processed_count}"
+    finally:
+        db.close()
+
+def get_dataset_version(ProjectNumber: str, FolderName: str) -> str:
+    """
+    Return an opaque version string for the datasets in a project schema.
+
+    The version changes whenever the ingestion pipeline processes new files for
+    the folder or a table is replaced/dropped (see bump_dataset_version), so it
+    can be embedded in cache keys to invalidate derived data.
+    """
+    schema = _schema_name(ProjectNumber, FolderName)
+    version = _version_cache.get(schema)
+    if version is not None:
+        return version
+
+    counter = "0"
+    if settings.REDIS_CONFIG:
+        try:
+            counter = get_redis_client().get(f"{DATASET_VERSION_PREFIX}:{schema}") or "0"
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not read dataset version counter for {schema}: {str(e)}")
+    try:
+        stamp = _processed_stamp(ProjectNumber, FolderName)
+    except Exception as e:
+        logger.warning(f"[WARNING] Could not read upload history for {schema}: {str(e)}")
+        stamp = "0"
+
+    version = f"{counter}.{stamp}"
+    _version_cache.set(schema, version)
+    return version
+
+def bump_dataset_version(ProjectNumber: str, FolderName: str) -> None:
+    """Invalidate everything keyed on the schema's dataset version"""
+    schema = _schema_name(ProjectNumber, FolderName)
+    _version_cache.delete(schema)
+    if settings.REDIS_CONFIG:
+        try:
+            get_redis_client().incr(f"{DATASET_VERSION_PREFIX}:{schema}")
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not bump dataset version for {schema}: {str(e)}")
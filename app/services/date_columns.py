@@ -0,0 +1,123 @@
+from sqlalchemy import inspect, text, bindparam
+from app.core.config import settings
+from app.standard_query.templates import DOMAIN_TEMPLATES
+from app.services.table_indexes import clustered_index_type, is_max_column, narrow_key_column
+from app.utils.local_cache import LocalTTLCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+_persisted_cache = LocalTTLCache(max_entries=512, ttl_seconds=settings.DATE_COLUMNS_CACHE_SECONDS)
+
+# Types that can be neither index keys nor included columns
+_UNINDEXABLE = {"TEXT", "NTEXT", "IMAGE", "XML"}
+
+def date_templates():
+    """Domain templates that have a persisted date column"""
+    return [template for template in DOMAIN_TEMPLATES.values() if template.date_key]
+
+def index_name(template) -> str:
+    return f"IX_{template.domain}_USUBJID_{template.date_key}"
+
+def add_date_column_sql(schema: str, table_name: str, template) -> str:
+    # Style 23 (yyyy-mm-dd) keeps the conversion deterministic, which PERSISTED requires
+    return (
+        f"ALTER TABLE [{schema}].[{table_name}] ADD [{template.date_key}] "
+        f"AS TRY_CONVERT(DATE, LEFT([{template.date_column}], 10), 23) PERSISTED"
+    )
+
+def plan_covering_index(template, columns: dict):
+    """
+    Key and included columns of the domain's covering index.
+
+    Keys are USUBJID, the test/term the modules partition by and the persisted
+    date, in that order, so one subject's rows for a test are a range scan in
+    date order. The selected columns and filter columns the table has are
+    included so the modules never go back to the heap. columns maps upper-case
+    column names to their reflected type name.
+    """
+    keys = ["USUBJID"] + ([template.partition_key] if template.partition_key else []) + [template.date_key]
+    wanted = [col.name for col in template.columns] + [flt.column for flt in template.filters] + [template.date_column]
+    include = []
+    for name in wanted:
+        if name in keys or name in include or name not in columns or columns[name] in _UNINDEXABLE:
+            continue
+        include.append(name)
+    return keys, include
+
+def create_index_sql(schema: str, table_name: str, template, keys, include) -> str:
+    sql = f"CREATE NONCLUSTERED INDEX [{index_name(template)}] ON [{schema}].[{table_name}] ({', '.join(f'[{key}]' for key in keys)})"
+    return sql + (f" INCLUDE ({', '.join(f'[{name}]' for name in include)})" if include else "")
+
+def provision_date_columns(engine, schema: str) -> dict:
+    """
+    Add the persisted date column and covering index to every domain table of
+    the schema that lacks them. Safe to re-run: existing columns and indexes
+    are left alone. Returns what was done per table.
+    """
+    if engine.dialect.name != "mssql":
+        return {"status": "unsupported", "dialect": engine.dialect.name, "tables": {}}
+    inspector = inspect(engine)
+    tables = {name.upper(): name for name in inspector.get_table_names(schema=schema)}
+    report = {}
+    for template in date_templates():
+        table_name = tables.get(template.domain)
+        if table_name is None:
+            continue
+        reflected = {col["name"].upper(): col for col in inspector.get_columns(table_name, schema=schema)}
+        if template.date_column not in reflected:
+            report[table_name] = {"skipped": f"no {template.date_column} column"}
+            continue
+        entry = {"date_column": "exists", "index": "exists"}
+        with engine.begin() as conn:
+            if clustered_index_type(conn, schema, table_name) == "CLUSTERED COLUMNSTORE":
+                # Columnstore tables cannot hold persisted computed columns; the modules keep the expression
+                report[table_name] = {"skipped": "clustered columnstore table"}
+                continue
+            if template.date_key not in reflected:
+                conn.execute(text(add_date_column_sql(schema, table_name, template)))
+                reflected[template.date_key] = {"name": template.date_key, "type": None}
+                entry["date_column"] = "added"
+            existing = {index["name"] for index in inspector.get_indexes(table_name, schema=schema)}
+            if index_name(template) not in existing:
+                keys, include = plan_covering_index(template, {name: type(col["type"]).__name__.upper() for name, col in reflected.items()})
+                missing = [key for key in keys if key not in reflected]
+                if missing:
+                    entry["index"] = f"skipped, missing {', '.join(missing)}"
+                elif all(narrow_key_column(conn, schema, table_name, reflected[key]) for key in keys if key != template.date_key and is_max_column(reflected[key])):
+                    conn.execute(text(create_index_sql(schema, table_name, template, keys, include)))
+                    entry["index"] = "added"
+                else:
+                    entry["index"] = "skipped, key values too long"
+        report[table_name] = entry
+    _persisted_cache.clear()
+    return {"status": "ok", "dialect": engine.dialect.name, "tables": report}
+
+def persisted_date_columns(engine, schema: str, dataset_version: str) -> frozenset:
+    """
+    Domains of the schema whose table has its persisted date column, read once
+    per dataset version. Empty (the modules keep computing dates per row) on
+    other dialects or when the catalog cannot be read.
+    """
+    key = f"{schema.lower()}:{dataset_version}"
+    domains = _persisted_cache.get(key)
+    if domains is not None:
+        return domains
+    domains = frozenset()
+    if engine.dialect.name == "mssql":
+        wanted = {template.date_key: template.domain for template in date_templates()}
+        query = text(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = :schema AND COLUMN_NAME IN :columns"
+        ).bindparams(bindparam("columns", expanding=True))
+        try:
+            with engine.connect() as conn:
+                rows = conn.execute(query, {"schema": schema, "columns": list(wanted)}).all()
+            domains = frozenset(
+                wanted[column.upper()] for table_name, column in rows
+                if wanted.get(column.upper()) == table_name.upper()
+            )
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not read persisted date columns for {schema}: {str(e)}")
+    _persisted_cache.set(key, domains)
+    return domains
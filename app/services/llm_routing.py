@@ -0,0 +1,32 @@
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.user import LLMNodeModelConfig, LLMProvider, LLMModel
+
+# Graph nodes that call an LLM and can be routed to their own deployment
+ROUTABLE_NODES = ("call_get_schema", "generate_query", "check_query", "wrap_tooltips", "generate_summary")
+
+def resolve_node_models(db: Session, UserId: Optional[int], LlmType: str, ModelName: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Map each routable node to (LlmType, ModelName).
+
+    Nodes without an active LLMNodeModelConfig row use the user's chosen model.
+    A row for the user overrides the default row (UserId NULL) for the same node.
+    """
+    node_models = {node: (LlmType, ModelName) for node in ROUTABLE_NODES}
+    rows = (
+        db.query(LLMNodeModelConfig.UserId, LLMNodeModelConfig.NodeName, LLMProvider.Name, LLMModel.ModelName)
+        .join(LLMProvider, LLMNodeModelConfig.ProviderId == LLMProvider.Id)
+        .join(LLMModel, LLMNodeModelConfig.ModelId == LLMModel.Id)
+        .filter(
+            LLMNodeModelConfig.IsActive == True,
+            LLMProvider.IsActive == True,
+            LLMModel.IsActive == True,
+            (LLMNodeModelConfig.UserId == UserId) | (LLMNodeModelConfig.UserId.is_(None))
+        )
+        .all()
+    )
+    # Defaults first so user-specific rows win
+    for row_user_id, node_name, provider_name, model_name in sorted(rows, key=lambda r: r[0] is not None):
+        if node_name in node_models:
+            node_models[node_name] = (provider_name, model_name)
+    return node_models
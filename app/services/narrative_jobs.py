@@ -0,0 +1,345 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import List, Optional
+import pandas as pd
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from app.ai.llm_gateway import llm_priority, BATCH
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import ClinicalQuerySession, ClinicalQueryMessage, NarrativeJob, NarrativeJobSubject
+from app.services.llm_routing import resolve_node_models
+from app.standard_query.narratives import parse_query_result
+from app.standard_query.query_processor import process_standard_query
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs that can be queued again to retry failed or cancelled subjects
+RESUMABLE = ("CompletedWithErrors", "Cancelled")
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def create_narrative_job(
+    db: Session,
+    ProjectNumber: str,
+    FolderName: str,
+    Question: str,
+    LlmType: str,
+    ModelName: str,
+    query_data: dict,
+    subjects: List[str],
+    UserId: Optional[int] = None,
+) -> NarrativeJob:
+    """Queued job with one Pending row per subject and the session its narratives are written to"""
+    subjects = list(dict.fromkeys(s.strip() for s in subjects if s and s.strip()))
+    session = ClinicalQuerySession(
+        ProjectNumber=ProjectNumber,
+        Title=f"Batch narratives: {Question}",
+        IsFavorite=False,
+        CreatedAt=_now(),
+        UpdatedAt=_now(),
+    )
+    db.add(session)
+    db.flush()
+    job = NarrativeJob(
+        ProjectNumber=ProjectNumber,
+        FolderName=FolderName,
+        SessionId=session.Id,
+        Question=Question,
+        StandardQueryData={k: v for k, v in query_data.items() if k != "Usubject"},
+        LlmType=LlmType,
+        ModelName=ModelName,
+        Status="Queued",
+        SubjectCount=len(subjects),
+        CreatedBy=UserId,
+        CreatedAt=_now(),
+    )
+    db.add(job)
+    db.flush()
+    db.bulk_insert_mappings(NarrativeJobSubject, [
+        {"JobId": job.Id, "Seq": seq, "USUBJID": usubjid, "Status": "Pending", "Attempts": 0}
+        for seq, usubjid in enumerate(subjects, start=1)
+    ])
+    db.commit()
+    db.refresh(job)
+    return job
+
+def claim_job(db: Session, JobId: int) -> bool:
+    """
+    Mark the job Running for this worker. Succeeds for queued jobs and for
+    running ones whose heartbeat is older than NARRATIVE_JOB_STALE_SECONDS,
+    so only one worker across processes runs a job at a time.
+    """
+    stale = _now() - timedelta(seconds=settings.NARRATIVE_JOB_STALE_SECONDS)
+    claimed = (
+        db.query(NarrativeJob)
+        .filter(
+            NarrativeJob.Id == JobId,
+            or_(
+                NarrativeJob.Status == "Queued",
+                (NarrativeJob.Status == "Running") & (or_(NarrativeJob.HeartbeatAt.is_(None), NarrativeJob.HeartbeatAt < stale)),
+            ),
+        )
+        .update({"Status": "Running", "HeartbeatAt": _now(), "StartedAt": func.coalesce(NarrativeJob.StartedAt, _now())}, synchronize_session=False)
+    )
+    db.commit()
+    return claimed == 1
+
+def _failure(answer: str, table_response: str) -> Optional[str]:
+    """Error text when the pipeline reported one instead of a result"""
+    summary = str(json.loads(table_response).get("summary", ""))
+    return summary if summary.startswith("Error") else None
+
+def _run_subject(job: dict, subject_id: int, seq: int, usubjid: str, node_models: dict, session_factory):
+    db = session_factory()
+    try:
+        state = db.query(NarrativeJob.Status).filter(NarrativeJob.Id == job["Id"]).scalar()
+        if state != "Running":
+            return
+        db.query(NarrativeJobSubject).filter(NarrativeJobSubject.Id == subject_id).update(
+            {"Status": "Running", "Attempts": NarrativeJobSubject.Attempts + 1, "StartedAt": _now(), "ErrorNote": None},
+            synchronize_session=False,
+        )
+        db.commit()
+
+        question = f"{job['Question']} (USUBJID: {usubjid})"
+        query_data = {**job["StandardQueryData"], "Usubject": usubjid}
+        try:
+            # Batch lane: admitted under LLM_BATCH_BUDGET_SHARE so interactive /Query calls keep their budget.
+            # Each subject gets its own summary thread so narratives do not share conversation memory.
+            with llm_priority(BATCH):
+                answer, table_response, run_info = process_standard_query(
+                    job["ProjectNumber"], job["FolderName"], question, job["LlmType"], job["ModelName"],
+                    query_data, f"{job['SessionId']}-{seq}", node_models,
+                )
+            error = _failure(answer, table_response)
+        except Exception as e:
+            error = f"Error in standard query processing: {str(e)}"
+
+        if error:
+            logger.warning(f"[WARNING] Narrative job {job['Id']} failed for {usubjid}: {error}")
+            db.query(NarrativeJobSubject).filter(NarrativeJobSubject.Id == subject_id).update(
+                {"Status": "Failed", "ErrorNote": error, "FinishedAt": _now()}, synchronize_session=False,
+            )
+        else:
+            # Messages and the subject's checkpoint are committed together, so a resumed job never duplicates them
+            now = _now()
+            db.add(ClinicalQueryMessage(
+                SessionId=job["SessionId"], Sender="user", Content=question,
+                Metadata={"NarrativeJobId": job["Id"], "USUBJID": usubjid}, CreatedAt=now,
+                QueryBy=job["CreatedBy"], ViewType="Summary", QnAGroupId=seq, FlowType="STANDARD",
+            ))
+            assistant_msg = ClinicalQueryMessage(
+                SessionId=job["SessionId"], Sender="assistant", Content=answer,
+                Metadata={"FolderName": job["FolderName"], "ModelName": job["ModelName"], "LLMType": job["LlmType"],
+                          "NarrativeJobId": job["Id"], "USUBJID": usubjid, **run_info},
+                CreatedAt=now, QueryBy=job["CreatedBy"], ViewType="Summary", QnAGroupId=seq, FlowType="STANDARD",
+                StandardTableContent=json.loads(table_response),
+            )
+            db.add(assistant_msg)
+            db.flush()
+            db.query(NarrativeJobSubject).filter(NarrativeJobSubject.Id == subject_id).update(
+                {"Status": "Completed", "MessageId": assistant_msg.Id, "FinishedAt": now}, synchronize_session=False,
+            )
+        db.query(NarrativeJob).filter(NarrativeJob.Id == job["Id"]).update({"HeartbeatAt": _now()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _status_counts(db: Session, JobId: int) -> dict:
+    return dict(
+        db.query(NarrativeJobSubject.Status, func.count(NarrativeJobSubject.Id))
+        .filter(NarrativeJobSubject.JobId == JobId)
+        .group_by(NarrativeJobSubject.Status)
+        .all()
+    )
+
+def _refresh_counts(db: Session, JobId: int) -> dict:
+    counts = _status_counts(db, JobId)
+    db.query(NarrativeJob).filter(NarrativeJob.Id == JobId).update(
+        {"CompletedCount": counts.get("Completed", 0), "FailedCount": counts.get("Failed", 0)}, synchronize_session=False,
+    )
+    return counts
+
+def _keep_alive(JobId: int, stop: threading.Event, session_factory):
+    """Refresh the job's heartbeat until stopped, so a slow subject does not make the job look interrupted"""
+    while not stop.wait(settings.NARRATIVE_JOB_HEARTBEAT_SECONDS):
+        db = session_factory()
+        try:
+            db.query(NarrativeJob).filter(NarrativeJob.Id == JobId, NarrativeJob.Status == "Running").update(
+                {"HeartbeatAt": _now()}, synchronize_session=False,
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not refresh heartbeat of narrative job {JobId}: {str(e)}")
+        finally:
+            db.close()
+
+def run_narrative_job(JobId: int, retry_failed: bool = False, session_factory=SessionLocal):
+    """
+    Run a job's remaining subjects on NARRATIVE_JOB_WORKERS threads.
+
+    Pending subjects, and Running ones left by an interrupted worker, are
+    processed (Failed ones too with retry_failed). Each finished subject is a
+    checkpoint: its messages and status are committed together, so running
+    the job again continues where it stopped. HeartbeatAt is refreshed every
+    NARRATIVE_JOB_HEARTBEAT_SECONDS while the job runs.
+    """
+    db = session_factory()
+    stop = threading.Event()
+    try:
+        if not claim_job(db, JobId):
+            logger.info(f"Narrative job {JobId} is finished or running elsewhere")
+            return
+        threading.Thread(
+            target=_keep_alive, args=(JobId, stop, session_factory), name=f"narrative-job-{JobId}-heartbeat", daemon=True,
+        ).start()
+        job = db.query(NarrativeJob).filter(NarrativeJob.Id == JobId).first()
+        snapshot = {
+            "Id": job.Id, "ProjectNumber": job.ProjectNumber, "FolderName": job.FolderName, "SessionId": job.SessionId,
+            "Question": job.Question, "StandardQueryData": dict(job.StandardQueryData or {}), "LlmType": job.LlmType,
+            "ModelName": job.ModelName, "CreatedBy": job.CreatedBy,
+        }
+        node_models = resolve_node_models(db, job.CreatedBy, job.LlmType, job.ModelName)
+        statuses = ["Pending", "Running"] + (["Failed"] if retry_failed else [])
+        todo = (
+            db.query(NarrativeJobSubject.Id, NarrativeJobSubject.Seq, NarrativeJobSubject.USUBJID)
+            .filter(NarrativeJobSubject.JobId == JobId, NarrativeJobSubject.Status.in_(statuses))
+            .order_by(NarrativeJobSubject.Seq)
+            .all()
+        )
+        db.close()
+
+        if todo:
+            with ThreadPoolExecutor(max_workers=max(1, min(settings.NARRATIVE_JOB_WORKERS, len(todo)))) as executor:
+                futures = [
+                    executor.submit(_run_subject, snapshot, row.Id, row.Seq, row.USUBJID, node_models, session_factory)
+                    for row in todo
+                ]
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"Narrative job {JobId} worker failed: {str(e)}", exc_info=True)
+
+        db = session_factory()
+        counts = _refresh_counts(db, JobId)
+        job = db.query(NarrativeJob).filter(NarrativeJob.Id == JobId).first()
+        if job.Status == "Running":
+            remaining = counts.get("Pending", 0) + counts.get("Running", 0)
+            if remaining:
+                # Stopped early (e.g. a worker died); left Running so the stale heartbeat lets it be resumed
+                logger.warning(f"[WARNING] Narrative job {JobId} stopped with {remaining} subjects left")
+            else:
+                job.Status = "CompletedWithErrors" if counts.get("Failed") else "Completed"
+                job.FinishedAt = _now()
+        db.query(ClinicalQuerySession).filter(ClinicalQuerySession.Id == job.SessionId).update({"UpdatedAt": func.now()}, synchronize_session=False)
+        db.commit()
+    finally:
+        stop.set()
+        db.close()
+
+def requeue_narrative_job(db: Session, JobId: int) -> bool:
+    """Queue a finished job with failed or unprocessed subjects again"""
+    requeued = (
+        db.query(NarrativeJob)
+        .filter(NarrativeJob.Id == JobId, NarrativeJob.Status.in_(RESUMABLE))
+        .update({"Status": "Queued", "FinishedAt": None}, synchronize_session=False)
+    )
+    db.commit()
+    return requeued == 1
+
+def start_narrative_job(JobId: int, retry_failed: bool = False):
+    """Run the job on a daemon thread so the request that queued it returns at once"""
+    thread = threading.Thread(target=run_narrative_job, args=(JobId, retry_failed), name=f"narrative-job-{JobId}", daemon=True)
+    thread.start()
+    return thread
+
+def resume_interrupted_jobs(session_factory=SessionLocal) -> list:
+    """Start queued jobs and running jobs whose worker stopped sending heartbeats; called at startup"""
+    stale = _now() - timedelta(seconds=settings.NARRATIVE_JOB_STALE_SECONDS)
+    db = session_factory()
+    try:
+        ids = [
+            row.Id for row in db.query(NarrativeJob.Id).filter(or_(
+                NarrativeJob.Status == "Queued",
+                (NarrativeJob.Status == "Running") & (or_(NarrativeJob.HeartbeatAt.is_(None), NarrativeJob.HeartbeatAt < stale)),
+            )).all()
+        ]
+    finally:
+        db.close()
+    for JobId in ids:
+        logger.info(f"Resuming narrative job {JobId}")
+        start_narrative_job(JobId)
+    return ids
+
+def cancel_narrative_job(db: Session, JobId: int) -> bool:
+    """Stop a job after the subjects in progress; finished subjects are kept"""
+    cancelled = (
+        db.query(NarrativeJob)
+        .filter(NarrativeJob.Id == JobId, NarrativeJob.Status.in_(["Queued", "Running"]))
+        .update({"Status": "Cancelled", "FinishedAt": _now()}, synchronize_session=False)
+    )
+    db.commit()
+    return cancelled == 1
+
+def job_status(db: Session, job: NarrativeJob) -> dict:
+    counts = _status_counts(db, job.Id)
+    return {
+        "JobId": job.Id,
+        "SessionId": job.SessionId,
+        "Status": job.Status,
+        "Subjects": job.SubjectCount,
+        "Pending": counts.get("Pending", 0),
+        "Running": counts.get("Running", 0),
+        "Completed": counts.get("Completed", 0),
+        "Failed": counts.get("Failed", 0),
+        "CreatedAt": job.CreatedAt,
+        "StartedAt": job.StartedAt,
+        "FinishedAt": job.FinishedAt,
+    }
+
+def build_job_bundle(db: Session, job: NarrativeJob) -> BytesIO:
+    """
+    Excel workbook of a job: a Narratives sheet with one row per subject
+    (status, narrative, SQL, error) and a Data sheet with every subject's
+    result rows.
+    """
+    rows = (
+        db.query(NarrativeJobSubject, ClinicalQueryMessage)
+        .outerjoin(ClinicalQueryMessage, ClinicalQueryMessage.Id == NarrativeJobSubject.MessageId)
+        .filter(NarrativeJobSubject.JobId == job.Id)
+        .order_by(NarrativeJobSubject.Seq)
+        .all()
+    )
+    narratives = []
+    data = []
+    for subject, message in rows:
+        content = {}
+        if message is not None and message.Content:
+            try:
+                content = json.loads(message.Content)
+            except ValueError:
+                content = {"summary": message.Content}
+        narratives.append({
+            "USUBJID": subject.USUBJID,
+            "Status": subject.Status,
+            "Narrative": content.get("summary", ""),
+            "Query": content.get("query", ""),
+            "Error": subject.ErrorNote or "",
+        })
+        table = (message.StandardTableContent or {}).get("summary") if message is not None else None
+        if table and not str(table).startswith(("No data found", "Error")):
+            data.extend({"USUBJID": subject.USUBJID, **record} for record in parse_query_result(table))
+
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        pd.DataFrame(narratives, columns=["USUBJID", "Status", "Narrative", "Query", "Error"]).to_excel(writer, index=False, sheet_name="Narratives")
+        (pd.DataFrame(data) if data else pd.DataFrame(columns=["USUBJID"])).to_excel(writer, index=False, sheet_name="Data")
+    output.seek(0)
+    return output
@@ -0,0 +1,90 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.services.dataset_version import get_dataset_version
+from app.services.query_catalog import get_query_catalog
+from app.services.result_cache import note_fetched_rows, run_cached_values
+from app.standard_query.sql_runner import bind_statement
+
+# Shown instead of an empty list so the template can still be asked
+EMPTY_VALUES = {
+    "AEENDTC": "ONGOING",
+    "PRCAT": "No categories",
+    "CMCAT": "No categories",
+    "CMINDC": "No indications",
+    "PRINDC": "No indications",
+}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z0-9_]+$")
+
+@dataclass(frozen=True)
+class PlaceholderSource:
+    """Where a placeholder's choices come from: distinct values of one column for the subject"""
+    table: str
+    column: str
+    category_column: Optional[str] = None
+    category_values: Tuple[str, ...] = ()
+    additional_column: Optional[str] = None
+    additional_value: Optional[str] = None
+    analytes_category: Optional[int] = None
+
+def _identifier(name: str) -> str:
+    if not name or not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid table or column name: {name}")
+    return f"[{name}]"
+
+def distinct_statement(schema: str, usubjid: str, source: PlaceholderSource):
+    """Bound SELECT DISTINCT for a source; the additional filter only applies together with a category filter"""
+    where = ["USUBJID = :usubjid"]
+    params = {"usubjid": usubjid}
+    if source.category_column and source.category_values:
+        where.append(f"{_identifier(source.category_column)} IN :category_filter")
+        params["category_filter"] = list(source.category_values)
+        if source.additional_column and source.additional_value:
+            where.append(f"{_identifier(source.additional_column)} = :additional_filter")
+            params["additional_filter"] = source.additional_value
+    sql = f"SELECT DISTINCT {_identifier(source.column)} AS value FROM [{schema}].{_identifier(source.table)} WHERE {' AND '.join(where)}"
+    return sql, params
+
+def _fetch_values(engine, sql: str, params: dict) -> list:
+    """The statement's values as the endpoint returns them (dates as ISO strings)"""
+    with engine.connect() as conn:
+        rows = conn.execute(bind_statement(sql, params), params).fetchall()
+    note_fetched_rows(len(rows))
+    return jsonable_encoder([row[0] for row in rows])
+
+def _values(engine, schema: str, dataset_version: str, usubjid: str, source: PlaceholderSource, analytes: dict) -> list:
+    sql, params = distinct_statement(schema, usubjid, source)
+    fetched = run_cached_values(schema, dataset_version, sql, params, lambda: _fetch_values(engine, sql, params))
+    values = [value for value in fetched if value is not None and value != ""]
+    if not values and source.column.upper() in EMPTY_VALUES:
+        values = [EMPTY_VALUES[source.column.upper()]]
+    allowed = analytes.get(source.analytes_category) if source.analytes_category else None
+    if allowed:
+        values = [value for value in values if str(value).lower() in allowed]
+    return values
+
+def resolve_placeholder_values(db: Session, engine, ProjectNumber: str, FolderName: str, usubjid: str, sources: dict) -> dict:
+    """
+    Values for several placeholders of a subject at once (name -> PlaceholderSource).
+
+    Each distinct source is one bound statement whose fetched values go through
+    the result cache, so repeats for the same subject and filters cost nothing
+    until the next ingest; the remaining statements run concurrently on the
+    shared engine.
+    """
+    schema = f"{ProjectNumber}_{FolderName}"
+    dataset_version = get_dataset_version(ProjectNumber, FolderName)
+    analytes = get_query_catalog(db).analytes if any(source.analytes_category for source in sources.values()) else {}
+    unique = list(dict.fromkeys(sources.values()))
+    if len(unique) == 1:
+        results = [_values(engine, schema, dataset_version, usubjid, unique[0], analytes)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(settings.PLACEHOLDER_VALUES_WORKERS, len(unique) or 1)) as executor:
+            results = list(executor.map(lambda source: _values(engine, schema, dataset_version, usubjid, source, analytes), unique))
+    by_source = dict(zip(unique, results))
+    return {name: by_source[source] for name, source in sources.items()}
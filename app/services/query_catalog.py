@@ -0,0 +1,133 @@
+import json
+import hashlib
+from threading import Lock
+from sqlalchemy.orm import Session, selectinload
+from app.core.config import settings
+from app.models.user import QueryModule, QueryCategory, PredefinedQuery, LabAnalytes
+from app.utils.local_cache import LocalTTLCache
+from app.utils.redis_client import get_redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+QUERY_CATALOG_VERSION_KEY = "query_catalog_version"
+
+_catalog_cache = LocalTTLCache(max_entries=1, ttl_seconds=settings.QUERY_CATALOG_CACHE_SECONDS)
+_counter_cache = LocalTTLCache(max_entries=1, ttl_seconds=settings.QUERY_CATALOG_VERSION_CACHE_SECONDS)
+_load_lock = Lock()
+
+class QueryCatalog:
+    """
+    The predefined-query configuration as served to the template screens.
+
+    modules is the GetQueryModules payload, queries maps CategoryId to its
+    GetPredefinedQueries payload and analytes maps CategoryId to the
+    lower-cased LabTest names. version is a hash of all three, used as ETag.
+    """
+
+    def __init__(self, modules: list, queries: dict, analytes: dict):
+        self.modules = modules
+        self.queries = queries
+        self.analytes = analytes
+        content = json.dumps([modules, sorted(queries.items()), sorted((k, sorted(v)) for k, v in analytes.items())], sort_keys=True, default=str)
+        self.version = hashlib.sha256(content.encode("utf-8")).hexdigest()[:20]
+
+def load_query_catalog(db: Session) -> QueryCatalog:
+    """Modules, categories, queries, placeholders and lab analytes in four queries"""
+    modules = (
+        db.query(QueryModule)
+        .options(selectinload(QueryModule.categories))
+        .filter(QueryModule.Status == True)
+        .order_by(QueryModule.Id)
+        .all()
+    )
+    lbcat = {category.Id: category.LBCAT for category in db.query(QueryCategory).all()}
+    queries = (
+        db.query(PredefinedQuery)
+        .options(selectinload(PredefinedQuery.placeholders))
+        .filter(PredefinedQuery.Status == True)
+        .order_by(PredefinedQuery.Id)
+        .all()
+    )
+
+    module_list = [
+        {
+            "id": module.Id,
+            "name": module.Name,
+            "categories": [
+                {"id": cat.Id, "Name": cat.Name, "LBCAT": cat.LBCAT}
+                for cat in sorted(module.categories, key=lambda cat: cat.Id) if cat.Status == True
+            ]
+        }
+        for module in modules
+    ]
+
+    by_category = {}
+    for query in queries:
+        placeholder_data = []
+        for p in sorted(query.placeholders, key=lambda p: p.Id):
+            category_filter = lbcat.get(p.CategoryFilter) if p.CategoryFilter else None
+            placeholder_data.append({
+                "id": p.Id,
+                "placeholder": p.PlaceholderText,
+                "inputType": p.InputType,
+                "sourceTable": p.SourceTable,
+                "sourceColumn": p.SourceColumn,
+                "categoryFilter": category_filter,
+                "categoryColumn": "LBCAT" if category_filter else None
+            })
+        by_category.setdefault(query.CategoryId, []).append({
+            "queryId": query.Id,
+            "templateText": query.TemplateText,
+            "datasetType": query.DatasetType,
+            "tablesInvolved": query.TablesInvolved,
+            "queryType": query.QueryType,
+            "placeholders": placeholder_data
+        })
+
+    # First row per category, as the single lookups did
+    analytes = {}
+    for row in db.query(LabAnalytes).order_by(LabAnalytes.Id).all():
+        if row.CategoryId not in analytes and row.LabTest:
+            analytes[row.CategoryId] = frozenset(str(test).lower() for test in row.LabTest)
+    return QueryCatalog(module_list, by_category, analytes)
+
+def _reload_counter() -> str:
+    """Times the catalog was reloaded, shared by all workers through Redis"""
+    counter = _counter_cache.get("counter")
+    if counter is not None:
+        return counter
+    counter = "0"
+    if settings.REDIS_CONFIG:
+        try:
+            counter = get_redis_client().get(QUERY_CATALOG_VERSION_KEY) or "0"
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not read query catalog version: {str(e)}")
+    _counter_cache.set("counter", counter)
+    return counter
+
+def get_query_catalog(db: Session) -> QueryCatalog:
+    """
+    Catalog from this worker's cache; reloaded after QUERY_CATALOG_CACHE_SECONDS
+    or once the shared reload counter changes (see clear_query_catalog).
+    """
+    key = f"catalog:{_reload_counter()}"
+    catalog = _catalog_cache.get(key)
+    if catalog is not None:
+        return catalog
+    with _load_lock:
+        catalog = _catalog_cache.get(key)
+        if catalog is None:
+            catalog = load_query_catalog(db)
+            _catalog_cache.set(key, catalog)
+        return catalog
+
+def clear_query_catalog():
+    """Drop the cached catalog; other workers reload it within QUERY_CATALOG_VERSION_CACHE_SECONDS"""
+    _catalog_cache.clear()
+    _counter_cache.clear()
+    if settings.REDIS_CONFIG:
+        try:
+            get_redis_client().incr(QUERY_CATALOG_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not bump query catalog version: {str(e)}")
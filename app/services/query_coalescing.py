@@ -0,0 +1,46 @@
+import json
+import hashlib
+from app.core.config import settings
+from app.utils.single_flight import SingleFlight
+from app.ai.langgraph_workflow.graph_memory import thread_has_history, record_turn, record_session_metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+_query_flight = SingleFlight(
+    "query",
+    lock_seconds=settings.SINGLE_FLIGHT_LOCK_SECONDS,
+    wait_seconds=settings.SINGLE_FLIGHT_WAIT_SECONDS,
+    result_ttl_seconds=settings.SINGLE_FLIGHT_RESULT_TTL_SECONDS,
+)
+
+def query_flight_key(ProjectNumber: str, FolderName: str, Question: str, LlmType: str, ModelName: str, Type: str, FlowType: str, STANDARD_QUERY_DATA: dict, node_models: dict = None, fast_summary: bool = False) -> str:
+    """Identity of a /Query request: everything that shapes the answer except the session"""
+    raw = json.dumps(
+        [ProjectNumber, FolderName, Question.strip(), LlmType, ModelName, Type, (FlowType or "").upper(), STANDARD_QUERY_DATA or {}, node_models or {}, bool(fast_summary)],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def run_coalesced(key: str, SessionId: int, Question: str, fn):
+    """
+    Run a /Query flow, sharing the result with identical requests already in flight.
+
+    Only standalone questions are coalesced. A session with earlier turns gets
+    answers that depend on its own conversation, so it always runs on its own.
+    When a result is shared, the turn is still written to the caller's thread.
+    Returns (result, shared).
+    """
+    thread_id = str(SessionId)
+    if settings.REDIS_CONFIG and thread_has_history(thread_id):
+        return fn(), False
+
+    result, shared = _query_flight.do(key, fn)
+    if shared and settings.REDIS_CONFIG:
+        try:
+            answer = json.loads(result[0]).get("summary", "")
+            record_session_metrics(thread_id, record_turn(thread_id, Question, answer))
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not record shared turn for session {thread_id}: {str(e)}")
+    return result, shared
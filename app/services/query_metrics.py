@@ -0,0 +1,122 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.models.user import ClinicalQueryMessage, ClinicalQuerySession
+
+def build_run_metrics(total_ms: float, node_timings: dict, node_metrics: dict, queries: list) -> dict:
+    """
+    Metrics of one /Query run, stored under Metadata["Metrics"] of the assistant message.
+
+    node_timings comes from NodeTimer (or is filled by hand for steps outside a
+    graph), node_metrics from collect_node_metrics and queries from
+    collect_query_metrics.
+    """
+    nodes = {}
+    for node, timing in node_timings.items():
+        nodes[node] = {"ms": round(timing["ms"], 1), "runs": timing["runs"]}
+    for node, usage in node_metrics.items():
+        entry = nodes.setdefault(node, {"ms": round(usage["latency_ms"], 1), "runs": usage["calls"]})
+        entry.update({
+            "model": usage["model"],
+            "llm_calls": usage["calls"],
+            "llm_ms": usage["latency_ms"],
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"],
+        })
+    return {
+        "TotalMs": round(total_ms, 1),
+        "LlmCalls": sum(usage["calls"] for usage in node_metrics.values()),
+        "PromptTokens": sum(usage["prompt_tokens"] for usage in node_metrics.values()),
+        "CompletionTokens": sum(usage["completion_tokens"] for usage in node_metrics.values()),
+        "Sql": {
+            "Queries": len(queries),
+            "DbMs": sum(query["ms"] for query in queries if query["cache"] != "hit"),
+            "Rows": sum(query["rows"] for query in queries),
+            "CacheHits": sum(1 for query in queries if query["cache"] == "hit"),
+        },
+        "Nodes": nodes,
+    }
+
+def percentile(values: list, pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def _distribution(values: list) -> dict:
+    return {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+
+def aggregate_query_metrics(db: Session, ProjectNumber: Optional[str] = None, days: int = 7) -> dict:
+    """
+    p50/p95 of stored run metrics per project, model and flow, and per graph node.
+
+    Coalesced answers are counted but left out of the distributions: they
+    reuse another request's work, so their node timings and tokens are not their own.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    query = (
+        db.query(ClinicalQuerySession.ProjectNumber, ClinicalQueryMessage.FlowType, ClinicalQueryMessage.Metadata)
+        .join(ClinicalQuerySession, ClinicalQueryMessage.SessionId == ClinicalQuerySession.Id)
+        .filter(ClinicalQueryMessage.Sender == "assistant", ClinicalQueryMessage.CreatedAt >= since)
+    )
+    if ProjectNumber:
+        query = query.filter(ClinicalQuerySession.ProjectNumber == ProjectNumber)
+
+    runs = {}
+    nodes = {}
+    for project_number, flow_type, metadata in query.all():
+        metrics = (metadata or {}).get("Metrics")
+        if not metrics:
+            continue
+        key = (project_number, metadata.get("ModelName"), (flow_type or "AI").upper())
+        group = runs.setdefault(key, {"count": 0, "coalesced": 0, "total_ms": [], "db_ms": [], "prompt_tokens": [], "completion_tokens": [], "cache_hits": 0})
+        group["count"] += 1
+        if metadata.get("Coalesced"):
+            group["coalesced"] += 1
+            continue
+        group["total_ms"].append(metrics["TotalMs"])
+        group["db_ms"].append(metrics["Sql"]["DbMs"])
+        group["prompt_tokens"].append(metrics["PromptTokens"])
+        group["completion_tokens"].append(metrics["CompletionTokens"])
+        group["cache_hits"] += 1 if metrics["Sql"]["CacheHits"] else 0
+
+        for node, entry in metrics.get("Nodes", {}).items():
+            node_group = nodes.setdefault((project_number, entry.get("model", metadata.get("ModelName")), node), {"ms": [], "prompt_tokens": [], "completion_tokens": []})
+            node_group["ms"].append(entry["ms"])
+            if "prompt_tokens" in entry:
+                node_group["prompt_tokens"].append(entry["prompt_tokens"])
+                node_group["completion_tokens"].append(entry["completion_tokens"])
+
+    return {
+        "days": days,
+        "runs": [
+            {
+                "ProjectNumber": project_number,
+                "ModelName": model_name,
+                "FlowType": flow_type,
+                "count": group["count"],
+                "coalesced": group["coalesced"],
+                "sql_cache_hit_runs": group["cache_hits"],
+                "total_ms": _distribution(group["total_ms"]),
+                "db_ms": _distribution(group["db_ms"]),
+                "prompt_tokens": _distribution(group["prompt_tokens"]),
+                "completion_tokens": _distribution(group["completion_tokens"]),
+            }
+            for (project_number, model_name, flow_type), group in sorted(runs.items(), key=lambda item: [str(part) for part in item[0]])
+        ],
+        "nodes": [
+            {
+                "ProjectNumber": project_number,
+                "ModelName": model_name,
+                "Node": node,
+                "count": len(group["ms"]),
+                "ms": _distribution(group["ms"]),
+                "prompt_tokens": _distribution(group["prompt_tokens"]),
+                "completion_tokens": _distribution(group["completion_tokens"]),
+            }
+            for (project_number, model_name, node), group in sorted(nodes.items(), key=lambda item: [str(part) for part in item[0]])
+        ],
+    }
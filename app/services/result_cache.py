@@ -0,0 +1,247 @@
+import re
+import json
+import time
+import zlib
+import hashlib
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from app.core.config import settings
+from app.utils.local_cache import LocalTTLCache
+from app.utils.redis_client import get_redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_PREFIX = "resultcache"
+RESULT_CACHE_METRICS_KEY = "result_cache_metrics"
+
+_local_cache = LocalTTLCache(max_entries=settings.RESULT_CACHE_LOCAL_ENTRIES, ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS)
+_local_metrics = {}
+# Counters not yet added to the shared Redis hash, and when they were last flushed
+_pending_metrics = {}
+_flush_state = {"at": time.monotonic(), "running": False}
+_metrics_lock = threading.Lock()
+_run_queries = ContextVar("result_cache_run_queries", default=None)
+_fetched_rows = ContextVar("result_cache_fetched_rows", default=None)
+
+# String literals are kept verbatim; only the SQL text around them is canonicalized
+_LITERAL_PATTERN = re.compile(r"('(?:[^']|'')*')")
+
+def canonicalize_sql(query: str) -> str:
+    """
+    Canonical form of a SQL statement for cache keys: whitespace outside string
+    literals is collapsed and a trailing semicolon is dropped. Case is preserved
+    because unquoted aliases end up as result column names.
+    """
+    parts = _LITERAL_PATTERN.split(query.strip())
+    canonical = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            canonical.append(part)
+        else:
+            canonical.append(re.sub(r"\s+", " ", part))
+    return "".join(canonical).strip().rstrip(";").strip()
+
+def _cache_key(schema: str, dataset_version: str, query: str, fetch: str, include_columns: bool, parameters: dict = None) -> str:
+    raw = "|".join([canonicalize_sql(query), fetch, str(int(include_columns))])
+    if parameters:
+        raw += "|" + json.dumps(parameters, sort_keys=True, default=str)
+    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    return f"{RESULT_CACHE_PREFIX}:{schema.lower()}:{dataset_version}:{digest}"
+
+def _record_metrics(**counters):
+    """
+    Count in process; the shared counters in Redis are updated from a
+    background thread at most every RESULT_CACHE_METRICS_FLUSH_SECONDS, so
+    lookups never wait on a Redis round trip for metrics.
+    """
+    flush = False
+    with _metrics_lock:
+        for name, value in counters.items():
+            _local_metrics[name] = _local_metrics.get(name, 0) + value
+            if settings.REDIS_CONFIG:
+                _pending_metrics[name] = _pending_metrics.get(name, 0) + value
+        if (
+            settings.REDIS_CONFIG and not _flush_state["running"]
+            and time.monotonic() - _flush_state["at"] >= settings.RESULT_CACHE_METRICS_FLUSH_SECONDS
+        ):
+            _flush_state["running"] = flush = True
+    if flush:
+        threading.Thread(target=flush_result_cache_metrics, name="result-cache-metrics", daemon=True).start()
+
+def flush_result_cache_metrics():
+    """Add the counters recorded since the last flush to the shared Redis hash"""
+    with _metrics_lock:
+        pending = dict(_pending_metrics)
+        _pending_metrics.clear()
+    try:
+        if pending:
+            pipe = get_redis_client().pipeline()
+            for name, value in pending.items():
+                pipe.hincrby(RESULT_CACHE_METRICS_KEY, name, int(value))
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"[WARNING] Could not record result cache metrics: {str(e)}")
+        # Kept for the next flush
+        with _metrics_lock:
+            for name, value in pending.items():
+                _pending_metrics[name] = _pending_metrics.get(name, 0) + value
+    finally:
+        with _metrics_lock:
+            _flush_state.update(at=time.monotonic(), running=False)
+
+def get_result_cache_metrics() -> dict:
+    """Cache counters: shared ones from Redis when enabled, otherwise this worker's"""
+    if settings.REDIS_CONFIG:
+        flush_result_cache_metrics()
+        metrics = get_redis_client().hgetall(RESULT_CACHE_METRICS_KEY)
+        return {name: int(value) for name, value in metrics.items()}
+    with _metrics_lock:
+        return dict(_local_metrics)
+
+@contextmanager
+def collect_query_metrics():
+    """Collect execution time, rows and cache outcome of the queries run inside the block"""
+    queries = []
+    token = _run_queries.set(queries)
+    try:
+        yield queries
+    finally:
+        _run_queries.reset(token)
+
+def note_fetched_rows(count: int):
+    """Called by the database runners with the number of rows they fetched for a query"""
+    counter = _fetched_rows.get()
+    if counter is not None:
+        counter[0] += count
+
+def _record_query(ms: int, rows: int, cache: str):
+    queries = _run_queries.get()
+    if queries is not None:
+        queries.append({"ms": ms, "rows": rows, "cache": cache})
+
+def _load(key: str):
+    payload = _local_cache.get(key)
+    if payload is None and settings.REDIS_CONFIG:
+        try:
+            payload = get_redis_client(decode_responses=False).get(key)
+        except Exception as e:
+            logger.warning(f"[WARNING] Result cache lookup failed: {str(e)}")
+            return None
+        if payload is not None and len(payload) <= settings.RESULT_CACHE_LOCAL_MAX_ITEM_BYTES:
+            _local_cache.set(key, payload)
+    if payload is None:
+        return None
+    db_ms, result, *rows = json.loads(zlib.decompress(payload))
+    return db_ms, result, rows[0] if rows else 0
+
+def _store(key: str, result, db_ms: int, rows: int):
+    payload = zlib.compress(json.dumps([db_ms, result, rows]).encode("utf-8"))
+    if len(payload) > settings.RESULT_CACHE_MAX_BYTES:
+        _record_metrics(oversize=1)
+        return
+    if len(payload) <= settings.RESULT_CACHE_LOCAL_MAX_ITEM_BYTES:
+        _local_cache.set(key, payload)
+    if settings.REDIS_CONFIG:
+        try:
+            get_redis_client(decode_responses=False).set(key, payload, ex=settings.RESULT_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"[WARNING] Result cache write failed: {str(e)}")
+            return
+    _record_metrics(stores=1, compressed_bytes_stored=len(payload))
+
+def run_cached(db, schema: str, dataset_version: str, query: str, fetch: str = "all", include_columns: bool = False, raise_errors: bool = False, parameters: dict = None):
+    """
+    Run a query through the result cache.
+
+    Results are stored compressed, keyed on the canonical SQL, its bound
+    parameters and the schema's dataset version, so any new ingest or table drop
+    invalidates them. Errors are never cached. With raise_errors the call
+    behaves like SQLDatabase.run, otherwise like run_no_throw.
+    """
+    key = _cache_key(schema, dataset_version, query, fetch, include_columns, parameters)
+    start = time.perf_counter()
+    cached = _load(key)
+    if cached is not None:
+        db_ms, result, rows = cached
+        _record_metrics(hits=1, bytes_saved=len(result.encode("utf-8")), db_ms_avoided=db_ms)
+        _record_query(int((time.perf_counter() - start) * 1000), rows, "hit")
+        return result
+
+    start = time.perf_counter()
+    extra = {"parameters": parameters} if parameters else {}
+    counter = [0]
+    token = _fetched_rows.set(counter)
+    try:
+        if raise_errors:
+            result = db.run(query, fetch=fetch, include_columns=include_columns, **extra)
+        else:
+            result = db.run_no_throw(query, fetch=fetch, include_columns=include_columns, **extra)
+    except Exception:
+        _record_query(int((time.perf_counter() - start) * 1000), counter[0], "error")
+        raise
+    finally:
+        _fetched_rows.reset(token)
+    db_ms = int((time.perf_counter() - start) * 1000)
+    _record_metrics(misses=1)
+    _record_query(db_ms, counter[0], "miss")
+
+    if isinstance(result, str) and not result.lower().startswith("error"):
+        _store(key, result, db_ms, counter[0])
+    return result
+
+def run_cached_values(schema: str, dataset_version: str, query: str, parameters: dict, fetch):
+    """
+    Result cache for callers that need the fetched values rather than a
+    SQLDatabase result string: fetch() runs the query and returns JSON
+    serializable data, which is stored and returned as is.
+    """
+    key = _cache_key(schema, dataset_version, query, "values", True, parameters)
+    start = time.perf_counter()
+    cached = _load(key)
+    if cached is not None:
+        db_ms, values, rows = cached
+        _record_metrics(hits=1, db_ms_avoided=db_ms)
+        _record_query(int((time.perf_counter() - start) * 1000), rows, "hit")
+        return values
+
+    start = time.perf_counter()
+    counter = [0]
+    token = _fetched_rows.set(counter)
+    try:
+        values = fetch()
+    except Exception:
+        _record_query(int((time.perf_counter() - start) * 1000), counter[0], "error")
+        raise
+    finally:
+        _fetched_rows.reset(token)
+    db_ms = int((time.perf_counter() - start) * 1000)
+    _record_metrics(misses=1)
+    _record_query(db_ms, counter[0], "miss")
+    _store(key, values, db_ms, counter[0])
+    return values
+
+class CachedSQLDatabase:
+    """
+    SQLDatabase wrapper whose run/run_no_throw go through the result cache.
+    Everything else is delegated to the wrapped database.
+    """
+
+    def __init__(self, db, schema: str, dataset_version: str):
+        self._db = db
+        self._schema = schema
+        self._dataset_version = dataset_version
+
+    def run(self, command: str, fetch: str = "all", include_columns: bool = False, parameters: dict = None, **kwargs):
+        if kwargs:
+            return self._db.run(command, fetch=fetch, include_columns=include_columns, parameters=parameters, **kwargs)
+        return run_cached(self._db, self._schema, self._dataset_version, command, fetch, include_columns, raise_errors=True, parameters=parameters)
+
+    def run_no_throw(self, command: str, fetch: str = "all", include_columns: bool = False, parameters: dict = None, **kwargs):
+        if kwargs:
+            return self._db.run_no_throw(command, fetch=fetch, include_columns=include_columns, parameters=parameters, **kwargs)
+        return run_cached(self._db, self._schema, self._dataset_version, command, fetch, include_columns, parameters=parameters)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
@@ -0,0 +1,129 @@
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Optional
+from sqlalchemy import inspect, select, table, column
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.user import SubjectIndex
+from app.services.dataset_version import get_dataset_version
+from app.utils.local_cache import LocalTTLCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+_local_indexes = LocalTTLCache(max_entries=64, ttl_seconds=settings.SUBJECT_INDEX_CACHE_SECONDS)
+# One build lock per schema, so a scan of one schema does not hold up lookups of another
+_build_locks = {}
+_build_locks_lock = Lock()
+# Row recorded for a schema without subjects, so it is not rescanned on every call
+_NO_SUBJECTS = ""
+
+def _schema_name(ProjectNumber: str, FolderName: str) -> str:
+    return f"{ProjectNumber}_{FolderName}".lower()
+
+def _build_lock(schema: str) -> Lock:
+    with _build_locks_lock:
+        return _build_locks.setdefault(schema, Lock())
+
+def collect_subjects(engine, schema: str) -> dict:
+    """
+    USUBJID -> set of the schema's tables it has rows in; one DISTINCT scan per table with a USUBJID column.
+    Spellings that differ only in case are one subject (the first one seen is kept), as the
+    unique index on SubjectIndex compares them under the database's collation.
+    """
+    inspector = inspect(engine)
+    subjects = {}
+    spellings = {}
+    with engine.connect() as conn:
+        for table_name in inspector.get_table_names(schema=schema):
+            names = {col["name"].upper(): col["name"] for col in inspector.get_columns(table_name, schema=schema)}
+            if "USUBJID" not in names:
+                continue
+            source = table(table_name, column(names["USUBJID"]), schema=schema)
+            target = source.c[names["USUBJID"]]
+            for (usubjid,) in conn.execute(select(target).distinct().where(target.isnot(None))):
+                usubjid = str(usubjid).strip()
+                if usubjid:
+                    usubjid = spellings.setdefault(usubjid.casefold(), usubjid)
+                    subjects.setdefault(usubjid, set()).add(table_name.upper())
+    return subjects
+
+def refresh_subject_index(db: Session, engine, ProjectNumber: str, FolderName: str) -> dict:
+    """
+    Rebuild the schema's rows in SubjectIndex from the domain tables.
+    Called by the ingestion pipeline after a load; GetSubjects also rebuilds
+    when the stored rows are from an older dataset version.
+    """
+    schema = _schema_name(ProjectNumber, FolderName)
+    version = get_dataset_version(ProjectNumber, FolderName)
+    subjects = collect_subjects(engine, f"{ProjectNumber}_{FolderName}")
+    now = datetime.now(timezone.utc)
+    db.query(SubjectIndex).filter(SubjectIndex.SchemaName == schema).delete(synchronize_session=False)
+    db.bulk_insert_mappings(SubjectIndex, [
+        {"SchemaName": schema, "USUBJID": usubjid, "Domains": ",".join(sorted(domains)), "DatasetVersion": version, "RefreshedAt": now}
+        for usubjid, domains in (subjects.items() or [(_NO_SUBJECTS, ())])
+    ])
+    db.commit()
+    index = {usubjid: frozenset(domains) for usubjid, domains in subjects.items()}
+    _local_indexes.set(f"{schema}:{version}", index)
+    return index
+
+def get_subject_index(db: Session, engine, ProjectNumber: str, FolderName: str) -> dict:
+    """
+    USUBJID -> frozenset of domain tables for the schema's current dataset version.
+
+    Served from this worker, then from the schema's SubjectIndex rows (one
+    range seek on the unique index); the domain tables are only scanned when
+    the rows are missing or from an older dataset version.
+    """
+    schema = _schema_name(ProjectNumber, FolderName)
+    version = get_dataset_version(ProjectNumber, FolderName)
+    key = f"{schema}:{version}"
+    index = _local_indexes.get(key)
+    if index is not None:
+        return index
+    with _build_lock(schema):
+        index = _local_indexes.get(key)
+        if index is not None:
+            return index
+        index = _stored_index(db, schema, version)
+        if index is None:
+            logger.info(f"Subject index for {schema} is missing or stale, rebuilding")
+            try:
+                return refresh_subject_index(db, engine, ProjectNumber, FolderName)
+            except IntegrityError:
+                # Another worker rebuilt the schema's rows first; those are used
+                db.rollback()
+                index = _stored_index(db, schema, version)
+                if index is None:
+                    raise
+        _local_indexes.set(key, index)
+        return index
+
+def _stored_index(db: Session, schema: str, version: str) -> Optional[dict]:
+    """The schema's SubjectIndex rows as an index, or None when they are missing or from another dataset version"""
+    rows = (
+        db.query(SubjectIndex.USUBJID, SubjectIndex.Domains, SubjectIndex.DatasetVersion)
+        .filter(SubjectIndex.SchemaName == schema)
+        .all()
+    )
+    if not rows or any(row.DatasetVersion != version for row in rows):
+        return None
+    return {row.USUBJID: frozenset(row.Domains.split(",")) for row in rows if row.USUBJID != _NO_SUBJECTS}
+
+def find_subject(index: dict, usubjid: str) -> Optional[str]:
+    """
+    The index's spelling of a USUBJID. Matched ignoring case and surrounding
+    spaces, as the domain tables' default collation compares them.
+    """
+    usubjid = (usubjid or "").strip()
+    if usubjid in index:
+        return usubjid
+    wanted = usubjid.casefold()
+    return next((key for key in index if key.casefold() == wanted), None)
+
+def subjects_in_all(index: dict, tables) -> list:
+    """Subjects that have rows in every one of the tables"""
+    wanted = {name.strip().upper() for name in tables if name.strip()}
+    return sorted(usubjid for usubjid, domains in index.items() if wanted <= domains)
@@ -0,0 +1,229 @@
+import zlib
+from dataclasses import dataclass
+from datetime import date
+from threading import Lock
+from typing import Optional, Tuple
+import pandas as pd
+from sqlalchemy import and_, func, inspect, or_, select, table, column
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.user import SubjectTimeline
+from app.services.dataset_version import get_dataset_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class TimelineSource:
+    """A domain's columns as timeline events; the first term column the table has is used"""
+    domain: str
+    terms: Tuple[str, ...]
+    start: str
+    end: Optional[str] = None
+    category: Optional[str] = None
+    details: Tuple[str, ...] = ()
+
+TIMELINE_SOURCES = (
+    TimelineSource("AE", ("AEDECOD", "AETERM"), "AESTDTC", "AEENDTC", "AEBODSYS", ("AESEV", "AESER", "AEREL", "AEOUT")),
+    TimelineSource("EX", ("EXTRT",), "EXSTDTC", "EXENDTC", "EXCAT", ("EXDOSE", "EXDOSU", "EXROUTE")),
+    TimelineSource("CM", ("CMDECOD", "CMTRT"), "CMSTDTC", "CMENDTC", "CMCAT", ("CMINDC", "CMDOSE", "CMDOSU")),
+    TimelineSource("PR", ("PRDECOD", "PRTRT"), "PRSTDTC", "PRENDTC", "PRCAT", ("PRINDC",)),
+    TimelineSource("DS", ("DSDECOD", "DSTERM"), "DSSTDTC", None, "DSCAT", ("DSSCAT",)),
+)
+
+_COLUMNS = ("USUBJID", "Domain", "Term", "Category", "Detail", "StartDTC", "EndDTC", "StartDate", "EndDate", "StartDay", "EndDay", "SourceRowId")
+_TEXT_COLUMNS = ("Term", "Category", "Detail", "StartDTC", "EndDTC", "SourceRowId")
+_LENGTHS = {key: SubjectTimeline.__table__.c[key].type.length for key in _TEXT_COLUMNS}
+# Stored for a subject without events (Seq 0, never returned), so it is not rebuilt on every call
+_NO_EVENTS_SEQ = 0
+# Rebuilds of the same subject in this worker run one at a time; subjects share a fixed set of locks
+_rebuild_locks = [Lock() for _ in range(64)]
+
+def _schema_name(ProjectNumber: str, FolderName: str) -> str:
+    return f"{ProjectNumber}_{FolderName}".lower()
+
+def _dates(values: pd.Series) -> pd.Series:
+    """Full dates from ISO 8601 values; partial or invalid ones become NaT"""
+    return pd.to_datetime(values.astype("string").str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+
+def study_days(dates: pd.Series, reference: pd.Series) -> pd.Series:
+    """SDTM study day: reference date is day 1, the day before it is day -1"""
+    delta = (dates - reference).dt.days
+    return delta.where(delta < 0, delta + 1).astype("Int64")
+
+def _read(conn, schema: str, table_name: str, names: dict, wanted: dict, usubjid: Optional[str]) -> pd.DataFrame:
+    """The named columns of a domain table (alias -> column), optionally for one subject"""
+    source = table(table_name, *(column(names[name]) for name in wanted.values()), schema=schema)
+    query = select(*(source.c[names[name]].label(alias) for alias, name in wanted.items()))
+    if usubjid is not None:
+        query = query.where(source.c[names["USUBJID"]] == usubjid)
+    result = conn.execute(query)
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+def collect_timeline(engine, schema: str, usubjid: Optional[str] = None) -> pd.DataFrame:
+    """
+    Events of every subject (or one) from the timeline domains, sorted per
+    subject by start date with undated events last, with study days against
+    DM.RFSTDTC.
+    """
+    inspector = inspect(engine)
+    tables = {name.upper(): name for name in inspector.get_table_names(schema=schema)}
+    frames = []
+    with engine.connect() as conn:
+        reference = pd.DataFrame(columns=["USUBJID", "RFSTDTC"])
+        if "DM" in tables:
+            names = {col["name"].upper(): col["name"] for col in inspector.get_columns(tables["DM"], schema=schema)}
+            if {"USUBJID", "RFSTDTC"} <= names.keys():
+                reference = _read(conn, schema, tables["DM"], names, {"USUBJID": "USUBJID", "RFSTDTC": "RFSTDTC"}, usubjid)
+
+        for source in TIMELINE_SOURCES:
+            if source.domain not in tables:
+                continue
+            names = {col["name"].upper(): col["name"] for col in inspector.get_columns(tables[source.domain], schema=schema)}
+            term = next((name for name in source.terms if name in names), None)
+            if "USUBJID" not in names or source.start not in names or term is None:
+                continue
+            wanted = {"USUBJID": "USUBJID", "Term": term, "StartDTC": source.start}
+            for alias, name in (("EndDTC", source.end), ("Category", source.category), ("SourceRowId", "ROWID")):
+                if name and name in names:
+                    wanted[alias] = name
+            details = [name for name in source.details if name in names]
+            wanted.update({f"detail_{name}": name for name in details})
+            frame = _read(conn, schema, tables[source.domain], names, wanted, usubjid)
+            if frame.empty:
+                continue
+            frame["Domain"] = source.domain
+            if details:
+                parts = [
+                    (name + "=" + frame[f"detail_{name}"].astype("string")).where(frame[f"detail_{name}"].notna() & (frame[f"detail_{name}"].astype("string") != ""))
+                    for name in details
+                ]
+                frame["Detail"] = pd.concat(parts, axis=1).apply(lambda row: "; ".join(row.dropna()) or None, axis=1)
+            frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=list(_COLUMNS) + ["Seq"])
+    events = pd.concat(frames, ignore_index=True).reindex(columns=_COLUMNS)
+    events["USUBJID"] = events["USUBJID"].astype("string").str.strip()
+    events = events[events["USUBJID"].notna() & (events["USUBJID"] != "")]
+    events["StartDate"] = _dates(events["StartDTC"])
+    events["EndDate"] = _dates(events["EndDTC"])
+    starts = reference.assign(USUBJID=reference["USUBJID"].astype("string").str.strip(), RFSTDATE=_dates(reference["RFSTDTC"]))
+    starts = starts.dropna(subset=["RFSTDATE"]).drop_duplicates("USUBJID").set_index("USUBJID")["RFSTDATE"]
+    # Subjects without a DM reference date get no study days (Series.map fails on an empty datetime mapping)
+    rfstdate = pd.Series(starts.reindex(events["USUBJID"]).to_numpy(), index=events.index)
+    events["StartDay"] = study_days(events["StartDate"], rfstdate)
+    events["EndDay"] = study_days(events["EndDate"], rfstdate)
+    events = events.sort_values(["USUBJID", "StartDate", "StartDTC", "Domain", "Term"], na_position="last", kind="stable")
+    events["Seq"] = events.groupby("USUBJID").cumcount() + 1
+    return events.reset_index(drop=True)
+
+def _records(events: pd.DataFrame, schema: str, version: str) -> list:
+    records = []
+    for row in events.astype(object).where(events.notna(), None).itertuples(index=False):
+        record = row._asdict()
+        for key in ("StartDate", "EndDate"):
+            record[key] = record[key].date() if record[key] is not None else None
+        for key in ("StartDay", "EndDay", "Seq"):
+            record[key] = int(record[key]) if record[key] is not None else None
+        for key in _TEXT_COLUMNS:
+            record[key] = str(record[key])[:_LENGTHS[key]] if record[key] is not None else None
+        records.append({**record, "SchemaName": schema, "DatasetVersion": version})
+    return records
+
+def _rebuild_lock(schema: str, usubjid: str) -> Lock:
+    return _rebuild_locks[zlib.crc32(f"{schema}|{usubjid}".encode("utf-8")) % len(_rebuild_locks)]
+
+def _stored_versions(db: Session, schema: str, usubjid: str) -> list:
+    rows = (
+        db.query(SubjectTimeline.DatasetVersion)
+        .filter(SubjectTimeline.SchemaName == schema, SubjectTimeline.USUBJID == usubjid)
+        .distinct()
+        .all()
+    )
+    return [row.DatasetVersion for row in rows]
+
+def refresh_subject_timelines(db: Session, engine, ProjectNumber: str, FolderName: str, usubjid: Optional[str] = None) -> int:
+    """
+    Rebuild the schema's SubjectTimeline rows (or one subject's) from the
+    domain tables; returns the number of events written. Called by the
+    ingestion pipeline after a load.
+    """
+    schema = _schema_name(ProjectNumber, FolderName)
+    version = get_dataset_version(ProjectNumber, FolderName)
+    events = collect_timeline(engine, f"{ProjectNumber}_{FolderName}", usubjid)
+    stale = db.query(SubjectTimeline).filter(SubjectTimeline.SchemaName == schema)
+    if usubjid is not None:
+        stale = stale.filter(SubjectTimeline.USUBJID == usubjid)
+    stale.delete(synchronize_session=False)
+    records = _records(events, schema, version)
+    if usubjid is not None and not records:
+        records = [{"SchemaName": schema, "USUBJID": usubjid, "Seq": _NO_EVENTS_SEQ, "Domain": "", "DatasetVersion": version}]
+    db.bulk_insert_mappings(SubjectTimeline, records)
+    db.commit()
+    return len(events)
+
+def get_subject_timeline(
+    db: Session,
+    engine,
+    ProjectNumber: str,
+    FolderName: str,
+    usubjid: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    domains=None,
+) -> list:
+    """
+    A subject's events in timeline order, optionally only those overlapping
+    start..end (events without a full start date are left out of a window)
+    and of some domains.
+
+    One seek on the (SchemaName, USUBJID, Seq) index; the subject's events are
+    rebuilt from the domain tables when they are missing or from an older
+    dataset version.
+    """
+    schema = _schema_name(ProjectNumber, FolderName)
+    version = get_dataset_version(ProjectNumber, FolderName)
+    if _stored_versions(db, schema, usubjid) != [version]:
+        with _rebuild_lock(schema, usubjid):
+            if _stored_versions(db, schema, usubjid) != [version]:
+                logger.info(f"Timeline of {usubjid} in {schema} is missing or stale, rebuilding")
+                try:
+                    refresh_subject_timelines(db, engine, ProjectNumber, FolderName, usubjid)
+                except IntegrityError:
+                    # Another worker wrote the same subject's rows first; those are used
+                    db.rollback()
+
+    query = db.query(SubjectTimeline).filter(
+        SubjectTimeline.SchemaName == schema, SubjectTimeline.USUBJID == usubjid, SubjectTimeline.Seq > _NO_EVENTS_SEQ
+    )
+    if start is not None or end is not None:
+        query = query.filter(SubjectTimeline.StartDate.isnot(None))
+    if start is not None:
+        # Events without an end date are ongoing, except dispositions, which are single-day
+        ongoing = and_(SubjectTimeline.Domain != "DS", func.coalesce(SubjectTimeline.EndDTC, "") == "")
+        query = query.filter(or_(
+            SubjectTimeline.EndDate >= start,
+            and_(SubjectTimeline.EndDate.is_(None), or_(SubjectTimeline.StartDate >= start, ongoing)),
+        ))
+    if end is not None:
+        query = query.filter(SubjectTimeline.StartDate <= end)
+    if domains:
+        query = query.filter(SubjectTimeline.Domain.in_([domain.strip().upper() for domain in domains]))
+    return [
+        {
+            "seq": event.Seq,
+            "domain": event.Domain,
+            "term": event.Term,
+            "category": event.Category,
+            "detail": event.Detail,
+            "startDTC": event.StartDTC,
+            "endDTC": event.EndDTC,
+            "startDate": event.StartDate.isoformat() if event.StartDate else None,
+            "endDate": event.EndDate.isoformat() if event.EndDate else None,
+            "startDay": event.StartDay,
+            "endDay": event.EndDay,
+            "rowId": event.SourceRowId,
+        }
+        for event in query.order_by(SubjectTimeline.Seq).all()
+    ]
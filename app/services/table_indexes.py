@@ -0,0 +1,177 @@
+from sqlalchemy import inspect, text
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_INTEGER_TYPES = {"INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT"}
+
+# Lookup column per SDTM domain where it is not <domain>TEST
+_TERM_COLUMNS = {"AE": "AEDECOD", "CM": "CMDECOD", "PR": "PRDECOD", "MH": "MHDECOD", "DS": "DSDECOD", "EX": "EXTRT"}
+
+def columnstore_tables() -> set:
+    return {name.strip().upper() for name in settings.INDEX_COLUMNSTORE_TABLES.split(",") if name.strip()}
+
+def is_max_column(col) -> bool:
+    """(max) and legacy LOB string columns, which cannot be index keys"""
+    type_name = type(col["type"]).__name__.upper()
+    return type_name in ("TEXT", "NTEXT") or (hasattr(col["type"], "length") and col["type"].length is None and type_name in ("VARCHAR", "NVARCHAR", "STRING", "UNICODE"))
+
+def narrow_key_column(conn, schema: str, table_name: str, col) -> bool:
+    """Narrow a (max) column to INDEX_KEY_LENGTH so it can be an index key; False when its values do not fit"""
+    name = col["name"]
+    longest = conn.execute(text(f"SELECT MAX(LEN([{name}])) FROM [{schema}].[{table_name}]")).scalar() or 0
+    if longest > settings.INDEX_KEY_LENGTH:
+        logger.warning(f"[WARNING] {schema}.{table_name}.{name} has values longer than {settings.INDEX_KEY_LENGTH} characters, not indexed")
+        return False
+    unicode = type(col["type"]).__name__.upper() in ("NVARCHAR", "NTEXT", "UNICODE")
+    conn.execute(text(
+        f"ALTER TABLE [{schema}].[{table_name}] ALTER COLUMN [{name}] "
+        f"{'NVARCHAR' if unicode else 'VARCHAR'}({settings.INDEX_KEY_LENGTH}) {'NULL' if col.get('nullable', True) else 'NOT NULL'}"
+    ))
+    return True
+
+def clustered_index_type(conn, schema: str, table_name: str):
+    """CLUSTERED or CLUSTERED COLUMNSTORE for the table's clustered index, None for a heap"""
+    return conn.execute(text(
+        "SELECT i.type_desc FROM sys.indexes i JOIN sys.tables t ON i.object_id = t.object_id "
+        "JOIN sys.schemas s ON t.schema_id = s.schema_id WHERE s.name = :schema AND t.name = :table AND i.type IN (1, 5)"
+    ), {"schema": schema, "table": table_name}).scalar()
+
+def lookup_keys(table_name: str, columns) -> list:
+    """
+    Keys of a table's subject lookup index: USUBJID, then the category and
+    test/term columns the subject pickers and modules filter on, when present.
+    """
+    domain = table_name.upper()
+    if domain.startswith("AD"):
+        candidates = ["PARCAT1", "PARAMCD"]
+    else:
+        candidates = [f"{domain}CAT", _TERM_COLUMNS.get(domain, f"{domain}TEST")]
+    return ["USUBJID"] + [name for name in candidates if name in columns]
+
+def plan_table_indexes(table_name: str, columns, rows: int = 0) -> dict:
+    """
+    Indexes a loaded table should have, by name: the clustered index on ROWID
+    (clustered columnstore for large tables listed in INDEX_COLUMNSTORE_TABLES)
+    and the nonclustered subject lookup index. columns are upper-case names.
+    """
+    plan = {}
+    domain = table_name.upper()
+    if domain in columnstore_tables() and rows >= settings.INDEX_COLUMNSTORE_MIN_ROWS:
+        plan[f"CCI_{domain}"] = {"type": "CLUSTERED COLUMNSTORE", "keys": []}
+    elif "ROWID" in columns:
+        plan[f"CIX_{domain}_ROWID"] = {"type": "CLUSTERED", "keys": ["ROWID"]}
+    if "USUBJID" in columns:
+        plan[f"IX_{domain}_USUBJID"] = {"type": "NONCLUSTERED", "keys": lookup_keys(table_name, columns)}
+    return plan
+
+def create_index_sql(schema: str, table_name: str, name: str, index: dict, unique: bool = False) -> str:
+    target = f"[{schema}].[{table_name}]"
+    if index["type"] == "CLUSTERED COLUMNSTORE":
+        return f"CREATE CLUSTERED COLUMNSTORE INDEX [{name}] ON {target}"
+    keys = ", ".join(f"[{key}]" for key in index["keys"])
+    return f"CREATE {'UNIQUE ' if unique else ''}{index['type']} INDEX [{name}] ON {target} ({keys})"
+
+def _type_rowid(conn, schema: str, table_name: str, col) -> str:
+    """Convert a text ROWID to INT when every value is an integer; returns what was done"""
+    if type(col["type"]).__name__.upper() in _INTEGER_TYPES:
+        return "typed"
+    total, nonnull, bad = conn.execute(text(
+        f"SELECT COUNT(*), COUNT([ROWID]), SUM(CASE WHEN [ROWID] IS NOT NULL AND TRY_CONVERT(INT, [ROWID]) IS NULL THEN 1 ELSE 0 END) "
+        f"FROM [{schema}].[{table_name}]"
+    )).one()
+    if bad:
+        return "skipped, non-integer values"
+    conn.execute(text(f"ALTER TABLE [{schema}].[{table_name}] ALTER COLUMN [ROWID] INT {'NOT NULL' if nonnull == total else 'NULL'}"))
+    return "converted"
+
+def _provision_table(engine, inspector, schema: str, table_name: str) -> dict:
+    reflected = {col["name"].upper(): col for col in inspector.get_columns(table_name, schema=schema)}
+    existing = {index["name"] for index in inspector.get_indexes(table_name, schema=schema)}
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT COUNT_BIG(*) FROM [{schema}].[{table_name}]")).scalar()
+        clustered = clustered_index_type(conn, schema, table_name)
+    entry = {"rows": rows, "indexes": {}}
+    for name, index in plan_table_indexes(table_name, reflected, rows).items():
+        if name in existing or (index["type"].startswith("CLUSTERED") and clustered):
+            entry["indexes"][name] = "exists" if name in existing else f"skipped, table already has a {clustered.lower()} index"
+            continue
+        try:
+            with engine.begin() as conn:
+                unique = False
+                if index["keys"] == ["ROWID"]:
+                    entry["rowid"] = _type_rowid(conn, schema, table_name, reflected["ROWID"])
+                    if entry["rowid"].startswith("skipped"):
+                        entry["indexes"][name] = "skipped, ROWID is not an integer"
+                        continue
+                    unique = conn.execute(text(f"SELECT CASE WHEN COUNT(*) = COUNT(DISTINCT [ROWID]) THEN 1 ELSE 0 END FROM [{schema}].[{table_name}]")).scalar() == 1
+                narrow = [reflected[key] for key in index["keys"] if is_max_column(reflected[key])]
+                if not all(narrow_key_column(conn, schema, table_name, col) for col in narrow):
+                    entry["indexes"][name] = "skipped, key values too long"
+                    continue
+                conn.execute(text(create_index_sql(schema, table_name, name, index, unique)))
+            entry["indexes"][name] = "added"
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not create {name} on {schema}.{table_name}: {str(e)}")
+            entry["indexes"][name] = f"failed: {str(e)}"
+    return entry
+
+def provision_table_indexes(engine, schema: str, table_name: str = None) -> dict:
+    """
+    Create the planned indexes on one table of the schema, or on all of them.
+    Existing indexes are left alone, so it can run after every load.
+    """
+    if engine.dialect.name != "mssql":
+        return {"status": "unsupported", "dialect": engine.dialect.name, "tables": {}}
+    inspector = inspect(engine)
+    tables = inspector.get_table_names(schema=schema)
+    if table_name is not None:
+        tables = [name for name in tables if name.lower() == table_name.lower()]
+        if not tables:
+            raise ValueError(f"Table '{schema}.{table_name}' does not exist")
+    return {"status": "ok", "dialect": engine.dialect.name, "tables": {name: _provision_table(engine, inspector, schema, name) for name in tables}}
+
+def index_report(engine, schema: str) -> dict:
+    """Per-table row count, ROWID type, current indexes and planned indexes that are missing"""
+    if engine.dialect.name != "mssql":
+        return {"status": "unsupported", "dialect": engine.dialect.name, "tables": {}}
+    with engine.connect() as conn:
+        columns = conn.execute(text(
+            "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = :schema"
+        ), {"schema": schema}).all()
+        indexes = conn.execute(text("""
+            SELECT t.name AS table_name, i.name AS index_name, i.type_desc, i.is_unique,
+                   c.name AS column_name, ic.is_included_column,
+                   (SELECT SUM(p.rows) FROM sys.partitions p WHERE p.object_id = t.object_id AND p.index_id IN (0, 1)) AS row_count
+            FROM sys.tables t
+            JOIN sys.schemas s ON t.schema_id = s.schema_id
+            LEFT JOIN sys.indexes i ON i.object_id = t.object_id AND i.type > 0
+            LEFT JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+            LEFT JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+            WHERE s.name = :schema
+            ORDER BY t.name, i.index_id, ic.is_included_column, ic.key_ordinal, ic.index_column_id
+        """), {"schema": schema}).all()
+
+    tables = {}
+    for row in indexes:
+        entry = tables.setdefault(row.table_name, {"rows": int(row.row_count or 0), "rowid_type": None, "indexes": {}})
+        if row.index_name is None:
+            continue
+        index = entry["indexes"].setdefault(row.index_name, {"type": row.type_desc, "unique": bool(row.is_unique), "keys": [], "include": []})
+        if row.column_name and row.type_desc != "CLUSTERED COLUMNSTORE":
+            index["include" if row.is_included_column else "keys"].append(row.column_name)
+    table_columns = {}
+    for table_name, column_name, data_type in columns:
+        table_columns.setdefault(table_name, set()).add(column_name.upper())
+        if column_name.upper() == "ROWID" and table_name in tables:
+            tables[table_name]["rowid_type"] = data_type
+    for table_name, entry in tables.items():
+        plan = plan_table_indexes(table_name, table_columns.get(table_name, set()), entry["rows"])
+        has_clustered = any(index["type"].startswith("CLUSTERED") for index in entry["indexes"].values())
+        entry["heap"] = not has_clustered
+        entry["missing"] = [
+            name for name, index in plan.items()
+            if name not in entry["indexes"] and not (index["type"].startswith("CLUSTERED") and has_clustered)
+        ]
+    return {"status": "ok", "dialect": engine.dialect.name, "tables": tables}
@@ -0,0 +1,191 @@
+import re
+import json
+import zlib
+from collections import Counter
+from threading import Lock, Thread
+from typing import Optional
+from sqlalchemy import inspect, select, table, column
+from app.core.config import settings
+from app.utils.local_cache import LocalTTLCache
+from app.utils.redis_client import get_redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+VALUE_INDEX_PREFIX = "value_index"
+
+_local_indexes = LocalTTLCache(max_entries=64, ttl_seconds=settings.VALUE_INDEX_TTL_SECONDS)
+# One build lock per schema, so a scan of one schema does not hold up lookups of another
+_build_locks = {}
+_build_locks_lock = Lock()
+
+_STOPWORDS = {
+    "a", "all", "an", "and", "any", "are", "as", "at", "be", "by", "count", "did", "do", "does", "for", "from",
+    "get", "had", "has", "have", "how", "in", "is", "it", "list", "many", "me", "number", "of", "on", "or",
+    "patients", "show", "subject", "subjects", "that", "the", "their", "there", "to", "was", "were", "what",
+    "when", "which", "who", "with",
+}
+_MAX_PHRASE_WORDS = 4
+
+def indexed_columns() -> set:
+    return {name.strip().upper() for name in settings.VALUE_INDEX_COLUMNS.split(",") if name.strip()}
+
+def _normalize(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+def trigrams(text: str) -> set:
+    """Word trigrams padded like pg_trgm, so short words and word starts still match"""
+    grams = set()
+    for word in _normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class ValueIndex:
+    """
+    Trigram index over the distinct values of controlled-terminology columns of one schema.
+
+    values maps "TABLE.COLUMN" to its distinct values. Lookups only touch the
+    posting lists of the phrase's trigrams, so resolving a question costs
+    microseconds and no database access.
+    """
+
+    def __init__(self, values: dict):
+        self.values = values
+        self.entries = []
+        self.postings = {}
+        for source, column_values in values.items():
+            table_name, column_name = source.split(".", 1)
+            for value in column_values:
+                grams = trigrams(value)
+                # One- and two-character codes (grades, Y/N flags) would match almost any text
+                if len(_normalize(value).replace(" ", "")) < 3:
+                    continue
+                entry_id = len(self.entries)
+                self.entries.append((table_name, column_name, value, len(grams)))
+                for gram in grams:
+                    self.postings.setdefault(gram, []).append(entry_id)
+
+    def lookup(self, phrase: str, limit: int = 5, min_similarity: float = 0.5):
+        """Values most similar to the phrase as (table, column, value, similarity), best first"""
+        grams = trigrams(phrase)
+        if not grams:
+            return []
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        matches = []
+        for entry_id, common in shared.items():
+            table_name, column_name, value, size = self.entries[entry_id]
+            similarity = common / (len(grams) + size - common)
+            if similarity >= min_similarity:
+                matches.append((table_name, column_name, value, round(similarity, 3)))
+        matches.sort(key=lambda match: match[3], reverse=True)
+        return matches[:limit]
+
+    def resolve(self, question: str, limit: int = 10, min_similarity: float = 0.5):
+        """
+        Map phrases of a question to observed column values.
+
+        Every run of up to four words is looked up; each value keeps its best
+        matching phrase. Returns dicts with table, column, value, phrase, score.
+        """
+        words = _normalize(question).split()
+        best = {}
+        for size in range(1, _MAX_PHRASE_WORDS + 1):
+            for start in range(len(words) - size + 1):
+                phrase_words = words[start:start + size]
+                if phrase_words[0] in _STOPWORDS or phrase_words[-1] in _STOPWORDS:
+                    continue
+                phrase = " ".join(phrase_words)
+                for table_name, column_name, value, score in self.lookup(phrase, limit, min_similarity):
+                    key = (table_name, column_name, value)
+                    if key not in best or score > best[key]["score"]:
+                        best[key] = {"table": table_name, "column": column_name, "value": value, "phrase": phrase, "score": score}
+        return sorted(best.values(), key=lambda hint: hint["score"], reverse=True)[:limit]
+
+def _redis_key(schema: str, dataset_version: str) -> str:
+    return f"{VALUE_INDEX_PREFIX}:{schema.lower()}:{dataset_version}"
+
+def collect_values(engine, schema: str) -> dict:
+    """Distinct values of the configured columns in every table of the schema"""
+    wanted = indexed_columns()
+    inspector = inspect(engine)
+    values = {}
+    with engine.connect() as conn:
+        for table_name in inspector.get_table_names(schema=schema):
+            for col in inspector.get_columns(table_name, schema=schema):
+                if col["name"].upper() not in wanted:
+                    continue
+                source = table(table_name, column(col["name"]), schema=schema)
+                target = source.c[col["name"]]
+                stmt = select(target).distinct().where(target.isnot(None)).limit(settings.VALUE_INDEX_MAX_VALUES + 1)
+                rows = [str(row[0]).strip() for row in conn.execute(stmt)]
+                if len(rows) > settings.VALUE_INDEX_MAX_VALUES:
+                    logger.warning(f"[WARNING] {schema}.{table_name}.{col['name']} has more than {settings.VALUE_INDEX_MAX_VALUES} distinct values, not indexed")
+                    continue
+                values[f"{table_name.upper()}.{col['name'].upper()}"] = sorted({row for row in rows if row})
+    return values
+
+def build_value_index(engine, schema: str, dataset_version: str) -> ValueIndex:
+    """Scan the schema once and share the value lists with other workers through Redis"""
+    values = collect_values(engine, schema)
+    if settings.REDIS_CONFIG:
+        try:
+            payload = zlib.compress(json.dumps(values).encode("utf-8"))
+            get_redis_client(decode_responses=False).set(_redis_key(schema, dataset_version), payload, ex=settings.VALUE_INDEX_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not store value index for {schema}: {str(e)}")
+    index = ValueIndex(values)
+    _local_indexes.set(_redis_key(schema, dataset_version), index)
+    return index
+
+def _build_lock(schema: str) -> Lock:
+    with _build_locks_lock:
+        return _build_locks.setdefault(schema.lower(), Lock())
+
+def find_value_index(schema: str, dataset_version: str) -> Optional[ValueIndex]:
+    """The already built index for the schema's dataset version from this worker or Redis, else None"""
+    key = _redis_key(schema, dataset_version)
+    index = _local_indexes.get(key)
+    if index is not None or not settings.REDIS_CONFIG:
+        return index
+    try:
+        payload = get_redis_client(decode_responses=False).get(key)
+    except Exception as e:
+        logger.warning(f"[WARNING] Could not read value index for {schema}: {str(e)}")
+        return None
+    if not payload:
+        return None
+    index = ValueIndex(json.loads(zlib.decompress(payload)))
+    _local_indexes.set(key, index)
+    return index
+
+def get_value_index(engine, schema: str, dataset_version: str) -> ValueIndex:
+    """
+    Value index for the schema's current dataset version.
+
+    Served from this worker, then from Redis; the schema is only scanned when
+    neither has it, i.e. once per ingest.
+    """
+    index = find_value_index(schema, dataset_version)
+    if index is not None:
+        return index
+    with _build_lock(schema):
+        index = find_value_index(schema, dataset_version)
+        if index is not None:
+            return index
+        return build_value_index(engine, schema, dataset_version)
+
+def build_value_index_in_background(engine, schema: str, dataset_version: str):
+    """Start building the index unless a build of the schema is already running in this worker"""
+    if _build_lock(schema).locked():
+        return
+
+    def build():
+        try:
+            get_value_index(engine, schema, dataset_version)
+        except Exception as e:
+            logger.warning(f"[WARNING] Could not build value index for {schema}: {str(e)}")
+
+    Thread(target=build, name=f"value-index-{schema.lower()}", daemon=True).start()
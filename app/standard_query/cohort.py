@@ -0,0 +1,211 @@
+import re
+import csv
+import json
+from io import StringIO
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from .sql_runner import bind_statement
+from .templates import CompiledTemplate, DATE_EXPR, _select
+import logging
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class CohortAnchor:
+    """
+    Per-subject dates that replace the request's :start/:end/:first_dose in
+    cohort mode. select yields USUBJID, ANCHOR_TERM, ANCHOR_DATE, START_DATE
+    and END_DATE. optional anchors keep a subject's rows unfiltered when its
+    dates are missing, like the single-subject "unanchored" statement.
+    """
+    select: str
+    table: str
+    conditions: Tuple[str, ...] = ()
+    group_by: Optional[str] = None
+    optional: bool = False
+
+_STUDY_PERIOD = (
+    "USUBJID, NULL AS ANCHOR_TERM, RFSTDTC AS ANCHOR_DATE, {start} AS START_DATE, "
+    "TRY_CAST(LEFT(RFENDTC, 10) AS DATE) AS END_DATE"
+)
+
+COHORT_ANCHORS = {
+    # Question types asked about an adverse event: every event of the cohort is an anchor, ongoing ones end today
+    "ae_onset": CohortAnchor(
+        select=(
+            "USUBJID, AEDECOD AS ANCHOR_TERM, AESTDTC AS ANCHOR_DATE, TRY_CAST(LEFT(AESTDTC, 10) AS DATE) AS START_DATE, "
+            "COALESCE(TRY_CAST(LEFT(NULLIF(AEENDTC, ''), 10) AS DATE), CAST(GETDATE() AS DATE)) AS END_DATE"
+        ),
+        table="AE",
+        conditions=("NULLIF(AESTDTC, '') IS NOT NULL",),
+    ),
+    "study_period": CohortAnchor(
+        select=_STUDY_PERIOD.format(start="TRY_CAST(LEFT(RFSTDTC, 10) AS DATE)"), table="DM", optional=True,
+    ),
+    "study_period_30_days_prior": CohortAnchor(
+        select=_STUDY_PERIOD.format(start="DATEADD(day, -30, TRY_CAST(LEFT(RFSTDTC, 10) AS DATE))"), table="DM", optional=True,
+    ),
+    "first_dose": CohortAnchor(
+        select=(
+            "USUBJID, NULL AS ANCHOR_TERM, MIN(EXSTDTC) AS ANCHOR_DATE, TRY_CAST(LEFT(MIN(EXSTDTC), 10) AS DATE) AS START_DATE, "
+            "NULL AS END_DATE"
+        ),
+        table="EX",
+        group_by="USUBJID",
+    ),
+}
+
+_ANCHOR_VALUES = {"start": "a.START_DATE", "end": "a.END_DATE", "first_dose": "a.START_DATE"}
+
+def _anchored(sql: str) -> str:
+    """Request dates replaced by the anchor row's dates"""
+    return re.sub(r":(start|end|first_dose)\b", lambda match: _ANCHOR_VALUES[match.group(1)], sql)
+
+def _anchor_cte(anchor: CohortAnchor, subjects: bool, serious_only: bool, anchor_terms: bool) -> str:
+    where = list(anchor.conditions)
+    if subjects:
+        where.append("USUBJID IN :subjects")
+    if anchor.table == "AE":
+        if serious_only:
+            where.append("AESER = 'Y'")
+        if anchor_terms:
+            where.append("AEDECOD IN :anchor_terms")
+    sql = f"SELECT {anchor.select} FROM {{schema}}.{anchor.table}"
+    sql += f" WHERE {' AND '.join(where)}" if where else ""
+    sql += f" GROUP BY {anchor.group_by}" if anchor.group_by else ""
+    return (
+        "WITH anchors AS (SELECT x.*, ROW_NUMBER() OVER (ORDER BY x.USUBJID, x.ANCHOR_DATE, x.ANCHOR_TERM) AS ANCHOR_ID "
+        f"FROM ({sql}) x)"
+    )
+
+def cohort_statement(
+    compiled: CompiledTemplate,
+    schema: str,
+    query_data: dict,
+    subjects=None,
+    serious_only: bool = False,
+    anchor_terms=None,
+    persisted: bool = False,
+):
+    """
+    One set-based statement evaluating a template for many subjects (all when
+    subjects is empty).
+
+    Question types that take dates are joined to per-subject anchors, e.g.
+    every adverse event onset, and ranked with ROW_NUMBER per subject, anchor
+    and test, so "lab values at AE onset" for a whole cohort is one query.
+    Rows start with the subject and, when anchored, the anchor term and date.
+    """
+    template = compiled.template
+    anchor_name = None
+    QuestionType, shape = compiled.shape(query_data, supplied=("AESTDTC", "AEENDTC"))
+    if shape.anchor:
+        anchor_name = shape.anchor
+    elif "AESTDTC" in shape.requires:
+        anchor_name = "ae_onset"
+
+    filters, present = compiled.bind_filters(query_data)
+    params = dict(filters)
+    if subjects:
+        params["subjects"] = list(subjects)
+    date = template.date_key if persisted and template.date_key else DATE_EXPR.format(column=template.date_column)
+    conditions = dict(compiled.date_conditions(QuestionType, shape, date))
+    if QuestionType == "within_days":
+        condition = conditions["after" if query_data["Days"] >= 0 else "before"]
+        params["days"] = query_data["Days"]
+    else:
+        condition = conditions[None]
+    columns = shape.columns or template.columns
+    where = compiled.filter_conditions(present)
+
+    if anchor_name is None:
+        where = (["USUBJID IN :subjects"] if subjects else []) + where + ([condition] if condition else [])
+        tail = shape.tail.replace("GROUP BY ", "GROUP BY USUBJID, ").replace("ORDER BY ", "ORDER BY USUBJID, ") if shape.tail else f"ORDER BY USUBJID, {template.order_by}"
+        select = _select(columns).replace("SELECT ", "SELECT USUBJID as 'Subject', ", 1)
+        sql = f"{select} FROM {{schema}}.{template.domain}{' WHERE ' + ' AND '.join(where) if where else ''} {tail}"
+        return sql.replace("{schema}", schema), params
+
+    anchor = COHORT_ANCHORS[anchor_name]
+    if anchor_terms and anchor.table == "AE":
+        params["anchor_terms"] = list(anchor_terms)
+    condition = _anchored(condition)
+    if condition and anchor.optional:
+        condition = f"(a.START_DATE IS NULL OR a.END_DATE IS NULL OR {condition})"
+    where = where + ([condition] if condition else [])
+    cte = _anchor_cte(anchor, bool(subjects), serious_only, bool(anchor_terms and anchor.table == "AE"))
+    joined = f"FROM anchors a JOIN {{schema}}.{template.domain} t ON t.USUBJID = a.USUBJID{' WHERE ' + ' AND '.join(where) if where else ''}"
+    anchor_columns = "a.USUBJID AS anchor_subject, a.ANCHOR_TERM AS anchor_term, a.ANCHOR_DATE AS anchor_date, a.ANCHOR_ID AS anchor_id"
+    labels = "anchor_subject as 'Subject', anchor_term as 'Anchor Term', anchor_date as 'Anchor Date', "
+
+    if shape.rank:
+        order = _anchored(compiled.rank_order(shape, date))
+        inner = (
+            f"SELECT {anchor_columns}, " + ", ".join(col.name for col in columns)
+            + f", ROW_NUMBER() OVER (PARTITION BY a.ANCHOR_ID, {template.partition_key} ORDER BY {order}) as rn {joined}"
+        )
+        select = _select(columns).replace("SELECT ", f"SELECT {labels}", 1)
+        sql = f"{cte} {select} FROM ({inner}) ranked WHERE rn = 1 ORDER BY anchor_subject, anchor_id, {template.partition_key}"
+    else:
+        inner = f"SELECT {anchor_columns}, " + ", ".join(col.name for col in columns) + f" {joined}"
+        select = _select(columns).replace("SELECT ", f"SELECT {labels}", 1)
+        sql = f"{cte} {select} FROM ({inner}) anchored ORDER BY anchor_subject, anchor_id, {template.order_by}"
+    return sql.replace("{schema}", schema), params
+
+def _cell(value):
+    return "" if value is None else str(value)
+
+def stream_cohort(engine, sql: str, params: dict, fmt: str = "csv", max_rows: int = 0, chunk_rows: int = 1000):
+    """
+    Run a cohort statement with a server-side cursor and return its rows as an
+    iterator of CSV or JSON table ({"columns", "rows", "truncated"}) chunks. A
+    CSV cut at max_rows ends with a "# Truncated ..." comment row.
+
+    The statement is executed here, so SQL errors are raised to the caller
+    before any response is sent; the iterator only fetches and closes the
+    connection when it is exhausted or closed.
+    """
+    conn = engine.connect()
+    try:
+        result = conn.execution_options(stream_results=True).execute(bind_statement(sql, params), params)
+        columns = list(result.keys())
+    except Exception:
+        conn.close()
+        raise
+    return _cohort_chunks(conn, result, columns, fmt, max_rows, chunk_rows)
+
+def _cohort_chunks(conn, result, columns: list, fmt: str, max_rows: int, chunk_rows: int):
+    try:
+        sent = 0
+        truncated = False
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(columns)
+        else:
+            buffer.write('{"columns": ' + json.dumps(columns) + ', "rows": [')
+        while True:
+            rows = result.fetchmany(chunk_rows)
+            if not rows:
+                break
+            if max_rows and sent + len(rows) > max_rows:
+                rows = rows[:max_rows - sent]
+                truncated = True
+            for row in rows:
+                if fmt == "csv":
+                    writer.writerow([_cell(value) for value in row])
+                else:
+                    buffer.write(("," if sent else "") + json.dumps([_cell(value) for value in row]))
+                sent += 1
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            if truncated:
+                logger.warning(f"[WARNING] Cohort result cut at {max_rows} rows")
+                break
+        if fmt != "csv":
+            buffer.write(f'], "truncated": {json.dumps(truncated)}}}')
+        elif truncated:
+            writer.writerow([f"# Truncated: only the first {max_rows} rows are included"])
+        yield buffer.getvalue()
+    finally:
+        conn.close()
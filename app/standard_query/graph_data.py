@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import pandas as pd
+from .sql_runner import bind_statement
+from .templates import DATE_EXPR
+
+@dataclass(frozen=True)
+class SeriesSource:
+    """Columns of a findings domain plotted as one numeric series per test"""
+    domain: str
+    test: str
+    value: str
+    unit: str
+    date_column: str
+    date_key: str
+    low: Optional[str] = None
+    high: Optional[str] = None
+    category: Optional[str] = None
+
+SERIES_SOURCES = {
+    "LB": SeriesSource("LB", "LBTEST", "TRY_CAST(LBSTRESC AS FLOAT)", "LBSTRESU", "LBDTC", "LBDT", "LBSTNRLO", "LBSTNRHI", "LBCAT"),
+    "VS": SeriesSource("VS", "VSTEST", "TRY_CAST(VSSTRESN AS FLOAT)", "VSSTRESU", "VSDTC", "VSDT"),
+}
+
+def series_statement(schema: str, source: SeriesSource, tests: bool, category: bool, persisted: bool = False) -> str:
+    day = source.date_key if persisted else DATE_EXPR.format(column=source.date_column)
+    where = ["USUBJID = :usubjid", f"{day} IS NOT NULL"]
+    if tests:
+        where.append(f"{source.test} IN :tests")
+    if category and source.category:
+        where.append(f"{source.category} = :category")
+    low = f"TRY_CAST({source.low} AS FLOAT)" if source.low else "NULL"
+    high = f"TRY_CAST({source.high} AS FLOAT)" if source.high else "NULL"
+    return (
+        f"SELECT {source.test} AS test, {source.unit} AS unit, {source.date_column} AS dtc, {source.value} AS value, "
+        f"{low} AS low, {high} AS high FROM {schema}.{source.domain} WHERE {' AND '.join(where)} "
+        f"ORDER BY {source.test}, {source.date_column}"
+    )
+
+def reference_flags(values: np.ndarray, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+    """L/H/N against the reference range; empty where the value or both limits are missing"""
+    flags = np.full(values.shape, "", dtype="<U1")
+    with np.errstate(invalid="ignore"):
+        below = values < low
+        above = values > high
+    ranged = ~np.isnan(values) & ~(np.isnan(low) & np.isnan(high))
+    flags[ranged] = "N"
+    flags[ranged & below] = "L"
+    flags[ranged & above] = "H"
+    return flags
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, budget: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of at most budget points that keep
+    the series' visual shape. First and last points are always kept.
+    """
+    n = len(x)
+    if budget >= n:
+        return np.arange(n)
+    if budget < 3:
+        return np.array([0, n - 1][:max(budget, 0)], dtype=int)
+    # budget - 2 buckets between the fixed end points, each at least one point wide
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    selected = np.empty(budget, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(budget - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        following = slice(end, edges[bucket + 2]) if bucket + 2 < len(edges) else slice(n - 1, n)
+        mean_x, mean_y = x[following].mean(), y[following].mean()
+        areas = np.abs(
+            (x[previous] - mean_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (mean_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+def minmax_indices(y: np.ndarray, budget: int) -> np.ndarray:
+    """Indices of the lowest and highest point of each of budget // 2 equal buckets, in order"""
+    n = len(y)
+    if budget >= n:
+        return np.arange(n)
+    buckets = max(budget // 2, 1)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    keep = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            keep.extend((start + int(np.argmin(y[start:end])), start + int(np.argmax(y[start:end]))))
+    return np.unique(keep)
+
+def build_series(frame: pd.DataFrame, max_points: int, method: str = "lttb") -> list:
+    """One series per test from the statement's rows; flags use every point, the arrays are downsampled"""
+    series = []
+    for test, rows in frame.groupby("test", sort=True):
+        rows = rows.assign(value=pd.to_numeric(rows["value"], errors="coerce"), when=pd.to_datetime(rows["dtc"], format="ISO8601", errors="coerce"))
+        rows = rows[rows["value"].notna() & rows["when"].notna()].sort_values("when", kind="stable")
+        if rows.empty:
+            continue
+        y = rows["value"].to_numpy(dtype=float)
+        low = pd.to_numeric(rows["low"], errors="coerce").to_numpy(dtype=float)
+        high = pd.to_numeric(rows["high"], errors="coerce").to_numpy(dtype=float)
+        flags = reference_flags(y, low, high)
+        x = rows["when"].to_numpy(dtype="datetime64[s]").astype(np.int64).astype(float)
+        keep = minmax_indices(y, max_points) if method == "minmax" else lttb_indices(x, y, max_points)
+        series.append({
+            "test": test,
+            "unit": next((unit for unit in rows["unit"] if unit), None),
+            "points": int(len(y)),
+            "returned": int(len(keep)),
+            "abnormal": {"L": int((flags == "L").sum()), "H": int((flags == "H").sum())},
+            "x": [str(value) for value in rows["dtc"].to_numpy()[keep]],
+            "y": [round(float(value), 4) for value in y[keep]],
+            "low": [None if np.isnan(value) else float(value) for value in low[keep]],
+            "high": [None if np.isnan(value) else float(value) for value in high[keep]],
+            "flag": flags[keep].tolist(),
+        })
+    return series
+
+def graph_series(engine, schema: str, domain: str, usubjid: str, tests=None, category: str = None,
+                 max_points: int = 500, method: str = "lttb", persisted: bool = False) -> list:
+    """Numeric series per test for a subject's lab or vital-sign results"""
+    source = SERIES_SOURCES.get(domain.upper())
+    if source is None:
+        raise ValueError(f"Graph data is available for {', '.join(SERIES_SOURCES)}, not {domain}")
+    sql = series_statement(schema, source, bool(tests), bool(category), persisted)
+    params = {"usubjid": usubjid}
+    if tests:
+        params["tests"] = list(tests)
+    if category and source.category:
+        params["category"] = category
+    with engine.connect() as conn:
+        result = conn.execute(bind_statement(sql, params), params)
+        frame = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    if frame.empty:
+        return []
+    return build_series(frame, max_points, method)
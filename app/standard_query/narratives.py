@@ -0,0 +1,175 @@
+import re
+import ast
+
+# Window wording per QuestionType; {start}, {end} and {days} come from the request
+_WINDOWS = {
+    "study": "over the course of the study",
+    "graph": "over the course of the study",
+    "at_time": "closest to {start}",
+    "prior": "on or before {start}",
+    "prior_first": "prior to the first dose",
+    "during": "between {start} and {end}",
+    "prior_during": "from 30 days before study start through study end",
+    "treatment_discontinuation": "at end of treatment",
+    "study_discontinuation": "at end of study",
+    "summary": "over the course of the study",
+    "modification": "where the dose was modified",
+    "interruption": "where dosing was interrupted",
+}
+
+def parse_query_result(result) -> list:
+    """Rows (dicts) of a SQLDatabase.run result string; Decimal and date reprs are reduced to text"""
+    if isinstance(result, list):
+        return result
+    if not isinstance(result, str) or not result.startswith("["):
+        return []
+    text = re.sub(r"Decimal\('([^']*)'\)", r"'\1'", result)
+    text = re.sub(
+        r"datetime\.(?:date|datetime)\((\d+), (\d+), (\d+)[^)]*\)",
+        lambda m: f"'{int(m.group(1)):04d}-{int(m.group(2)):02d}-{int(m.group(3)):02d}'",
+        text,
+    )
+    try:
+        rows = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return []
+    return [row for row in rows if isinstance(row, dict)]
+
+def _window(QuestionType: str, query_data: dict) -> str:
+    days = query_data.get("Days")
+    if (QuestionType or "").lower() == "within_days" and days is not None:
+        direction = "after" if days >= 0 else "before"
+        return f"within {abs(days)} days {direction} {query_data.get('AESTDTC')}"
+    template = _WINDOWS.get((QuestionType or "").lower(), "for the selected period")
+    return template.format(start=query_data.get("AESTDTC"), end=query_data.get("AEENDTC"), days=days)
+
+def _value(row: dict, *labels):
+    """First non-empty column among labels (aliases differ slightly between modules)"""
+    for label in labels:
+        value = row.get(label)
+        if value not in (None, ""):
+            return str(value).strip()
+    return ""
+
+def _date(value: str) -> str:
+    return value[:10] if value else "unknown date"
+
+def _count(n: int, noun: str) -> str:
+    return f"{n} {noun}{'' if n == 1 else 's'}"
+
+def _lab(rows, subject, window):
+    lines = [f"Subject {subject} had {_count(len(rows), 'laboratory result')} {window}."]
+    for row in rows:
+        value = _value(row, "Character Result/Finding in Std Format")
+        unit = _value(row, "Standard Units")
+        low = _value(row, "Reference Range Lower Limit-Std Units")
+        high = _value(row, "Reference Range Upper Limit-Std Units")
+        flag = ""
+        try:
+            if low and float(value) < float(low):
+                flag = " (below the reference range)"
+            elif high and float(value) > float(high):
+                flag = " (above the reference range)"
+        except ValueError:
+            pass
+        reference = f", reference range {low}-{high} {unit}".rstrip() if low or high else ""
+        lines.append(f"{_value(row, 'Lab Test or Examination Name')}: {value} {unit}".rstrip()
+                     + f" on {_date(_value(row, 'Date/Time of Specimen Collection'))}{flag}{reference}.")
+    return lines
+
+def _medications(rows, subject, window):
+    lines = [f"Subject {subject} received {_count(len(rows), 'medication')} {window}."]
+    for row in rows:
+        dose = " ".join(part for part in (_value(row, "Dose per Administration"), _value(row, "Dose Units")) if part)
+        end = _value(row, "End Date/Time of Medication")
+        lines.append(
+            f"{_value(row, 'Standardized Medication Name', 'Medication/Treatment')}"
+            + (f" {dose}" if dose else "")
+            + f", started {_date(_value(row, 'Start Date/Time of Medication'))}"
+            + (f" and ended {_date(end)}." if end else ", ongoing or end date not recorded.")
+        )
+    return lines
+
+def _procedures(rows, subject, window):
+    lines = [f"Subject {subject} underwent {_count(len(rows), 'procedure')} {window}."]
+    for row in rows:
+        category = _value(row, "Category")
+        lines.append(
+            f"{_value(row, 'Standardized Procedure Name', 'Reported Name of Procedure')}"
+            + (f" ({category})" if category else "")
+            + f" on {_date(_value(row, 'Start Date/Time of Procedure'))}"
+            + (f" (study day {_value(row, 'Study Day of Start of Procedure')})." if _value(row, "Study Day of Start of Procedure") else ".")
+        )
+    return lines
+
+def _adverse_events(rows, subject, window):
+    lines = [f"Subject {subject} experienced {_count(len(rows), 'adverse event')} {window}."]
+    for row in rows:
+        grade = _value(row, "Grade/Severity")
+        day = _value(row, "Start Date Study Day")
+        lines.append(
+            f"{_value(row, 'Preferred Term')}"
+            + (f" (grade {grade})" if grade else "")
+            + f", onset {_date(_value(row, 'Start Date'))}"
+            + (f" (study day {day})." if day else ".")
+        )
+    return lines
+
+def _vital_signs(rows, subject, window):
+    lines = [f"Subject {subject} had {_count(len(rows), 'vital sign measurement')} {window}."]
+    for row in rows:
+        day = _value(row, "Study Day of Vital Signs")
+        lines.append(
+            f"{_value(row, 'Vital Signs Test Name')}: "
+            + f"{_value(row, 'Numeric Result/Finding in Standard Units')} {_value(row, 'Standard Units')}".rstrip()
+            + f" on {_date(_value(row, 'Date/Time of Measurements'))}"
+            + (f" (study day {day})." if day else ".")
+        )
+    return lines
+
+def _disposition(rows, subject, window):
+    lines = [f"Subject {subject} has {_count(len(rows), 'disposition record')} {window}."]
+    for row in rows:
+        term = _value(row, "Standardized Disposition Term (DSDECOD)", "Reported Term for the Disposition Event (DSTERM)")
+        lines.append(f"{term} on {_date(_value(row, 'Start Date/Time of Disposition Event (DSSTDTC)'))}.")
+    return lines
+
+def _dosing(rows, subject, window):
+    lines = [f"Subject {subject} has {_count(len(rows), 'dosing record')} {window}."]
+    for row in rows:
+        if "First Dose Start Date (EXSTDTC)" in row:
+            lines.append(
+                f"{_value(row, 'Treatment (EXTRT)')}: first dose {_date(_value(row, 'First Dose Start Date (EXSTDTC)'))}, "
+                f"last dose {_date(_value(row, 'Last Dose End Date (EXENDTC)'))}."
+            )
+        else:
+            reason = _value(row, "Reason for Dose Adjustment (EXADJ)")
+            lines.append(
+                f"{_value(row, 'Name of Treatment (EXTRT)')} {_value(row, 'Dose (EXDOSE)/Dose Units (EXDOSU)')}".rstrip()
+                + f" from {_date(_value(row, 'Start Date/Time of Treatment (EXSTDTC)'))}"
+                + (f": {reason}." if reason else ".")
+            )
+    return lines
+
+# ModuleType -> template, same numbering as handle_standard_query
+NARRATIVE_TEMPLATES = {
+    1: _lab,
+    2: _medications,
+    3: _procedures,
+    4: _adverse_events,
+    5: _vital_signs,
+    6: _disposition,
+    7: _dosing,
+}
+
+def render_narrative(query_data: dict, query_result) -> str:
+    """
+    Rule-based narrative for a standard query result, built from the rows alone.
+    Deterministic and instant; used as the summary until the LLM version is ready.
+    """
+    template = NARRATIVE_TEMPLATES.get(query_data.get("ModuleType"))
+    rows = parse_query_result(query_result)
+    if template is None or not rows:
+        return "No data found for the specified criteria."
+    window = _window(query_data.get("QuestionType"), query_data)
+    return " ".join(template(rows, query_data.get("Usubject"), window))
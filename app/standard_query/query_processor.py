@@ -1,34 +1,28 @@
 from app.standard_query.handler import handle_standard_query
 import json
-from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import MessagesState, StateGraph, START, END
-from langgraph.checkpoint.redis import RedisSaver
 from app.core.config import settings
+from app.ai.langgraph_workflow.graph_memory import compact_memory, get_checkpointer, record_session_metrics
+from app.ai.llm_gateway import invoke_llm, collect_node_metrics, llm_priority, BATCH
+from app.ai.llm_clients import get_chat_model
+from app.ai.langgraph_workflow.graph_metrics import NodeTimer
+from app.services.result_cache import collect_query_metrics
+from app.services.query_metrics import build_run_metrics
+from app.standard_query.narratives import render_narrative
+from app.db.session import SessionLocal
+from app.models.user import ClinicalQueryMessage
+import time
+import logging
+
+logger = logging.getLogger(__name__)
 
 def build_summary_agent(LlmType: str, ModelName: str):
     """Build contextual summary agent with Redis support - only for AI part"""
     
-    # LLM config
-    if LlmType == "Azure OpenAI":
-        deployment_name = ModelName
-        model_provider = "azure_openai"
-    elif LlmType == "OpenAI":
-        deployment_name = ModelName
-        model_provider = "openai"
-    else:
-        raise ValueError(f"Unsupported LLM type: {LlmType}")
-    
-    api_key = settings.AZURE_OPENAI_API_KEY
-    if not api_key:
-        raise ValueError("AZURE_OPENAI_API_KEY not found")
-
-    llm = init_chat_model(
-        deployment_name,
-        model_provider=model_provider,
-        temperature=0,
-        api_key=api_key,
-    )
+    # Pooled client shared across requests
+    llm = get_chat_model(LlmType, ModelName)
+    deployment_name = ModelName
     
     def generate_summary_node(state: MessagesState):
         """Node that generates contextual summary using LLM"""
@@ -45,65 +39,94 @@ def build_summary_agent(LlmType: str, ModelName: str):
         prompt_messages = [HumanMessage(content=system_prompt)]
         prompt_messages.extend(messages)
         
-        response = llm.invoke(prompt_messages)
+        response = invoke_llm(llm, prompt_messages, deployment_name, node="generate_summary")
         
         return {"messages": [AIMessage(content=response.content)]}
     
     # Build simple graph for summary generation
     builder = StateGraph(MessagesState)
+    builder.add_node("compact_memory", compact_memory)
     builder.add_node("generate_summary", generate_summary_node)
-    builder.add_edge(START, "generate_summary")
+    builder.add_edge(START, "compact_memory")
+    builder.add_edge("compact_memory", "generate_summary")
     builder.add_edge("generate_summary", END)
     
     # Add Redis support if enabled
     is_redis = settings.REDIS_CONFIG
     if is_redis:
-        redis_url = settings.REDIS_URL
-        with RedisSaver.from_conn_string(redis_url) as saver:
-            saver.setup()
-            return builder.compile(checkpointer=saver)
+        return builder.compile(checkpointer=get_checkpointer())
     else:
         return builder.compile()
 
-def process_standard_query(ProjectNumber: str, FolderName: str, Question: str, LlmType: str, ModelName: str, STANDARD_QUERY_DATA: dict, SessionId: int):
-    """Process standard query - only AI summary part is contextual"""
+def generate_standard_summary(Question: str, query_result: str, LlmType: str, ModelName: str, SessionId: int, callbacks: list = None) -> str:
+    """LLM narrative of a standard query result, written to the session thread for follow-up context"""
+    summary_agent = build_summary_agent(LlmType, ModelName)
+
+    # Configure with thread ID for Redis context
+    is_redis = settings.REDIS_CONFIG
+    config = {"configurable": {"thread_id": str(SessionId)}} if is_redis else {}
+
+    # Create prompt for summary generation
+    summary_prompt = f"""Based on the following clinical trial data, provide a concise narrative summary suitable for clinical documentation:
+
+    Question: {Question}
+    Query Results: {query_result}
+
+    Generate a professional clinical narrative that:
+    - Summarizes the key laboratory findings
+    - Uses appropriate clinical terminology
+    - Is ready to copy into clinical documents
+    - Focuses only on the data presented without additional recommendations or follow-up suggestions
+
+    Format the response as a clear, factual summary suitable for regulatory documentation.
+    """
+
+    # Invoke contextual summary agent
+    summary_result = summary_agent.invoke(
+        {"messages": [HumanMessage(content=summary_prompt)]},
+        config={**config, "callbacks": callbacks or []}
+    )
+
+    # Extract summary from agent response
+    summary = summary_result["messages"][-1].content if summary_result["messages"] else "Summary generation failed"
+    if is_redis:
+        record_session_metrics(str(SessionId), summary_result["messages"])
+    return summary
+
+def process_standard_query(ProjectNumber: str, FolderName: str, Question: str, LlmType: str, ModelName: str, STANDARD_QUERY_DATA: dict, SessionId: int, node_models: dict = None, fast_summary: bool = False):
+    """
+    Process standard query - only AI summary part is contextual.
+
+    With fast_summary the answer carries a templated narrative built from the rows
+    and no LLM call is made; run details then have SummaryStatus "pending" and the
+    caller schedules polish_standard_summary for the stored message.
+    Returns the answer JSON, the table JSON and run details (timings, tokens, SQL metrics) for the message Metadata.
+    """
     print(f"Processing standard query for project: {ProjectNumber}, folder: {FolderName}")
-    
+    timer = NodeTimer()
+    start = time.perf_counter()
+    with collect_node_metrics() as node_metrics, collect_query_metrics() as queries:
+        response, table_response, run_info = _run_standard_query(ProjectNumber, FolderName, Question, LlmType, ModelName, STANDARD_QUERY_DATA, SessionId, node_models, fast_summary, timer)
+    run_info["Metrics"] = build_run_metrics((time.perf_counter() - start) * 1000, timer.summary(), node_metrics, queries)
+    return response, table_response, run_info
+
+def _run_standard_query(ProjectNumber: str, FolderName: str, Question: str, LlmType: str, ModelName: str, STANDARD_QUERY_DATA: dict, SessionId: int, node_models: dict, fast_summary: bool, timer: NodeTimer):
+    run_info = {}
     try:
         # Step 1: Get query result from handler (non-contextual)
+        handler_start = time.perf_counter()
         result = handle_standard_query(ProjectNumber, FolderName, Question, STANDARD_QUERY_DATA)
+        timer.record("standard_query", (time.perf_counter() - handler_start) * 1000)
         
         if result["query_result"] and result["query_result"] != "No data found":
-            # Step 2: Generate contextual summary using LangGraph agent
-            summary_agent = build_summary_agent(LlmType, ModelName)
-            
-            # Configure with thread ID for Redis context
-            is_redis = settings.REDIS_CONFIG
-            config = {"configurable": {"thread_id": str(SessionId)}} if is_redis else {}
-            
-            # Create prompt for summary generation
-            summary_prompt = f"""Based on the following clinical trial data, provide a concise narrative summary suitable for clinical documentation:
-
-            Question: {Question}
-            Query Results: {result["query_result"]}
-
-            Generate a professional clinical narrative that:
-            - Summarizes the key laboratory findings
-            - Uses appropriate clinical terminology
-            - Is ready to copy into clinical documents
-            - Focuses only on the data presented without additional recommendations or follow-up suggestions
-
-            Format the response as a clear, factual summary suitable for regulatory documentation.
-            """
-            
-            # Invoke contextual summary agent
-            summary_result = summary_agent.invoke(
-                {"messages": [HumanMessage(content=summary_prompt)]},
-                config=config
-            )
-            
-            # Extract summary from agent response
-            summary = summary_result["messages"][-1].content if summary_result["messages"] else "Summary generation failed"
+            if fast_summary and not str(result["query_result"]).startswith("Error"):
+                # Step 2 (fast): templated narrative now, LLM narrative patched in later
+                summary = render_narrative(STANDARD_QUERY_DATA, result["query_result"])
+                run_info.update({"NarrativeSource": "template", "SummaryStatus": "pending"})
+            else:
+                # Step 2: Generate contextual summary using LangGraph agent
+                summary_llm_type, summary_model_name = (node_models or {}).get("generate_summary", (LlmType, ModelName))
+                summary = generate_standard_summary(Question, result["query_result"], summary_llm_type, summary_model_name, SessionId, [timer])
            
             # Return structured response with required format
             response = {
@@ -130,7 +153,7 @@ def process_standard_query(ProjectNumber: str, FolderName: str, Question: str, L
                 "readable_summary": "Standard Query"
             }
         
-        return json.dumps(response, indent=2), json.dumps(table_response, indent=2)
+        return json.dumps(response, indent=2), json.dumps(table_response, indent=2), run_info
         
     except Exception as e:
         # Handle both query errors and LLM errors
@@ -146,4 +169,38 @@ def process_standard_query(ProjectNumber: str, FolderName: str, Question: str, L
                 "query": "",
                 "readable_summary": "Standard Query"
             }
-        return json.dumps(error_response, indent=2), json.dumps(table_response, indent=2)
+        return json.dumps(error_response, indent=2), json.dumps(table_response, indent=2), {}
+
+def polish_standard_summary(MessageId: int, Question: str, LlmType: str, ModelName: str, SessionId: int):
+    """
+    Background task: replace the templated narrative of a stored standard-query answer
+    with the LLM narrative. Runs in the batch lane so it never delays interactive calls.
+    The templated narrative stays in place if the LLM call fails.
+    """
+    db = SessionLocal()
+    try:
+        message = db.query(ClinicalQueryMessage).filter(ClinicalQueryMessage.Id == MessageId).first()
+        if not message or not message.StandardTableContent:
+            return
+        metadata = dict(message.Metadata or {})
+        try:
+            with llm_priority(BATCH), collect_node_metrics() as node_metrics:
+                summary = generate_standard_summary(Question, message.StandardTableContent.get("summary", ""), LlmType, ModelName, SessionId)
+        except Exception as e:
+            logger.warning(f"[WARNING] Summary polish failed for message {MessageId}: {str(e)}")
+            metadata["SummaryStatus"] = "failed"
+            message.Metadata = metadata
+            db.commit()
+            return
+
+        content = json.loads(message.Content)
+        content["summary"] = summary
+        message.Content = json.dumps(content, indent=2)
+        metadata.update({"NarrativeSource": "llm", "SummaryStatus": "ready", "PolishTokens": {
+            "prompt_tokens": sum(entry["prompt_tokens"] for entry in node_metrics.values()),
+            "completion_tokens": sum(entry["completion_tokens"] for entry in node_metrics.values()),
+        }})
+        message.Metadata = metadata
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,82 @@
+from sqlalchemy import text, bindparam, String
+from sqlalchemy.exc import SQLAlchemyError
+from langchain_community.utilities import SQLDatabase
+from langchain_community.utilities.sql_database import truncate_word
+from app.services.result_cache import note_fetched_rows
+
+def bind_statement(query: str, parameters: dict = None):
+    """text() clause for the query; list values are bound as expanding parameters (IN :name)"""
+    statement = text(query)
+    expanding = [
+        bindparam(name, expanding=True, type_=String() if all(isinstance(item, str) for item in value) else None)
+        for name, value in (parameters or {}).items() if isinstance(value, (list, tuple))
+    ]
+    return statement.bindparams(*expanding) if expanding else statement
+
+def render_sql(query: str, parameters: dict, dialect) -> str:
+    """Query with the parameter values inlined; for display only, never executed"""
+    if not parameters:
+        return query
+    try:
+        statement = bind_statement(query, parameters).bindparams(**parameters)
+        return str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    except Exception:
+        return query
+
+class StatementRunner:
+    """
+    Runs the standard query modules' bound statements on a shared engine.
+
+    Same run/run_no_throw interface and result strings as SQLDatabase, but
+    without its per-request engine and table reflection, and the SQL text stays
+    the same for every subject and date so the server reuses one cached plan.
+    """
+
+    def __init__(self, engine, max_string_length: int = 300):
+        self._engine = engine
+        self._max_string_length = max_string_length
+
+    @property
+    def dialect(self):
+        return self._engine.dialect
+
+    def run(self, command: str, fetch: str = "all", include_columns: bool = False, *, parameters: dict = None):
+        with self._engine.connect() as connection:
+            cursor = connection.execute(bind_statement(command, parameters), parameters or {})
+            if not cursor.returns_rows:
+                return ""
+            if fetch == "one":
+                first = cursor.fetchone()
+                rows = [] if first is None else [first._asdict()]
+            else:
+                rows = [row._asdict() for row in cursor.fetchall()]
+        note_fetched_rows(len(rows))
+
+        res = [{column: truncate_word(value, length=self._max_string_length) for column, value in row.items()} for row in rows]
+        if not include_columns:
+            res = [tuple(row.values()) for row in res]
+        return str(res) if res else ""
+
+    def run_no_throw(self, command: str, fetch: str = "all", include_columns: bool = False, *, parameters: dict = None):
+        try:
+            return self.run(command, fetch, include_columns, parameters=parameters)
+        except SQLAlchemyError as e:
+            return f"Error: {e}"
+
+class RowCountingSQLDatabase(SQLDatabase):
+    """SQLDatabase that reports the rows it fetches to the run's query metrics"""
+
+    def _execute(self, command, fetch="all", *, parameters=None, execution_options=None):
+        result = super()._execute(command, fetch, parameters=parameters, execution_options=execution_options)
+        if fetch != "cursor":
+            note_fetched_rows(len(result))
+        return result
+
+def run_module_query(db, sql_query: str, parameters: dict) -> dict:
+    """Run a module's final statement; the returned query has the values inlined for display"""
+    sql_query = ' '.join(sql_query.split())
+    result = db.run_no_throw(sql_query, fetch='all', include_columns=True, parameters=parameters)
+    return {
+        "query": render_sql(sql_query, parameters, db.dialect),
+        "query_result": result if result else "No data found"
+    }
@@ -0,0 +1,429 @@
+import re
+import ast
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import combinations
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from app.models.user import QueryModule, QueryCategory
+from .sql_runner import run_module_query
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Date part of an SDTM ISO 8601 --DTC column
+DATE_EXPR = "TRY_CAST(LEFT({column}, 10) AS DATE)"
+
+@dataclass(frozen=True)
+class Col:
+    name: str
+    label: str
+    expr: Optional[str] = None
+
+@dataclass(frozen=True)
+class Filter:
+    """Equality/IN filter on a query_data value; optional filters are skipped when empty or set to skip"""
+    column: str
+    key: str
+    many: bool = False
+    default: Optional[str] = None
+    optional: bool = False
+    skip: Optional[str] = None
+
+@dataclass(frozen=True)
+class Shape:
+    """
+    How one question type filters and ranks a domain.
+
+    condition may use {date} (the domain's date column as a DATE) and the bound
+    names :start, :end, :days and :first_dose. rank keeps one row per partition:
+    "nearest" to :start or "latest". anchor names a lookup that supplies the
+    dates from another domain instead of the request.
+    """
+    condition: str = ""
+    rank: Optional[str] = None
+    requires: Tuple[str, ...] = ()
+    anchor: Optional[str] = None
+    columns: Optional[Tuple[Col, ...]] = None
+    tail: Optional[str] = None
+
+@dataclass(frozen=True)
+class DomainTemplate:
+    domain: str
+    columns: Tuple[Col, ...]
+    date_column: str
+    order_by: str
+    question_types: Dict[str, Shape]
+    partition_key: Optional[str] = None
+    filters: Tuple[Filter, ...] = ()
+    # Persisted DATE column derived from date_column at ingest (see app/services/date_columns.py)
+    date_key: Optional[str] = None
+
+_STUDY = Shape()
+_AT_TIME = Shape(rank="nearest", requires=("AESTDTC",))
+_PRIOR = Shape(rank="latest", condition="{date} <= :start", requires=("AESTDTC",))
+_DURING = Shape(condition="{date} BETWEEN :start AND :end", requires=("AESTDTC", "AEENDTC"))
+_WITHIN_DAYS = Shape(requires=("AESTDTC", "Days"))
+
+LAB_COLUMNS = (
+    Col("LBTEST", "Lab Test or Examination Name"),
+    Col("LBSTRESC", "Character Result/Finding in Std Format"),
+    Col("LBSTRESU", "Standard Units"),
+    Col("LBSTNRLO", "Reference Range Lower Limit-Std Units", "ROUND(LBSTNRLO, 2)"),
+    Col("LBSTNRHI", "Reference Range Upper Limit-Std Units", "ROUND(LBSTNRHI, 2)"),
+    Col("LBDTC", "Date/Time of Specimen Collection"),
+)
+EXPOSURE_COLUMNS = (
+    Col("EXTRT", "Name of Treatment (EXTRT)"),
+    Col("EXDOSE", "Dose (EXDOSE)/Dose Units (EXDOSU)", "CONCAT(EXDOSE, ' ', EXDOSU)"),
+    Col("EXDOSFRQ", "Dosing Frequency per Interval (EXDOSFRQ)"),
+    Col("EXSTDTC", "Start Date/Time of Treatment (EXSTDTC)"),
+    Col("EXSTDY", "Study Day of Start of Treatment (EXSTDY)"),
+    Col("EXADJ", "Reason for Dose Adjustment (EXADJ)"),
+)
+
+# Built-in templates per SDTM domain; which module uses which domain comes from the QueryModule tables
+DOMAIN_TEMPLATES = {
+    "LB": DomainTemplate(
+        domain="LB", columns=LAB_COLUMNS, date_column="LBDTC", order_by="LBDTC, LBTEST", partition_key="LBTEST", date_key="LBDT",
+        filters=(Filter("LBTEST", "LBTEST", many=True, default=""), Filter("LBCAT", "LBCAT", default="Hematology")),
+        question_types={"study": _STUDY, "graph": _STUDY, "at_time": _AT_TIME, "prior": _PRIOR, "during": _DURING, "within_days": _WITHIN_DAYS},
+    ),
+    "CM": DomainTemplate(
+        domain="CM",
+        columns=(
+            Col("CMDECOD", "Standardized Medication Name"), Col("CMTRT", "Medication/Treatment"),
+            Col("CMDOSE", "Dose per Administration"), Col("CMDOSU", "Dose Units"),
+            Col("CMSTDTC", "Start Date/Time of Medication"), Col("CMENDTC", "End Date/Time of Medication"),
+        ),
+        date_column="CMSTDTC", order_by="CMSTDTC", date_key="CMSTDT",
+        filters=(Filter("CMCAT", "CMCAT", many=True, optional=True, skip="No categories"), Filter("CMINDC", "CMINDC", many=True, optional=True, skip="No indications")),
+        question_types={
+            "prior_during": Shape(
+                anchor="study_period_30_days_prior",
+                condition="((CMSTDTC IS NOT NULL AND {date} BETWEEN :start AND :end) OR (CMENDTC IS NOT NULL AND TRY_CAST(LEFT(CMENDTC, 10) AS DATE) BETWEEN :start AND :end) OR (NULLIF(CMSTDTC, '') IS NULL OR NULLIF(CMENDTC, '') IS NULL))",
+            ),
+            "during": _DURING,
+            "within_days": _WITHIN_DAYS,
+        },
+    ),
+    "PR": DomainTemplate(
+        domain="PR",
+        columns=(
+            Col("PRCAT", "Category"), Col("PRDECOD", "Standardized Procedure Name"),
+            Col("PRSTDTC", "Start Date/Time of Procedure"), Col("PRENDTC", "End Date/Time of Procedure"),
+            Col("PRSTDY", "Study Day of Start of Procedure"), Col("PRENDY", "Study Day of End of Procedure"),
+        ),
+        date_column="PRSTDTC", order_by="PRSTDTC", date_key="PRSTDT",
+        filters=(Filter("PRCAT", "PRCAT", many=True, optional=True, skip="No categories"), Filter("PRINDC", "PRINDC", many=True, optional=True, skip="No indications")),
+        question_types={
+            "study": Shape(anchor="study_period", condition="{date} BETWEEN :start AND :end"),
+            "prior_first": Shape(anchor="first_dose", condition="{date} < :first_dose"),
+            "during": _DURING,
+            "within_days": _WITHIN_DAYS,
+        },
+    ),
+    "AE": DomainTemplate(
+        domain="AE",
+        columns=(
+            Col("AETOXGR", "Grade/Severity"), Col("AESTDTC", "Start Date"), Col("AESTDY", "Start Date Study Day"),
+            Col("AEENDY", "End Date Study Day"), Col("AEDECOD", "Preferred Term"),
+        ),
+        date_column="AESTDTC", order_by="AESTDTC, AEDECOD", partition_key="AEDECOD", date_key="AESTDT",
+        question_types={"study": _STUDY, "graph": _STUDY, "at_time": _AT_TIME, "prior": _PRIOR, "during": _DURING, "within_days": _WITHIN_DAYS},
+    ),
+    "VS": DomainTemplate(
+        domain="VS",
+        columns=(
+            Col("VSTEST", "Vital Signs Test Name"), Col("VSSTRESN", "Numeric Result/Finding in Standard Units"),
+            Col("VSSTRESU", "Standard Units"), Col("VSDTC", "Date/Time of Measurements"), Col("VSDY", "Study Day of Vital Signs"),
+        ),
+        date_column="VSDTC", order_by="VSDTC, VSTEST", partition_key="VSTEST", date_key="VSDT",
+        filters=(Filter("VSTEST", "VSTEST", many=True, default=""),),
+        question_types={"at_time": _AT_TIME, "prior": _PRIOR, "during": _DURING, "within_days": _WITHIN_DAYS},
+    ),
+    "DS": DomainTemplate(
+        domain="DS",
+        columns=(
+            Col("DSTERM", "Reported Term for the Disposition Event (DSTERM)"),
+            Col("DSDECOD", "Standardized Disposition Term (DSDECOD)"),
+            Col("DSSTDTC", "Start Date/Time of Disposition Event (DSSTDTC)"),
+            Col("DSSTDY", "Study Day of Start of Disposition Event (DSSTDY)"),
+        ),
+        date_column="DSSTDTC", order_by="DSSTDTC",
+        question_types={
+            "treatment_discontinuation": Shape(condition="DSSCAT = 'END OF TREATMENT'"),
+            "study_discontinuation": Shape(condition="DSSCAT = 'END OF STUDY'"),
+        },
+    ),
+    "EX": DomainTemplate(
+        domain="EX", columns=EXPOSURE_COLUMNS, date_column="EXSTDTC", order_by="EXSTDTC",
+        question_types={
+            "summary": Shape(
+                columns=(
+                    Col("EXTRT", "Treatment (EXTRT)"),
+                    Col("EXSTDTC", "First Dose Start Date (EXSTDTC)", "MIN(EXSTDTC)"),
+                    Col("EXSTDY", "First Dose Study Day (EXSTDY)", "MIN(EXSTDY)"),
+                    Col("EXENDTC", "Last Dose End Date (EXENDTC)", "MAX(EXENDTC)"),
+                    Col("EXENDY", "Last Dose Study Day (EXENDY)", "MAX(EXENDY)"),
+                ),
+                tail="GROUP BY EXTRT ORDER BY MIN(EXSTDTC)",
+            ),
+            "modification": Shape(condition="(EXADJ LIKE '%Increased%' OR EXADJ LIKE '%Withdrawn%' OR EXADJ LIKE '%Reduced%')"),
+            "interruption": Shape(condition="(EXADJ LIKE '%Delayed%' OR EXADJ LIKE '%Held%' OR EXADJ LIKE '%Interrupted%' OR EXADJ LIKE '%Missed%')"),
+        },
+    ),
+}
+
+# ModuleType -> domain when the QueryModule tables cannot be read
+DEFAULT_MODULES = {1: "LB", 2: "CM", 3: "PR", 4: "AE", 5: "VS", 6: "DS", 7: "EX"}
+
+def clean_date(value) -> Optional[str]:
+    """YYYY-MM-DD part of an ISO 8601 value"""
+    if not value:
+        return None
+    value = str(value)
+    match = re.search(r'(\d{4}-\d{2}-\d{2})', value)
+    return match.group(1) if match else value[:10]
+
+def _select(columns) -> str:
+    return "SELECT " + ", ".join(f"{col.expr or col.name} as '{col.label}'" for col in columns)
+
+class CompiledTemplate:
+    """
+    A domain template compiled into finished statements, one per question type,
+    date-window direction and combination of optional filters present. The
+    schema is the only value substituted per request; everything else is bound.
+
+    Domains with a date_key also get persisted_statements, the same statements
+    filtering and ranking on the persisted date column, which the covering
+    index can seek on; they are used for schemas that have the column.
+    """
+
+    def __init__(self, template: DomainTemplate, question_types=None):
+        self.template = template
+        self.question_types = {name: shape for name, shape in template.question_types.items() if question_types is None or name in question_types}
+        optional = [flt.column for flt in template.filters if flt.optional]
+        self.statements = {}
+        self.persisted_statements = {}
+        date = DATE_EXPR.format(column=template.date_column)
+        for name, shape in self.question_types.items():
+            for size in range(len(optional) + 1):
+                for present in combinations(optional, size):
+                    for variant, condition in self.date_conditions(name, shape, date):
+                        self.statements[(name, variant, frozenset(present))] = self._compile(shape, condition, present, date)
+                    if not template.date_key:
+                        continue
+                    for variant, condition in self.date_conditions(name, shape, template.date_key):
+                        self.persisted_statements[(name, variant, frozenset(present))] = self._compile(shape, condition, present, template.date_key)
+
+    def date_conditions(self, name: str, shape: Shape, date: str):
+        """(variant, WHERE term) pairs of a question type's date condition on the given date expression"""
+        if name == "within_days":
+            yield "after", f"{date} BETWEEN :start AND DATEADD(day, :days, :start)"
+            yield "before", f"{date} BETWEEN DATEADD(day, :days, :start) AND :start"
+            return
+        yield None, shape.condition.format(date=date)
+        if shape.anchor:
+            # Anchors without usable dates fall back to the unfiltered statement
+            yield "unanchored", ""
+
+    def filter_conditions(self, present) -> list:
+        """WHERE terms of the template's filters; optional ones only when present"""
+        return [
+            f"{flt.column} IN :{flt.column.lower()}" if flt.many else f"{flt.column} = :{flt.column.lower()}"
+            for flt in self.template.filters if not (flt.optional and flt.column not in present)
+        ]
+
+    def rank_order(self, shape: Shape, date: str) -> str:
+        """ROW_NUMBER ordering that puts the kept row first"""
+        if shape.rank == "nearest":
+            return f"CASE WHEN {date} = :start THEN 0 ELSE 1 END, ABS(DATEDIFF(day, {date}, :start))"
+        return f"{self.template.date_column} DESC"
+
+    def _compile(self, shape: Shape, condition: str, present, date: str) -> str:
+        template = self.template
+        where = ["USUBJID = :usubjid"] + self.filter_conditions(present)
+        base_where = f"FROM {{schema}}.{template.domain} WHERE {' AND '.join(where)}"
+        columns = shape.columns or template.columns
+
+        if shape.rank:
+            subquery_select = "SELECT " + ", ".join(col.name for col in columns)
+            order = self.rank_order(shape, date)
+            condition = f" AND {condition}" if condition else ""
+            return f"{_select(columns)} FROM ({subquery_select}, ROW_NUMBER() OVER (PARTITION BY {template.partition_key} ORDER BY {order}) as rn {base_where}{condition}) ranked WHERE rn = 1"
+        condition = f" AND {condition}" if condition else ""
+        return f"{_select(columns)} {base_where}{condition} {shape.tail or f'ORDER BY {template.order_by}'}"
+
+    def shape(self, query_data: dict, supplied=()) -> Tuple[str, Shape]:
+        """Question type and its shape; raises ValueError when unsupported or inputs not in supplied are missing"""
+        QuestionType = (query_data.get("QuestionType") or "").lower()
+        shape = self.question_types.get(QuestionType)
+        if shape is None:
+            raise ValueError(f"Query type '{query_data.get('QuestionType')}' is not supported. Available types: {', '.join(self.question_types)}")
+        missing = [name for name in shape.requires if name not in supplied and query_data.get(name) in (None, "")]
+        if missing:
+            raise ValueError(f"{' and '.join(missing)} {'is' if len(missing) == 1 else 'are'} required for '{QuestionType}' query type")
+        return QuestionType, shape
+
+    def bind_filters(self, query_data: dict):
+        """Bound filter values and the optional filters present in the request"""
+        params = {}
+        present = set()
+        for flt in self.template.filters:
+            value = query_data.get(flt.key) or flt.default
+            values = [item.strip() for item in str(value or "").split(",")] if flt.many else value
+            if flt.optional:
+                if not values or not values[0] or values[0] == flt.skip:
+                    continue
+                present.add(flt.column)
+            params[flt.column.lower()] = values
+        return params, present
+
+    def statement(self, schema: str, query_data: dict, anchored: bool = True, persisted: bool = False) -> Tuple[str, dict]:
+        """
+        Statement and bound values for a request; raises ValueError for missing or unsupported input.
+        persisted selects the statements on the persisted date column when the domain has one.
+        """
+        QuestionType, shape = self.shape(query_data)
+        filters, present = self.bind_filters(query_data)
+        params = {"usubjid": query_data.get("Usubject"), **filters}
+
+        variant = None
+        if QuestionType == "within_days":
+            variant = "after" if query_data["Days"] >= 0 else "before"
+        elif shape.anchor and not anchored:
+            variant = "unanchored"
+        statements = self.persisted_statements if persisted and self.persisted_statements else self.statements
+        sql = statements[(QuestionType, variant, frozenset(present))].replace("{schema}", schema)
+        values = {
+            "start": clean_date(query_data.get("AESTDTC")),
+            "end": clean_date(query_data.get("AEENDTC")),
+            "days": query_data.get("Days"),
+            "first_dose": query_data.get("FirstDose"),
+        }
+        params.update({name: value for name, value in values.items() if f":{name}" in sql})
+        return sql, params
+
+def _fetch_one(db, query: str, usubject: str):
+    result = db.run_no_throw(query, fetch='one', parameters={"usubjid": usubject})
+    if not result or not isinstance(result, str) or not result.startswith("["):
+        return None
+    rows = ast.literal_eval(result)
+    return rows[0] if rows else None
+
+def _study_period(db, schema, usubject, days_prior: int = 0):
+    row = _fetch_one(db, f"SELECT RFSTDTC, RFENDTC FROM {schema}.DM WHERE USUBJID = :usubjid", usubject)
+    if row is None:
+        raise ValueError(f"No study dates found for subject {usubject}")
+    start, end = clean_date(row[0]), clean_date(row[1] if len(row) > 1 else row[0])
+    if not start or not end:
+        return None
+    if days_prior:
+        try:
+            start = (datetime.strptime(start, '%Y-%m-%d') - timedelta(days=days_prior)).strftime('%Y-%m-%d')
+        except ValueError:
+            return None
+    return {"AESTDTC": start, "AEENDTC": end}
+
+def _first_dose(db, schema, usubject):
+    row = _fetch_one(db, f"SELECT MIN(EXSTDTC) FROM {schema}.EX WHERE USUBJID = :usubjid", usubject)
+    if row is None or not row[0]:
+        raise ValueError(f"No exposure dates found for subject {usubject}")
+    return {"FirstDose": clean_date(row[0])}
+
+# Lookups that supply a question type's dates from another domain
+ANCHORS = {
+    "study_period": _study_period,
+    "study_period_30_days_prior": lambda db, schema, usubject: _study_period(db, schema, usubject, days_prior=30),
+    "first_dose": _first_dose,
+}
+
+class TemplateRegistry:
+    """Compiled templates by ModuleType"""
+
+    def __init__(self, modules: dict):
+        self.modules = modules
+
+    @classmethod
+    def from_domains(cls, module_domains: dict, question_types: dict = None):
+        question_types = question_types or {}
+        return cls({
+            module_id: CompiledTemplate(DOMAIN_TEMPLATES[domain], question_types.get(module_id))
+            for module_id, domain in module_domains.items()
+        })
+
+    def get(self, module_type) -> CompiledTemplate:
+        compiled = self.modules.get(module_type)
+        if compiled is None:
+            raise ValueError(f"Unsupported ModuleType: {module_type}")
+        return compiled
+
+    def run(self, db, schema: str, query_data: dict, persisted_domains=frozenset()) -> dict:
+        """
+        Run a standard query: anchor lookup if the question type has one, then the compiled statement.
+        persisted_domains are the schema's tables that have their persisted date column.
+        """
+        compiled = self.get(query_data.get("ModuleType"))
+        shape = compiled.question_types.get((query_data.get("QuestionType") or "").lower())
+        anchored = True
+        if shape is not None and shape.anchor:
+            dates = ANCHORS[shape.anchor](db, schema, query_data.get("Usubject"))
+            anchored = dates is not None
+            query_data = {**query_data, **(dates or {})}
+        sql, params = compiled.statement(schema, query_data, anchored, compiled.template.domain in persisted_domains)
+        return run_module_query(db, sql, params)
+
+def _module_domain(queries) -> Optional[str]:
+    """The domain every query of a module reads (TablesInvolved also lists the AE/DM tables the dates come from)"""
+    tables = None
+    for query in queries:
+        involved = {table.strip().upper() for table in (query.TablesInvolved or "").split(",") if table.strip()}
+        tables = involved if tables is None else tables & involved
+    candidates = sorted((tables or set()) & set(DOMAIN_TEMPLATES), key=lambda table: table == "AE")
+    return candidates[0] if candidates else None
+
+def load_template_registry(db: Session) -> TemplateRegistry:
+    """
+    Registry for the active modules in QueryModule/PredefinedQuery: each module
+    gets the template of the domain its queries read, limited to the question
+    types it offers. A new module over a known domain needs only the table rows.
+    """
+    modules = (
+        db.query(QueryModule)
+        .options(joinedload(QueryModule.categories).joinedload(QueryCategory.queries))
+        .filter(QueryModule.Status == True)
+        .all()
+    )
+    module_domains, question_types = {}, {}
+    for module in modules:
+        queries = [query for category in module.categories if category.Status for query in category.queries if query.Status]
+        domain = _module_domain(queries)
+        if domain is None:
+            logger.warning(f"[WARNING] No standard query template for module {module.Id} ({module.Name})")
+            continue
+        offered = {query.QueryType.strip().lower() for query in queries if query.QueryType}
+        unknown = offered - set(DOMAIN_TEMPLATES[domain].question_types)
+        if unknown:
+            logger.warning(f"[WARNING] Module {module.Id} ({module.Name}) has question types without a {domain} template: {', '.join(sorted(unknown))}")
+        module_domains[module.Id] = domain
+        question_types[module.Id] = offered or None
+    return TemplateRegistry.from_domains(module_domains, question_types)
+
+_registry = None
+
+def get_template_registry() -> TemplateRegistry:
+    global _registry
+    if _registry is None:
+        _registry = TemplateRegistry.from_domains(DEFAULT_MODULES)
+    return _registry
+
+def reload_template_registry(db: Session) -> TemplateRegistry:
+    """Compile the registry from the QueryModule tables; keeps the built-in mapping if they cannot be read"""
+    global _registry
+    try:
+        _registry = load_template_registry(db)
+    except Exception as e:
+        logger.warning(f"[WARNING] Could not load standard query templates, using built-in modules: {str(e)}")
+        _registry = TemplateRegistry.from_domains(DEFAULT_MODULES)
+    return _registry
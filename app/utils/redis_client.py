@@ -0,0 +1,19 @@
+from threading import Lock
+from redis import Redis, ConnectionPool
+from app.core.config import settings
+
+_pools = {}
+_lock = Lock()
+
+def get_redis_client(decode_responses: bool = True) -> Redis:
+    """
+    Return a Redis client backed by a process-wide connection pool.
+
+    Separate pools are kept for decoded (str) and raw (bytes) responses.
+    """
+    with _lock:
+        pool = _pools.get(decode_responses)
+        if pool is None:
+            pool = ConnectionPool.from_url(settings.REDIS_URL, decode_responses=decode_responses)
+            _pools[decode_responses] = pool
+    return Redis(connection_pool=pool)
@@ -0,0 +1,105 @@
+import json
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from threading import Lock
+from redis.exceptions import LockError
+from app.core.config import settings
+from app.utils.redis_client import get_redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key so only one of them does the work.
+
+    Within a worker, duplicates wait on the leader's Future. Across workers (when
+    REDIS_CONFIG is on), the leader holds a Redis lock and publishes its result
+    under a short-lived result key that followers in other workers poll for.
+    Results must be JSON serializable to cross workers.
+
+    If the leader fails, a follower in the same worker gets the same exception.
+    A follower in another worker runs the call itself. Followers that wait longer
+    than wait_seconds also run the call themselves, so a stuck leader can delay
+    duplicates but never block them indefinitely.
+    """
+
+    def __init__(self, namespace: str, lock_seconds: int, wait_seconds: int, result_ttl_seconds: int, poll_interval: float = 0.2):
+        self.namespace = namespace
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.poll_interval = poll_interval
+        self._inflight = {}
+        self._lock = Lock()
+
+    def do(self, key: str, fn):
+        """Run fn once per key among concurrent callers. Returns (result, shared)."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            try:
+                return future.result(timeout=self.wait_seconds), True
+            except FutureTimeoutError:
+                logger.warning(f"[WARNING] Timed out waiting for in-flight request {key}, running it directly")
+                return fn(), False
+
+        try:
+            result, shared = self._run_across_workers(key, fn)
+            future.set_result(result)
+            return result, shared
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _run_across_workers(self, key: str, fn):
+        if not settings.REDIS_CONFIG:
+            return fn(), False
+        try:
+            r = get_redis_client()
+            lock = r.lock(f"singleflight:{self.namespace}:lock:{key}", timeout=self.lock_seconds, blocking=False)
+            acquired = lock.acquire(token=uuid.uuid4().hex)
+        except Exception as e:
+            logger.warning(f"[WARNING] Single-flight lock unavailable, running {key} directly: {str(e)}")
+            return fn(), False
+
+        result_key = f"singleflight:{self.namespace}:result:{key}"
+        if acquired:
+            try:
+                r.delete(result_key)
+                result = fn()
+                try:
+                    r.set(result_key, json.dumps(result), ex=self.result_ttl_seconds)
+                except Exception as e:
+                    logger.warning(f"[WARNING] Could not publish single-flight result for {key}: {str(e)}")
+                return result, False
+            finally:
+                try:
+                    lock.release()
+                except LockError:
+                    pass
+
+        # Another worker is running the same request: wait for its result
+        deadline = time.monotonic() + self.wait_seconds
+        while time.monotonic() < deadline:
+            payload = r.get(result_key)
+            if payload is not None:
+                return json.loads(payload), True
+            if not r.exists(lock.name):
+                # Leader finished; its result may have landed just before the lock was released
+                payload = r.get(result_key)
+                if payload is not None:
+                    return json.loads(payload), True
+                break
+            time.sleep(self.poll_interval)
+        logger.warning(f"[WARNING] No shared result for {key}, running it directly")
+        return fn(), False
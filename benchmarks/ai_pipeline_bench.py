@@ -0,0 +1,180 @@
+"""
+Offline benchmark of the AI graph (build_agent + invoke) with no Azure services.
+
+Every question in benchmarks/questions.json is answered by the real graph
+against a synthetic SDTM study in SQLite, with the LLM replaced by a chat model
+that replays the recorded responses. Reported per question: per-node wall time,
+LLM calls, rows fetched and peak Python memory.
+
+    PYTHONPATH=. python benchmarks/ai_pipeline_bench.py --repeat 5 --output bench.json
+    PYTHONPATH=. python benchmarks/ai_pipeline_bench.py --baseline bench.json
+
+With --baseline the run fails (exit code 1) when a question makes more LLM
+calls, fetches a different number of rows, or gets slower than the baseline by
+more than --max-slowdown. Use --llm-latency-ms to emulate model latency.
+"""
+import os
+import sys
+import ast
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+# Offline defaults: no Redis, no Azure; SQLite has no TOP, so row limiting is left to the recorded SQL
+for name, value in {
+    "DATABASE_URL": "sqlite://", "DATABASE_URL_FILES": "sqlite://", "REDIS_URL": "redis://localhost:6379", "REDIS_CONFIG": "0",
+    "AZURE_STORAGE_CONNECTION_STRING": "UseDevelopmentStorage=true", "AZURE_STORAGE_CONTAINER_NAME": "bench",
+    "BASE_BLOB_PATH": "bench", "BASE_RAW_PATH": "bench", "AZURE_TENANT_ID": "bench", "AZURE_CLIENT_ID": "bench",
+    "AZURE_OPENAI_API_KEY": "bench", "AZURE_OPENAI_ENDPOINT": "http://localhost", "AZURE_OPENAI_DEPLOYMENT_NAME": "replay",
+    "OPENAI_API_VERSION": "2024-06-01", "LANGSMITH_TRACING": "false", "LANGSMITH_ENDPOINT": "http://localhost",
+    "LANGSMITH_API_KEY": "bench", "LANGSMITH_PROJECT": "bench", "LLMProvider": "Azure OpenAI", "SQL_MAX_ROWS": "0",
+}.items():
+    os.environ.setdefault(name, value)
+
+from langchain_community.utilities import SQLDatabase
+from app.ai.langgraph_workflow.graph_config import build_agent
+from app.ai.langgraph_workflow.graph_metrics import NodeTimer
+from app.ai.llm_gateway import collect_node_metrics
+from app.services.dataset_version import get_dataset_version
+from app.services.value_index import get_value_index
+from fake_chat_model import ReplayChatModel
+from sdtm_fixture import create_study, study_engine
+
+PROJECT, FOLDER = "bench", "sdtm"
+
+
+class BenchTimer(NodeTimer):
+    """Node timer that also counts the rows execute_query returned"""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = 0
+        self._execute_runs = set()
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        super().on_chain_start(serialized, inputs, run_id=run_id, parent_run_id=parent_run_id, tags=tags, metadata=metadata, **kwargs)
+        if kwargs.get("name") == "execute_query":
+            self._execute_runs.add(run_id)
+
+    def on_chain_end(self, outputs, *, run_id, parent_run_id=None, **kwargs):
+        super().on_chain_end(outputs, run_id=run_id, parent_run_id=parent_run_id, **kwargs)
+        # Read here: wrap_tooltips later truncates tool messages in place
+        if run_id in self._execute_runs:
+            for msg in outputs.get("messages", []):
+                try:
+                    result = ast.literal_eval(str(msg.content))
+                except (ValueError, SyntaxError):
+                    continue
+                self.rows = len(result) if isinstance(result, list) else 0
+
+
+def run_question(engine, item: dict, llm_latency_ms: float) -> dict:
+    llm = ReplayChatModel(responses=item["responses"], latency_ms=llm_latency_ms)
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    db = SQLDatabase(engine, schema=f"{PROJECT}_{FOLDER}", sample_rows_in_table_info=0)
+    agent = build_agent(PROJECT, FOLDER, "Azure OpenAI", "replay", item["type"], db=db, llm=llm)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    timer = BenchTimer()
+    with collect_node_metrics() as node_metrics:
+        agent.invoke({"messages": [{"role": "user", "content": item["question"]}]}, config={"callbacks": [timer]})
+    total_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        "build_ms": round(build_ms, 2),
+        "total_ms": round(total_ms, 2),
+        "nodes": timer.summary(),
+        "llm_calls": sum(entry["calls"] for entry in node_metrics.values()),
+        "prompt_tokens": sum(entry["prompt_tokens"] for entry in node_metrics.values()),
+        "rows": timer.rows,
+        "peak_kb": round(tracemalloc.get_traced_memory()[1] / 1024, 1),
+    }
+
+
+def summarize(runs: list) -> dict:
+    """Median over repeats; calls and rows must not vary between runs of a deterministic graph"""
+    nodes = {}
+    for run in runs:
+        for node, entry in run["nodes"].items():
+            nodes.setdefault(node, []).append(entry["ms"])
+    return {
+        "total_ms": round(statistics.median(run["total_ms"] for run in runs), 2),
+        "build_ms": round(statistics.median(run["build_ms"] for run in runs), 2),
+        "nodes_ms": {node: round(statistics.median(values), 2) for node, values in nodes.items()},
+        "llm_calls": runs[0]["llm_calls"],
+        "prompt_tokens": runs[0]["prompt_tokens"],
+        "rows": runs[0]["rows"],
+        "peak_kb": max(run["peak_kb"] for run in runs),
+    }
+
+
+def compare(results: dict, baseline: dict, max_slowdown: float) -> list:
+    problems = []
+    for question_id, current in results.items():
+        previous = baseline.get(question_id)
+        if previous is None:
+            continue
+        if current["llm_calls"] > previous["llm_calls"]:
+            problems.append(f"{question_id}: LLM calls {previous['llm_calls']} -> {current['llm_calls']}")
+        if current["rows"] != previous["rows"]:
+            problems.append(f"{question_id}: rows {previous['rows']} -> {current['rows']}")
+        if current["total_ms"] > previous["total_ms"] * (1 + max_slowdown):
+            problems.append(f"{question_id}: total {previous['total_ms']} ms -> {current['total_ms']} ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default=os.path.join(os.path.dirname(__file__), "questions.json"))
+    parser.add_argument("--subjects", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--max-slowdown", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with open(args.questions) as f:
+        questions = json.load(f)
+
+    with tempfile.TemporaryDirectory() as directory:
+        schema = f"{PROJECT}_{FOLDER}"
+        engine = study_engine(create_study(directory, schema, args.subjects), schema)
+        # Built up front, as after an ingest: otherwise generate_query starts a background
+        # build on the first run that races the timed runs on the SQLite engine
+        get_value_index(engine, schema, get_dataset_version(PROJECT, FOLDER))
+        tracemalloc.start()
+        results = {}
+        for item in questions:
+            runs = [run_question(engine, item, args.llm_latency_ms) for _ in range(args.repeat)]
+            results[item["id"]] = summarize(runs)
+        tracemalloc.stop()
+        engine.dispose()
+
+    print(f"{'question':<22} {'total ms':>9} {'build ms':>9} {'LLM':>4} {'rows':>5} {'peak KB':>8}  slowest nodes")
+    for question_id, result in results.items():
+        slowest = sorted(result["nodes_ms"].items(), key=lambda item: item[1], reverse=True)[:3]
+        nodes = ", ".join(f"{node} {ms}" for node, ms in slowest)
+        print(f"{question_id:<22} {result['total_ms']:>9} {result['build_ms']:>9} {result['llm_calls']:>4} {result['rows']:>5} {result['peak_kb']:>8}  {nodes}")
+    totals = [result["total_ms"] for result in results.values()]
+    print(f"\nmedian {statistics.median(totals):.2f} ms, max {max(totals):.2f} ms over {len(totals)} questions")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.max_slowdown)
+        for problem in problems:
+            print("REGRESSION", problem)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Deterministic chat model for offline runs of the AI graph.
+
+It replays a recorded list of responses in call order: each entry is either
+{"content": "..."} or {"tool_calls": [{"name": ..., "args": {...}}]}. When the
+recording runs out it answers with an empty message, which ends the graph.
+Token usage is estimated from text length so gateway metrics stay meaningful.
+"""
+import time
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class ReplayChatModel(BaseChatModel):
+    responses: List[dict]
+    latency_ms: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def bind_tools(self, tools, **kwargs):
+        # Recorded tool calls are returned as-is, so the bound tools only matter to the real model
+        return self
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        recorded = self.responses[self.calls] if self.calls < len(self.responses) else {"content": ""}
+        self.calls += 1
+
+        tool_calls = [
+            {"name": call["name"], "args": call["args"], "id": f"call_{self.calls}_{i}", "type": "tool_call"}
+            for i, call in enumerate(recorded.get("tool_calls", []))
+        ]
+        prompt_chars = sum(len(str(message.content)) for message in messages)
+        output_chars = len(recorded.get("content", "")) + sum(len(str(call["args"])) for call in tool_calls)
+        usage = {
+            "input_tokens": prompt_chars // 4,
+            "output_tokens": output_chars // 4,
+            "total_tokens": (prompt_chars + output_chars) // 4,
+        }
+        message = AIMessage(content=recorded.get("content", ""), tool_calls=tool_calls, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
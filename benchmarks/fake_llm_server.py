@@ -0,0 +1,113 @@
+"""
+Minimal OpenAI / Azure OpenAI compatible chat completions server for exercising
+the LLM gateway locally.
+
+It enforces its own requests-per-minute and tokens-per-minute limits and answers
+with 429 plus retry-after headers when they are exceeded, like Azure OpenAI does.
+
+    python benchmarks/fake_llm_server.py --port 8089 --rpm 60 --tpm 20000 --latency-ms 300
+
+Point the app at it with AZURE_OPENAI_ENDPOINT=http://localhost:8089 (any
+deployment name works), or drive it with benchmarks/llm_gateway_load.py.
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RateWindow:
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.lock = threading.Lock()
+        self.window = None
+        self.requests = 0
+        self.tokens = 0
+        self.stats = {"served": 0, "throttled": 0}
+
+    def admit(self, tokens: int):
+        """Return None when admitted, otherwise the seconds until the window resets"""
+        now = time.time()
+        window = int(now // 60)
+        with self.lock:
+            if window != self.window:
+                self.window, self.requests, self.tokens = window, 0, 0
+            if self.requests + 1 > self.rpm or self.tokens + tokens > self.tpm:
+                self.stats["throttled"] += 1
+                return 60 - now % 60
+            self.requests += 1
+            self.tokens += tokens
+            self.stats["served"] += 1
+            return None
+
+
+def make_handler(limits: RateWindow, latency_ms: int):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._send(200, limits.stats)
+
+        def do_POST(self):
+            if not self.path.split("?")[0].endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt_tokens = len(json.dumps(body.get("messages", []))) // 4 + 1
+            completion_tokens = 20
+            retry_after = limits.admit(prompt_tokens + completion_tokens)
+            if retry_after is not None:
+                self._send(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}}, {
+                    "retry-after": str(int(retry_after) + 1),
+                    "retry-after-ms": str(int(retry_after * 1000)),
+                })
+                return
+            time.sleep(latency_ms / 1000)
+            message = {"role": "assistant", "content": "SELECT COUNT(*) AS SubjectCount FROM DM"}
+            if body.get("tools"):
+                tool = body["tools"][0]["function"]["name"]
+                message = {"role": "assistant", "content": None, "tool_calls": [{
+                    "id": f"call_{int(time.time() * 1000)}",
+                    "type": "function",
+                    "function": {"name": tool, "arguments": json.dumps({"query": "SELECT COUNT(*) FROM DM", "table_names": "DM"})},
+                }]}
+            self._send(200, {
+                "id": f"chatcmpl-{int(time.time() * 1000)}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if body.get("tools") else "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rpm", type=int, default=60)
+    parser.add_argument("--tpm", type=int, default=20000)
+    parser.add_argument("--latency-ms", type=int, default=300)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(RateWindow(args.rpm, args.tpm), args.latency_ms))
+    print(f"Fake LLM server on http://127.0.0.1:{args.port} (rpm={args.rpm}, tpm={args.tpm})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Fire concurrent interactive and batch calls through the LLM gateway against
+benchmarks/fake_llm_server.py and report latency per lane and 429 handling.
+
+    python benchmarks/fake_llm_server.py --rpm 60 &
+    LLM_REQUESTS_PER_MINUTE=60 python benchmarks/llm_gateway_load.py --interactive 20 --batch 40
+
+Needs the usual app settings in the environment (.env); REDIS_CONFIG=1 shares
+the budget across several copies of this script, as it would across workers.
+"""
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from langchain.chat_models import init_chat_model
+from app.ai.llm_gateway import invoke_llm, llm_priority, get_gateway_stats, INTERACTIVE, BATCH
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8089/v1")
+    parser.add_argument("--deployment", default="fake-gpt")
+    parser.add_argument("--interactive", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    llm = init_chat_model(args.deployment, model_provider="openai", base_url=args.url, api_key="fake", temperature=0, max_retries=0)
+
+    def call(lane):
+        start = time.perf_counter()
+        with llm_priority(lane):
+            invoke_llm(llm, "How many subjects are in DM?", args.deployment)
+        return lane, time.perf_counter() - start
+
+    lanes = [BATCH] * args.batch + [INTERACTIVE] * args.interactive
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(call, lanes))
+
+    for lane, name in ((INTERACTIVE, "interactive"), (BATCH, "batch")):
+        latencies = sorted(elapsed for l, elapsed in results if l == lane)
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+            print(f"{name:12s} n={len(latencies):4d} p50={statistics.median(latencies):6.2f}s p95={p95:6.2f}s")
+    print(get_gateway_stats())
+
+
+if __name__ == "__main__":
+    main()
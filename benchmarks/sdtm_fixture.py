@@ -0,0 +1,104 @@
+"""
+Synthetic SDTM study in SQLite for offline benchmarks.
+
+The study tables live in an attached database named like a project schema
+(e.g. bench_sdtm), so generated SQL such as SELECT ... FROM bench_sdtm.ae runs
+unchanged. Data is generated from a fixed seed: the same subject count always
+produces the same rows.
+"""
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+from sqlalchemy import create_engine, event
+
+AE_TERMS = [
+    ("HEADACHE", "NERVOUS SYSTEM DISORDERS"), ("DIZZINESS", "NERVOUS SYSTEM DISORDERS"),
+    ("NAUSEA", "GASTROINTESTINAL DISORDERS"), ("DIARRHOEA", "GASTROINTESTINAL DISORDERS"),
+    ("FATIGUE", "GENERAL DISORDERS AND ADMINISTRATION SITE CONDITIONS"), ("PYREXIA", "GENERAL DISORDERS AND ADMINISTRATION SITE CONDITIONS"),
+    ("HYPERTENSION", "VASCULAR DISORDERS"), ("RASH", "SKIN AND SUBCUTANEOUS TISSUE DISORDERS"),
+    ("ALANINE AMINOTRANSFERASE INCREASED", "INVESTIGATIONS"), ("NEUTROPENIA", "BLOOD AND LYMPHATIC SYSTEM DISORDERS"),
+]
+LAB_TESTS = [("ALT", "Alanine Aminotransferase", "U/L", 7, 56), ("HGB", "Hemoglobin", "g/dL", 12, 17), ("GLUC", "Glucose", "mg/dL", 70, 110)]
+VITAL_TESTS = [("SYSBP", "Systolic Blood Pressure", "mmHg", 100, 150), ("DIABP", "Diastolic Blood Pressure", "mmHg", 60, 95), ("PULSE", "Pulse Rate", "beats/min", 55, 100)]
+CON_MEDS = [("PARACETAMOL", "ANALGESICS"), ("IBUPROFEN", "ANTIINFLAMMATORY"), ("OMEPRAZOLE", "ANTIULCER"), ("AMLODIPINE", "ANTIHYPERTENSIVES")]
+ARMS = ["PLACEBO", "DRUG A 10 MG", "DRUG A 20 MG"]
+VISITS = ["SCREENING", "WEEK 2", "WEEK 4", "WEEK 8"]
+
+TABLES = {
+    "dm": "STUDYID TEXT, USUBJID TEXT, SUBJID TEXT, SITEID TEXT, AGE INTEGER, SEX TEXT, RACE TEXT, ARM TEXT, ACTARM TEXT, RFSTDTC TEXT",
+    "ae": "STUDYID TEXT, USUBJID TEXT, AESEQ INTEGER, AETERM TEXT, AEDECOD TEXT, AEBODSYS TEXT, AESEV TEXT, AESER TEXT, AETOXGR TEXT, AEOUT TEXT, AESTDTC TEXT",
+    "lb": "STUDYID TEXT, USUBJID TEXT, LBSEQ INTEGER, LBTESTCD TEXT, LBTEST TEXT, LBORRES TEXT, LBORRESU TEXT, LBSTRESN REAL, VISIT TEXT, LBDTC TEXT",
+    "vs": "STUDYID TEXT, USUBJID TEXT, VSSEQ INTEGER, VSTESTCD TEXT, VSTEST TEXT, VSSTRESN REAL, VSSTRESU TEXT, VISIT TEXT, VSDTC TEXT",
+    "cm": "STUDYID TEXT, USUBJID TEXT, CMSEQ INTEGER, CMTRT TEXT, CMDECOD TEXT, CMCLAS TEXT, CMSTDTC TEXT",
+    "ds": "STUDYID TEXT, USUBJID TEXT, DSSEQ INTEGER, DSDECOD TEXT, DSCAT TEXT, DSSTDTC TEXT",
+}
+
+
+def _rows(subjects: int, seed: int):
+    rnd = random.Random(seed)
+    rows = {name: [] for name in TABLES}
+    study = "BENCH01"
+    for n in range(1, subjects + 1):
+        site = f"{rnd.randint(1, 5):02d}"
+        usubjid = f"{study}-{site}-{n:03d}"
+        start = date(2023, 1, 1) + timedelta(days=rnd.randint(0, 180))
+        arm = rnd.choice(ARMS)
+        rows["dm"].append((study, usubjid, f"{site}-{n:03d}", site, rnd.randint(18, 80), rnd.choice("MF"),
+                           rnd.choice(["WHITE", "ASIAN", "BLACK OR AFRICAN AMERICAN"]), arm, arm, start.isoformat()))
+
+        for seq in range(1, rnd.randint(0, 5) + 1):
+            term, soc = rnd.choice(AE_TERMS)
+            grade = rnd.choices("12345", weights=[40, 30, 20, 8, 2])[0]
+            rows["ae"].append((study, usubjid, seq, term.lower(), term, soc, ["MILD", "MODERATE", "SEVERE"][min(int(grade), 3) - 1],
+                               "Y" if grade in "45" else "N", grade, rnd.choice(["RECOVERED/RESOLVED", "NOT RECOVERED/NOT RESOLVED"]),
+                               (start + timedelta(days=rnd.randint(1, 60))).isoformat()))
+
+        for visit_number, visit in enumerate(VISITS):
+            day = (start + timedelta(days=visit_number * 14)).isoformat()
+            for test_number, (code, test, unit, low, high) in enumerate(LAB_TESTS):
+                value = round(rnd.uniform(low * 0.8, high * 1.3), 1)
+                rows["lb"].append((study, usubjid, visit_number * len(LAB_TESTS) + test_number + 1, code, test, str(value), unit, value, visit, day))
+            for test_number, (code, test, unit, low, high) in enumerate(VITAL_TESTS):
+                value = round(rnd.uniform(low, high), 0)
+                rows["vs"].append((study, usubjid, visit_number * len(VITAL_TESTS) + test_number + 1, code, test, value, unit, visit, day))
+
+        for seq in range(1, rnd.randint(0, 3) + 1):
+            drug, drug_class = rnd.choice(CON_MEDS)
+            rows["cm"].append((study, usubjid, seq, drug.title(), drug, drug_class, start.isoformat()))
+
+        outcome = rnd.choices(["COMPLETED", "ADVERSE EVENT", "WITHDRAWAL BY SUBJECT", "LOST TO FOLLOW-UP"], weights=[75, 10, 10, 5])[0]
+        rows["ds"].append((study, usubjid, 1, outcome, "DISPOSITION EVENT", (start + timedelta(days=60)).isoformat()))
+    return rows
+
+
+def create_study(directory: str, schema: str, subjects: int = 200, seed: int = 7) -> str:
+    """Write the study database for `schema` into directory and return its path"""
+    path = os.path.join(directory, f"{schema}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        for name, columns in TABLES.items():
+            # Ingested tables carry a ROWID column, which the generate_query prompt asks for
+            conn.execute(f"CREATE TABLE {name} (ROWID INTEGER PRIMARY KEY, {columns})")
+        for name, table_rows in _rows(subjects, seed).items():
+            if table_rows:
+                column_names = ", ".join(column.split()[0] for column in TABLES[name].split(", "))
+                placeholders = ", ".join("?" * len(table_rows[0]))
+                conn.executemany(f"INSERT INTO {name} ({column_names}) VALUES ({placeholders})", table_rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def study_engine(study_path: str, schema: str):
+    """SQLAlchemy engine with the study attached under the schema name on every connection"""
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_connection, _record):
+        dbapi_connection.execute(f"ATTACH DATABASE '{study_path}' AS {schema}")
+
+    return engine
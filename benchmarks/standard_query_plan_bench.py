@@ -0,0 +1,132 @@
+"""
+Plan reuse of the standard query modules.
+
+Every module and question type is called for a range of subjects and dates,
+and the statements they send are recorded. SQL Server compiles one plan per
+distinct statement text, so the number of distinct texts is the number of
+plans the server has to compile and cache: with bound parameters it stays
+flat however many subjects are asked about, with the values inlined (what
+the modules used to send) it grows with every subject and date.
+
+    PYTHONPATH=. python benchmarks/standard_query_plan_bench.py --subjects 200
+
+With --url and --schema the statements are also run against a SQL Server
+study, once inlined and once bound, and the plan cache is read from
+sys.dm_exec_cached_plans (needs VIEW SERVER STATE):
+
+    PYTHONPATH=. python benchmarks/standard_query_plan_bench.py --url "mssql+pyodbc://..." --schema P1_SDTM
+"""
+import os
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+for name, value in {
+    "DATABASE_URL": "sqlite://", "DATABASE_URL_FILES": "sqlite://", "REDIS_URL": "redis://localhost:6379", "REDIS_CONFIG": "0",
+    "AZURE_STORAGE_CONNECTION_STRING": "UseDevelopmentStorage=true", "AZURE_STORAGE_CONTAINER_NAME": "bench",
+    "BASE_BLOB_PATH": "bench", "BASE_RAW_PATH": "bench", "AZURE_TENANT_ID": "bench", "AZURE_CLIENT_ID": "bench",
+    "AZURE_OPENAI_API_KEY": "bench", "AZURE_OPENAI_ENDPOINT": "http://localhost", "AZURE_OPENAI_DEPLOYMENT_NAME": "replay",
+    "OPENAI_API_VERSION": "2024-06-01", "LANGSMITH_TRACING": "false", "LANGSMITH_ENDPOINT": "http://localhost",
+    "LANGSMITH_API_KEY": "bench", "LANGSMITH_PROJECT": "bench", "LLMProvider": "Azure OpenAI",
+}.items():
+    os.environ.setdefault(name, value)
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import mssql
+from app.standard_query.sql_runner import StatementRunner, render_sql
+from app.standard_query.templates import get_template_registry
+
+# Request values per ModuleType; every question type of the module is asked
+MODULE_DATA = {
+    1: {"LBTEST": "Hemoglobin,Platelets", "LBCAT": "HEMATOLOGY"},
+    2: {"CMCAT": "No categories"},
+    3: {"PRCAT": "No categories"},
+    5: {"VSTEST": "Systolic Blood Pressure,Pulse Rate"},
+}
+
+
+class RecordingDatabase:
+    """Records the statements the modules send; lookups of study dates get a fixed answer"""
+
+    dialect = mssql.dialect()
+
+    def __init__(self):
+        self.calls = []
+
+    def run_no_throw(self, command, fetch="all", include_columns=False, parameters=None):
+        self.calls.append((command, parameters or {}))
+        if fetch == "one":
+            return "[('2022-01-10', '2022-12-20')]"
+        return ""
+
+
+def record_calls(schema: str, subjects: int, seed: int = 7):
+    rnd = random.Random(seed)
+    db = RecordingDatabase()
+    registry = get_template_registry()
+    for number in range(1, subjects + 1):
+        usubject = f"BENCH-{number:04d}"
+        start = date(2022, 1, 1) + timedelta(days=rnd.randint(0, 300))
+        end = start + timedelta(days=rnd.randint(1, 30))
+        days = rnd.choice([-14, -7, 7, 14, 30])
+        for module_type, compiled in registry.modules.items():
+            for question_type in compiled.question_types:
+                query_data = {
+                    **MODULE_DATA.get(module_type, {}), "ModuleType": module_type, "QuestionType": question_type,
+                    "Usubject": usubject, "AESTDTC": start.isoformat(), "AEENDTC": end.isoformat(), "Days": days,
+                }
+                registry.run(db, schema, query_data)
+    return db.calls
+
+
+def run_live(engine, statements):
+    """Run the statements and return elapsed seconds; errors (missing tables) are counted, not raised"""
+    runner = StatementRunner(engine)
+    errors = 0
+    start = time.perf_counter()
+    for command, parameters in statements:
+        if runner.run_no_throw(command, parameters=parameters).startswith("Error"):
+            errors += 1
+    return time.perf_counter() - start, errors
+
+
+def cached_plans(engine, schema: str) -> dict:
+    query = text(
+        "SELECT COUNT(*) AS plans, SUM(cp.usecounts) AS uses FROM sys.dm_exec_cached_plans cp "
+        "CROSS APPLY sys.dm_exec_sql_text(cp.plan_handle) st WHERE st.text LIKE :pattern AND st.text NOT LIKE '%dm_exec_cached_plans%'"
+    )
+    with engine.connect() as conn:
+        row = conn.execute(query, {"pattern": f"%FROM {schema}.%"}).one()
+    return {"plans": row.plans, "uses": row.uses or 0}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subjects", type=int, default=200)
+    parser.add_argument("--schema", default="BENCH_SDTM")
+    parser.add_argument("--url", help="SQL Server URL for a live run against the plan cache")
+    args = parser.parse_args()
+
+    calls = record_calls(args.schema, args.subjects)
+    bound = {command for command, _ in calls}
+    inlined = {render_sql(command, parameters, RecordingDatabase.dialect) for command, parameters in calls}
+    print(f"{len(calls)} statements for {args.subjects} subjects")
+    print(f"distinct statement texts (plans to compile): bound {len(bound)}, inlined {len(inlined)}")
+    print(f"plan reuse: bound {1 - len(bound) / len(calls):.1%}, inlined {1 - len(inlined) / len(calls):.1%}")
+
+    if args.url:
+        # The server's plan cache is left alone; plans added by each phase are read as deltas
+        engine = create_engine(args.url)
+        before = cached_plans(engine, args.schema)
+        inlined_s, errors = run_live(engine, [(render_sql(command, parameters, engine.dialect), {}) for command, parameters in calls])
+        middle = cached_plans(engine, args.schema)
+        bound_s, _ = run_live(engine, calls)
+        after = cached_plans(engine, args.schema)
+        print(f"live inlined: {inlined_s:.2f} s, {middle['plans'] - before['plans']} plans added, {errors} errors")
+        print(f"live bound:   {bound_s:.2f} s, {after['plans'] - middle['plans']} plans added, {after['uses'] - middle['uses']} plan uses")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,37 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routers.projects import router as api_router
 from app.api.routers.projects import ws_router as ws_router  # Import WS router
 from app.api.routers.patient_profile import router as patient_router
 from app.api.routers.standard_query import router as standard_query_router
+from app.ai.llm_clients import close_llm_clients
+from app.db.session import SessionLocal
+from app.standard_query.templates import reload_template_registry
+from app.services.narrative_jobs import resume_interrupted_jobs
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile the standard query templates once, before the first request
+    db = SessionLocal()
+    try:
+        reload_template_registry(db)
+    finally:
+        db.close()
+    # Batch narrative jobs left behind by a stopped worker continue from their last finished subject
+    try:
+        resume_interrupted_jobs()
+    except Exception as e:
+        logger.warning(f"[WARNING] Narrative jobs not resumed: {str(e)}")
+    yield
+    # Release pooled LLM connections
+    await close_llm_clients()
 
 def create_app():
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
     
     # Setup CORS
     app.add_middleware(
@@ -0,0 +1,35 @@
+# app/tests/unit/test_date_columns.py
+from sqlalchemy import create_engine
+from app.standard_query.templates import DOMAIN_TEMPLATES
+from app.services.date_columns import (
+    add_date_column_sql, create_index_sql, persisted_date_columns, plan_covering_index, provision_date_columns,
+)
+
+
+class TestPlan:
+    def test_date_column_is_deterministic(self):
+        sql = add_date_column_sql("P1_SDTM", "LB", DOMAIN_TEMPLATES["LB"])
+        assert sql == "ALTER TABLE [P1_SDTM].[LB] ADD [LBDT] AS TRY_CONVERT(DATE, LEFT([LBDTC], 10), 23) PERSISTED"
+
+    def test_covering_index_keys_and_includes(self):
+        template = DOMAIN_TEMPLATES["LB"]
+        columns = {name: "NVARCHAR" for name in ("USUBJID", "LBTEST", "LBSTRESC", "LBSTRESU", "LBSTNRLO", "LBDTC", "LBCAT", "LBDT")}
+        columns["LBSTNRHI"] = "NTEXT"
+        keys, include = plan_covering_index(template, columns)
+        assert keys == ["USUBJID", "LBTEST", "LBDT"]
+        # Missing and LOB columns are left out
+        assert include == ["LBSTRESC", "LBSTRESU", "LBSTNRLO", "LBDTC", "LBCAT"]
+        sql = create_index_sql("P1_SDTM", "LB", template, keys, include)
+        assert sql.startswith("CREATE NONCLUSTERED INDEX [IX_LB_USUBJID_LBDT] ON [P1_SDTM].[LB] ([USUBJID], [LBTEST], [LBDT]) INCLUDE ([LBSTRESC]")
+
+    def test_domain_without_partition_key(self):
+        keys, include = plan_covering_index(DOMAIN_TEMPLATES["CM"], {"CMSTDTC": "NVARCHAR", "CMCAT": "NVARCHAR", "CMSTDT": "DATE"})
+        assert keys == ["USUBJID", "CMSTDT"]
+        assert include == ["CMSTDTC", "CMCAT"]
+
+
+class TestOtherDialects:
+    def test_sqlite_is_left_alone(self):
+        engine = create_engine("sqlite://")
+        assert provision_date_columns(engine, "main")["status"] == "unsupported"
+        assert persisted_date_columns(engine, "main", "1") == frozenset()
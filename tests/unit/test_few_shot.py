@@ -0,0 +1,97 @@
+# app/tests/unit/test_few_shot.py
+import json
+from app.models.user import ClinicalQuerySession, ClinicalQueryMessage
+from app.ai.langgraph_workflow import few_shot
+from app.ai.langgraph_workflow.few_shot import FewShotIndex, tokenize, _load_index, update_few_shot_index
+
+
+class TestTokenize:
+    def test_keeps_subject_ids_and_variables_whole(self):
+        assert tokenize("Show AEs for subject 02-002 by AE_TERM") == ["aes", "subject", "02-002", "ae_term"]
+
+
+class TestFewShotIndex:
+    def build(self):
+        index = FewShotIndex()
+        index.add(1, "How many subjects had serious adverse events?", "SELECT COUNT(DISTINCT USUBJID) FROM s.AE WHERE AESER = 'Y'")
+        index.add(2, "List lab tests for subject 02-002", "SELECT LBTEST FROM s.LB WHERE USUBJID = '02-002'")
+        index.add(3, "Which subjects discontinued the study?", "SELECT USUBJID FROM s.DS WHERE DSDECOD <> 'COMPLETED'")
+        return index
+
+    def test_ranks_most_similar_first(self):
+        results = self.build().search("number of subjects with serious adverse events", k=2)
+        assert results[0][0] == "How many subjects had serious adverse events?"
+        assert results[0][2] > results[-1][2]
+
+    def test_no_overlap_returns_nothing(self):
+        assert self.build().search("vital signs by visit", k=3, min_score=0.0) == []
+
+    def test_remove_and_readd(self):
+        index = self.build()
+        index.remove(2)
+        assert index.search("lab tests 02-002", k=3) == []
+        index.add(2, "List lab tests for subject 02-002", "SELECT LBTEST FROM s.LB")
+        assert index.search("lab tests 02-002", k=3)[0][1] == "SELECT LBTEST FROM s.LB"
+
+    def test_identical_queries_returned_once(self):
+        index = FewShotIndex()
+        index.add(1, "count serious adverse events", "SELECT COUNT(*) FROM s.AE WHERE AESER='Y'")
+        index.add(2, "serious adverse events count", "select count(*)   from s.AE where AESER='Y'")
+        assert len(index.search("serious adverse events", k=3)) == 1
+
+
+class TestLoadIndex:
+    def add_turn(self, db_session, session, group, question, query, feedback="Positive", flow="AI", folder="Data"):
+        # BigInteger keys do not autoincrement on SQLite
+        base = session.Id * 100 + group * 2
+        db_session.add(ClinicalQueryMessage(Id=base, SessionId=session.Id, Sender="user", Content=question, QnAGroupId=group))
+        message = ClinicalQueryMessage(
+            Id=base + 1, SessionId=session.Id, Sender="assistant", Content=json.dumps({"query": query, "summary": ""}),
+            Metadata={"FolderName": folder}, FeedbackType=feedback, FlowType=flow, QnAGroupId=group,
+        )
+        db_session.add(message)
+        db_session.flush()
+        return message
+
+    def test_only_positive_ai_answers_of_the_folder(self, db_session):
+        session = ClinicalQuerySession(ProjectNumber="P100", Title="t")
+        db_session.add(session)
+        db_session.flush()
+        self.add_turn(db_session, session, 1, "serious adverse events", "SELECT 1")
+        self.add_turn(db_session, session, 2, "serious adverse events by site", "SELECT 2", feedback="Negative")
+        self.add_turn(db_session, session, 3, "serious adverse events standard", "SELECT 3", flow="STANDARD")
+        self.add_turn(db_session, session, 4, "serious adverse events other", "SELECT 4", folder="Other")
+
+        index = _load_index(db_session, "P100", "Data")
+        assert [query for _, query, _ in index.search("serious adverse events", k=5)] == ["SELECT 1"]
+
+    def test_feedback_updates_loaded_index(self, db_session, monkeypatch):
+        session = ClinicalQuerySession(ProjectNumber="P101", Title="t")
+        db_session.add(session)
+        db_session.flush()
+        message = self.add_turn(db_session, session, 1, "serious adverse events", "SELECT 1", feedback=None)
+        index = _load_index(db_session, "P101", "Data")
+        monkeypatch.setitem(few_shot._indexes, ("p101", "data"), index)
+
+        message.FeedbackType = "Positive"
+        update_few_shot_index(db_session, message)
+        assert index.search("serious adverse events", k=3)[0][1] == "SELECT 1"
+
+        message.FeedbackType = "Negative"
+        update_few_shot_index(db_session, message)
+        assert index.search("serious adverse events", k=3) == []
+
+    def test_group_with_several_questions(self, db_session, monkeypatch):
+        session = ClinicalQuerySession(ProjectNumber="P102", Title="t")
+        db_session.add(session)
+        db_session.flush()
+        message = self.add_turn(db_session, session, 1, "serious adverse events", "SELECT 1", feedback=None)
+        db_session.add(ClinicalQueryMessage(Id=message.Id + 50, SessionId=session.Id, Sender="user", Content="laboratory results", QnAGroupId=1))
+        db_session.flush()
+        index = _load_index(db_session, "P102", "Data")
+        monkeypatch.setitem(few_shot._indexes, ("p102", "data"), index)
+
+        message.FeedbackType = "Positive"
+        update_few_shot_index(db_session, message)
+        assert index.search("serious adverse events", k=3)[0][1] == "SELECT 1"
+        assert index.search("laboratory results", k=3) == []
@@ -0,0 +1,85 @@
+# app/tests/unit/test_graph_data.py
+import numpy as np
+import pandas as pd
+from app.standard_query.graph_data import (
+    SERIES_SOURCES, build_series, lttb_indices, minmax_indices, reference_flags, series_statement,
+)
+
+
+class TestDownsampling:
+    def test_lttb_keeps_end_points_and_budget(self):
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50)
+        keep = lttb_indices(x, y, 100)
+        assert len(keep) == 100
+        assert keep[0] == 0 and keep[-1] == 999
+        assert np.all(np.diff(keep) > 0)
+
+    def test_lttb_keeps_a_spike(self):
+        x = np.arange(500, dtype=float)
+        y = np.zeros(500)
+        y[250] = 40.0
+        assert 250 in lttb_indices(x, y, 20)
+
+    def test_short_series_is_returned_whole(self):
+        assert lttb_indices(np.arange(5.0), np.arange(5.0), 10).tolist() == [0, 1, 2, 3, 4]
+        assert minmax_indices(np.arange(5.0), 10).tolist() == [0, 1, 2, 3, 4]
+
+    def test_minmax_keeps_bucket_extremes(self):
+        y = np.array([1, 9, 2, 3, 0, 4, 5, 6], dtype=float)
+        assert minmax_indices(y, 4).tolist() == [0, 1, 4, 7]
+
+
+class TestReferenceFlags:
+    def test_flags_against_range(self):
+        values = np.array([1.0, 5.0, 12.0, np.nan, 3.0, 20.0])
+        low = np.array([2.0, 2.0, 2.0, 2.0, np.nan, np.nan])
+        high = np.array([10.0, 10.0, 10.0, 10.0, np.nan, 15.0])
+        assert reference_flags(values, low, high).tolist() == ["L", "N", "H", "", "", "H"]
+
+
+class TestSeries:
+    def test_statement_uses_bound_filters_and_persisted_date(self):
+        sql = series_statement("p1_sdtm", SERIES_SOURCES["LB"], tests=True, category=True, persisted=True)
+        assert "FROM p1_sdtm.LB WHERE USUBJID = :usubjid AND LBDT IS NOT NULL AND LBTEST IN :tests AND LBCAT = :category" in sql
+        assert "TRY_CAST(LBSTNRLO AS FLOAT) AS low" in sql
+
+    def test_vital_signs_have_no_range_or_category(self):
+        sql = series_statement("p1_sdtm", SERIES_SOURCES["VS"], tests=False, category=True)
+        assert "NULL AS low, NULL AS high" in sql
+        assert ":category" not in sql
+
+    def test_build_series_counts_flags_on_every_point(self):
+        days = pd.date_range("2024-01-01", periods=300, freq="D").strftime("%Y-%m-%d")
+        values = np.full(300, 12.0)
+        values[[10, 150]] = [5.0, 20.0]
+        frame = pd.DataFrame({
+            "test": ["Hemoglobin"] * 300 + ["Platelets"],
+            "unit": ["g/dL"] * 300 + ["10^9/L"],
+            "dtc": list(days) + ["2024-01-02"],
+            "value": list(values) + [None],
+            "low": [10.0] * 301,
+            "high": [16.0] * 301,
+        })
+        series = build_series(frame, max_points=50)
+        assert len(series) == 1
+        hemoglobin = series[0]
+        assert hemoglobin["points"] == 300 and hemoglobin["returned"] == 50
+        assert hemoglobin["abnormal"] == {"L": 1, "H": 1}
+        assert len(hemoglobin["x"]) == len(hemoglobin["y"]) == len(hemoglobin["flag"]) == 50
+        assert hemoglobin["x"][0] == "2024-01-01"
+        assert {"L", "H"} <= set(hemoglobin["flag"])
+
+    def test_mixed_precision_dates_are_all_plotted(self):
+        frame = pd.DataFrame({
+            "test": ["Glucose"] * 4,
+            "unit": ["mmol/L"] * 4,
+            "dtc": ["2024-01-01", "2024-01-02T08:30", "2024-01-03", "2024-01-04T09:15:00"],
+            "value": [5.0, 5.5, 6.0, 9.0],
+            "low": [3.9] * 4,
+            "high": [7.8] * 4,
+        })
+        (glucose,) = build_series(frame, max_points=10)
+        assert glucose["points"] == 4
+        assert glucose["abnormal"] == {"L": 0, "H": 1}
+        assert glucose["x"] == ["2024-01-01", "2024-01-02T08:30", "2024-01-03", "2024-01-04T09:15:00"]
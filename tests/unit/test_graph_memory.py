@@ -0,0 +1,47 @@
+# app/tests/unit/test_graph_memory.py
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
+from langgraph.graph.message import add_messages
+from app.ai.langgraph_workflow.graph_memory import compact_messages, MEMORY_SUMMARY_ID
+
+
+def build_turns(count, tool_size=100):
+    messages = []
+    for i in range(count):
+        messages += [
+            HumanMessage(f"question {i}"),
+            AIMessage("", tool_calls=[{"name": "sql_db_query", "args": {"query": f"SELECT {i}"}, "id": f"call{i}"}]),
+            ToolMessage("x" * tool_size, tool_call_id=f"call{i}"),
+            AIMessage(f"answer {i}"),
+        ]
+    return add_messages([], messages)
+
+
+class TestCompactMessages:
+    def test_no_change_within_window(self):
+        messages = build_turns(2)
+        assert compact_messages(messages, 3, 65536, 2000) is None
+
+    def test_old_turns_folded_into_summary(self):
+        messages = add_messages(build_turns(5), [HumanMessage("new question")])
+        compacted = add_messages(messages, compact_messages(messages, 3, 65536, 2000))
+
+        assert isinstance(compacted[0], SystemMessage)
+        assert compacted[0].id == MEMORY_SUMMARY_ID
+        assert "Q: question 0 | SQL: SELECT 0 | A: answer 0" in compacted[0].content
+        assert "question 2" in compacted[0].content
+        humans = [m.content for m in compacted if isinstance(m, HumanMessage)]
+        assert humans == ["question 3", "question 4", "new question"]
+
+    def test_byte_cap_keeps_latest_turn(self):
+        messages = add_messages(build_turns(2, tool_size=10000), [HumanMessage("new question")])
+        compacted = add_messages(messages, compact_messages(messages, 3, 1000, 2000))
+
+        assert compacted[-1].content == "new question"
+        assert all(len(m.content) <= 1000 for m in compacted if isinstance(m, ToolMessage))
+
+    def test_summary_budget_drops_oldest_lines(self):
+        messages = add_messages(build_turns(10), [HumanMessage("new question")])
+        compacted = add_messages(messages, compact_messages(messages, 1, 65536, 120))
+
+        assert len(compacted[0].content.splitlines()[1:]) <= 3
+        assert "question 9" in compacted[0].content
@@ -0,0 +1,42 @@
+# app/tests/unit/test_graph_metrics.py
+import time
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, MessagesState, StateGraph
+from app.ai.langgraph_workflow.graph_metrics import NodeTimer
+
+
+def build_graph():
+    def slow(state: MessagesState):
+        # Nested runnables inside a node must not be timed as nodes of their own
+        RunnableLambda(lambda x: x).invoke(1)
+        time.sleep(0.02)
+        return {"messages": []}
+
+    def fast(state: MessagesState):
+        return {"messages": []}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("slow", slow)
+    builder.add_node("fast", fast)
+    builder.add_edge(START, "slow")
+    builder.add_edge("slow", "fast")
+    builder.add_edge("fast", END)
+    return builder.compile()
+
+
+class TestNodeTimer:
+    def test_times_each_node(self):
+        timer = NodeTimer()
+        build_graph().invoke({"messages": [{"role": "user", "content": "hi"}]}, config={"callbacks": [timer]})
+        summary = timer.summary()
+        assert set(summary) == {"slow", "fast"}
+        assert summary["slow"]["runs"] == 1
+        assert summary["slow"]["ms"] >= 20
+        assert summary["fast"]["ms"] < summary["slow"]["ms"]
+
+    def test_runs_accumulate(self):
+        timer = NodeTimer()
+        graph = build_graph()
+        for _ in range(2):
+            graph.invoke({"messages": []}, config={"callbacks": [timer]})
+        assert timer.summary()["fast"]["runs"] == 2
@@ -0,0 +1,23 @@
+# app/tests/unit/test_llm_clients.py
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from app.ai.llm_clients import get_chat_model
+
+
+class TestChatModelRegistry:
+    def test_same_key_reuses_instance(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            models = list(pool.map(lambda _: get_chat_model("OpenAI", "gpt-4o-mini"), range(16)))
+        assert all(model is models[0] for model in models)
+
+    def test_models_share_http_clients(self):
+        small = get_chat_model("OpenAI", "gpt-4o-mini")
+        large = get_chat_model("OpenAI", "gpt-4o")
+        warm = get_chat_model("OpenAI", "gpt-4o", temperature=0.7)
+        assert large is not warm
+        assert small.http_client is large.http_client
+        assert small.http_async_client is large.http_async_client
+
+    def test_unsupported_type(self):
+        with pytest.raises(ValueError):
+            get_chat_model("Claude", "any")
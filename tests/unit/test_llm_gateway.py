@@ -0,0 +1,133 @@
+# app/tests/unit/test_llm_gateway.py
+import time
+import threading
+import httpx
+import openai
+import pytest
+from unittest.mock import MagicMock
+from app.ai import llm_gateway
+from app.ai.llm_gateway import DeploymentGate, invoke_llm, retry_after_seconds, INTERACTIVE, BATCH
+
+
+def rate_limit_error(headers):
+    request = httpx.Request("POST", "http://fake/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return openai.RateLimitError("Rate limit is exceeded.", response=response, body=None)
+
+
+def server_error():
+    request = httpx.Request("POST", "http://fake/chat/completions")
+    response = httpx.Response(503, headers={"retry-after-ms": "10"}, request=request)
+    return openai.InternalServerError("Service unavailable.", response=response, body=None)
+
+
+class FlakyLLM:
+    def __init__(self, failures, error=None):
+        self.failures = failures
+        self.error = error or (lambda: rate_limit_error({"retry-after-ms": "20"}))
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error()
+        return "ok"
+
+
+class TestRetryAfter:
+    def test_headers_take_precedence(self):
+        assert retry_after_seconds(rate_limit_error({"retry-after-ms": "1500"}), 0) == 1.5
+        assert retry_after_seconds(rate_limit_error({"retry-after": "3"}), 0) == 3
+        assert retry_after_seconds(rate_limit_error({"x-ratelimit-reset-tokens": "1m30s"}), 0) == 90
+
+    def test_exponential_backoff_without_headers(self):
+        assert 0 < retry_after_seconds(rate_limit_error({}), 2) <= 4
+
+
+class TestDeploymentGate:
+    def test_interactive_admitted_before_batch(self):
+        gate = DeploymentGate("prio", rpm=100, tpm=100000, max_concurrency=1, use_redis=False)
+        gate.acquire(INTERACTIVE, 10)
+        order = []
+
+        def waiter(priority, name):
+            gate.acquire(priority, 10)
+            order.append(name)
+            gate.release()
+
+        batch = threading.Thread(target=waiter, args=(BATCH, "batch"))
+        batch.start()
+        time.sleep(0.1)
+        interactive = threading.Thread(target=waiter, args=(INTERACTIVE, "interactive"))
+        interactive.start()
+        time.sleep(0.1)
+        gate.release()
+        batch.join(5)
+        interactive.join(5)
+        assert order == ["interactive", "batch"]
+
+    def test_batch_limited_to_budget_share(self, monkeypatch):
+        monkeypatch.setattr(llm_gateway.settings, "LLM_BATCH_BUDGET_SHARE", 0.5)
+        gate = DeploymentGate("share", rpm=4, tpm=100000, max_concurrency=10, use_redis=False)
+        assert gate._try_reserve(10, BATCH)
+        assert gate._try_reserve(10, BATCH)
+        assert not gate._try_reserve(10, BATCH)
+        assert gate._try_reserve(10, INTERACTIVE)
+
+    def test_shared_checks_run_without_the_lock(self, monkeypatch):
+        gate = DeploymentGate("unlocked", rpm=100, tpm=100000, max_concurrency=1, use_redis=False)
+        acquired = []
+
+        def shared_cooldown():
+            # Stands in for the Redis round trip: another thread must get the lock meanwhile
+            other = threading.Thread(target=lambda: acquired.append(gate._cond.acquire(timeout=1)) or gate._cond.release())
+            other.start()
+            other.join(2)
+            return 0.0
+
+        monkeypatch.setattr(gate, "_shared_cooldown", shared_cooldown)
+        gate.acquire(INTERACTIVE, 10)
+        assert acquired == [True]
+        assert gate._active == 1
+
+
+class TestInvokeLLM:
+    def test_retries_after_rate_limit(self):
+        llm = FlakyLLM(failures=2)
+        assert invoke_llm(llm, "question", "flaky-deployment") == "ok"
+        assert llm.calls == 3
+        assert llm_gateway.get_gate("flaky-deployment").stats["rate_limited"] == 2
+
+    def test_retries_transient_errors_without_cool_down(self):
+        llm = FlakyLLM(failures=1, error=server_error)
+        assert invoke_llm(llm, "question", "unavailable-deployment") == "ok"
+        assert llm.calls == 2
+        stats = llm_gateway.get_gate("unavailable-deployment").stats
+        assert (stats["retries"], stats["rate_limited"]) == (1, 0)
+
+    def test_gives_up_after_max_retries(self, monkeypatch):
+        monkeypatch.setattr(llm_gateway.settings, "LLM_MAX_RETRIES", 1)
+        with pytest.raises(openai.RateLimitError):
+            invoke_llm(FlakyLLM(failures=5), "question", "always-limited")
+
+
+class TestNodeMetrics:
+    def test_calls_do_not_wait_on_redis(self, monkeypatch):
+        redis = MagicMock()
+        redis.hgetall.return_value = {"generate_query|gpt-4o|calls": "2", "generate_query|gpt-4o|latency_ms": "300"}
+        monkeypatch.setattr(llm_gateway.settings, "REDIS_CONFIG", True)
+        monkeypatch.setattr(llm_gateway.settings, "LLM_NODE_METRICS_FLUSH_SECONDS", 3600)
+        monkeypatch.setattr(llm_gateway, "get_redis_client", lambda **kwargs: redis)
+        monkeypatch.setattr(llm_gateway, "_pending_node_metrics", {})
+        monkeypatch.setattr(llm_gateway, "_node_flush_state", {"at": time.monotonic(), "running": False})
+
+        llm_gateway._record_node_call("generate_query", "gpt-4o", 100, {"input_tokens": 50, "output_tokens": 5})
+        llm_gateway._record_node_call("generate_query", "gpt-4o", 200, {"input_tokens": 70, "output_tokens": 15})
+        redis.pipeline.assert_not_called()
+
+        metrics = llm_gateway.get_node_metrics()
+        pipe = redis.pipeline.return_value
+        pipe.hincrby.assert_any_call(llm_gateway.LLM_NODE_METRICS_KEY, "generate_query|gpt-4o|calls", 2)
+        pipe.hincrby.assert_any_call(llm_gateway.LLM_NODE_METRICS_KEY, "generate_query|gpt-4o|prompt_tokens", 120)
+        assert pipe.execute.call_count == 1
+        assert metrics["generate_query"]["gpt-4o"]["avg_latency_ms"] == 150.0
@@ -0,0 +1,46 @@
+# app/tests/unit/test_llm_routing.py
+from datetime import datetime
+from app.models.user import User, LLMProvider, LLMModel, LLMNodeModelConfig
+from app.services.llm_routing import resolve_node_models
+
+
+def add_user(db_session, email):
+    user = User(UserEmail=email, UserName="Test User", ObjectId=email, CreatedAt=datetime.now())
+    db_session.add(user)
+    db_session.flush()
+    return user
+
+
+class TestResolveNodeModels:
+    def setup_models(self, db_session):
+        provider = LLMProvider(Name="Azure OpenAI", IsActive=True)
+        db_session.add(provider)
+        db_session.flush()
+        large = LLMModel(ProviderId=provider.Id, ModelName="gpt-4o", IsActive=True)
+        small = LLMModel(ProviderId=provider.Id, ModelName="gpt-4o-mini", IsActive=True)
+        nano = LLMModel(ProviderId=provider.Id, ModelName="gpt-4.1-nano", IsActive=True)
+        db_session.add_all([large, small, nano])
+        db_session.flush()
+        return provider, small, nano
+
+    def test_defaults_to_selected_model(self, db_session):
+        user = add_user(db_session, "routing1@example.com")
+        routes = resolve_node_models(db_session, user.UserId, "Azure OpenAI", "gpt-4o")
+        assert routes["generate_query"] == ("Azure OpenAI", "gpt-4o")
+        assert routes["check_query"] == ("Azure OpenAI", "gpt-4o")
+
+    def test_user_override_wins_over_default(self, db_session):
+        provider, small, nano = self.setup_models(db_session)
+        user = add_user(db_session, "routing2@example.com")
+        now = datetime.now()
+        db_session.add_all([
+            LLMNodeModelConfig(UserId=None, NodeName="check_query", ProviderId=provider.Id, ModelId=small.Id, CreatedAt=now, UpdatedAt=now),
+            LLMNodeModelConfig(UserId=None, NodeName="call_get_schema", ProviderId=provider.Id, ModelId=small.Id, CreatedAt=now, UpdatedAt=now),
+            LLMNodeModelConfig(UserId=user.UserId, NodeName="check_query", ProviderId=provider.Id, ModelId=nano.Id, CreatedAt=now, UpdatedAt=now),
+        ])
+        db_session.flush()
+
+        routes = resolve_node_models(db_session, user.UserId, "Azure OpenAI", "gpt-4o")
+        assert routes["check_query"] == ("Azure OpenAI", "gpt-4.1-nano")
+        assert routes["call_get_schema"] == ("Azure OpenAI", "gpt-4o-mini")
+        assert routes["generate_query"] == ("Azure OpenAI", "gpt-4o")
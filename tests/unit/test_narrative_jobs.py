@@ -0,0 +1,149 @@
+# app/tests/unit/test_narrative_jobs.py
+import json
+import time
+import itertools
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.db.base import Base
+from app.models.user import ClinicalQueryMessage, NarrativeJob, NarrativeJobSubject
+from app.services import narrative_jobs
+from app.services.narrative_jobs import (
+    build_job_bundle, cancel_narrative_job, claim_job, create_narrative_job, job_status, run_narrative_job,
+)
+
+
+@pytest.fixture()
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # BigInteger keys do not autoincrement on SQLite
+    ids = itertools.count(1)
+
+    def assign_message_ids(session, flush_context, instances):
+        for obj in session.new:
+            if isinstance(obj, ClinicalQueryMessage) and obj.Id is None:
+                obj.Id = next(ids)
+
+    event.listen(factory, "before_flush", assign_message_ids)
+    return factory
+
+
+@pytest.fixture()
+def pipeline(monkeypatch):
+    calls = []
+
+    def fake_process(ProjectNumber, FolderName, Question, LlmType, ModelName, query_data, SessionId, node_models=None, fast_summary=False):
+        usubjid = query_data["Usubject"]
+        calls.append((usubjid, SessionId))
+        if usubjid == "01-bad":
+            table = {"summary": "Error: Invalid object name", "query": "", "readable_summary": "Standard Query"}
+            return json.dumps(table), json.dumps(table), {}
+        rows = str([{"Lab Test (LBTEST)": "Hemoglobin", "Result (LBSTRESC)": "12.1"}])
+        answer = {"summary": f"Narrative for {usubjid}", "query": "SELECT 1", "readable_summary": "Standard Query"}
+        return json.dumps(answer), json.dumps({**answer, "summary": rows}), {"Metrics": {"total_ms": 1}}
+
+    monkeypatch.setattr(narrative_jobs, "process_standard_query", fake_process)
+    return calls
+
+
+def new_job(db, subjects):
+    return create_narrative_job(
+        db, "P1", "sdtm", "Hemoglobin at screening", "Azure OpenAI", "gpt-4o",
+        {"ModuleType": 1, "QuestionType": "screening", "LBTEST": "Hemoglobin", "Usubject": "ignored"}, subjects, UserId=7,
+    )
+
+
+class TestNarrativeJobs:
+    def test_run_writes_messages_and_checkpoints(self, session_factory, pipeline):
+        db = session_factory()
+        job = new_job(db, ["01-001", "01-bad", "01-002", "01-001"])
+        assert job.SubjectCount == 3
+        assert "Usubject" not in job.StandardQueryData
+
+        run_narrative_job(job.Id, session_factory=session_factory)
+        db.expire_all()
+        status = job_status(db, job)
+        assert status["Status"] == "CompletedWithErrors"
+        assert (status["Completed"], status["Failed"], status["Pending"]) == (2, 1, 0)
+        assert sorted(usubjid for usubjid, _ in pipeline) == ["01-001", "01-002", "01-bad"]
+        # Every subject gets its own summary thread
+        assert len({thread for _, thread in pipeline}) == 3
+
+        messages = db.query(ClinicalQueryMessage).filter(ClinicalQueryMessage.SessionId == job.SessionId).all()
+        assert sorted((m.QnAGroupId, m.Sender) for m in messages) == [(1, "assistant"), (1, "user"), (3, "assistant"), (3, "user")]
+        failed = db.query(NarrativeJobSubject).filter(NarrativeJobSubject.USUBJID == "01-bad").one()
+        assert failed.Status == "Failed" and failed.ErrorNote.startswith("Error")
+
+        bundle = build_job_bundle(db, job)
+        narratives = pd.read_excel(bundle, sheet_name="Narratives")
+        assert list(narratives["USUBJID"]) == ["01-001", "01-bad", "01-002"]
+        assert narratives.loc[0, "Narrative"] == "Narrative for 01-001"
+        bundle.seek(0)
+        data = pd.read_excel(bundle, sheet_name="Data")
+        assert list(data["USUBJID"]) == ["01-001", "01-002"]
+        db.close()
+
+    def test_interrupted_job_resumes_without_duplicates(self, session_factory, pipeline):
+        db = session_factory()
+        job = new_job(db, ["01-001", "01-002", "01-003"])
+        run_narrative_job(job.Id, session_factory=session_factory)
+        # Simulate a worker that died while the last subject was running
+        db.query(NarrativeJobSubject).filter(NarrativeJobSubject.USUBJID == "01-003").update({"Status": "Running", "MessageId": None})
+        db.query(ClinicalQueryMessage).filter(ClinicalQueryMessage.QnAGroupId == 3).delete()
+        stale = datetime.now(timezone.utc) - timedelta(hours=1)
+        db.query(NarrativeJob).filter(NarrativeJob.Id == job.Id).update({"Status": "Running", "HeartbeatAt": stale, "FinishedAt": None})
+        db.commit()
+        pipeline.clear()
+
+        run_narrative_job(job.Id, session_factory=session_factory)
+        assert [usubjid for usubjid, _ in pipeline] == ["01-003"]
+        db.expire_all()
+        assert job_status(db, job)["Status"] == "Completed"
+        assert db.query(ClinicalQueryMessage).filter(ClinicalQueryMessage.SessionId == job.SessionId).count() == 6
+        db.close()
+
+    def test_heartbeat_refreshed_during_a_slow_subject(self, session_factory, pipeline, monkeypatch):
+        monkeypatch.setattr(narrative_jobs.settings, "NARRATIVE_JOB_HEARTBEAT_SECONDS", 0.05)
+        db = session_factory()
+        job = new_job(db, ["01-001"])
+        beats = []
+        process = narrative_jobs.process_standard_query
+
+        def slow_process(*args, **kwargs):
+            check = session_factory()
+            try:
+                for _ in range(3):
+                    time.sleep(0.1)
+                    beats.append(check.query(NarrativeJob.HeartbeatAt).filter(NarrativeJob.Id == job.Id).scalar())
+                    check.expire_all()
+            finally:
+                check.close()
+            return process(*args, **kwargs)
+
+        monkeypatch.setattr(narrative_jobs, "process_standard_query", slow_process)
+        run_narrative_job(job.Id, session_factory=session_factory)
+        assert len(set(beats)) == 3
+
+    def test_running_job_is_claimed_once(self, session_factory, pipeline):
+        db = session_factory()
+        job = new_job(db, ["01-001"])
+        assert claim_job(db, job.Id)
+        assert not claim_job(db, job.Id)
+        # Another worker finds it running and leaves it alone
+        run_narrative_job(job.Id, session_factory=session_factory)
+        assert pipeline == []
+        db.close()
+
+    def test_cancelled_job_skips_remaining_subjects(self, session_factory, pipeline):
+        db = session_factory()
+        job = new_job(db, ["01-001", "01-002"])
+        assert cancel_narrative_job(db, job.Id)
+        run_narrative_job(job.Id, session_factory=session_factory)
+        assert pipeline == []
+        db.expire_all()
+        assert job_status(db, job)["Status"] == "Cancelled"
+        db.close()
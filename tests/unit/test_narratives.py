@@ -0,0 +1,43 @@
+# app/tests/unit/test_narratives.py
+from app.standard_query.narratives import parse_query_result, render_narrative
+
+
+LAB_RESULT = (
+    "[{'Lab Test or Examination Name': 'Hemoglobin', 'Character Result/Finding in Std Format': '10.1', "
+    "'Standard Units': 'g/dL', 'Reference Range Lower Limit-Std Units': Decimal('12.00'), "
+    "'Reference Range Upper Limit-Std Units': Decimal('17.00'), 'Date/Time of Specimen Collection': '2023-03-04T08:30'}]"
+)
+
+
+class TestParseQueryResult:
+    def test_decimal_and_date_values(self):
+        rows = parse_query_result("[{'AESTDTC': datetime.date(2023, 1, 5), 'AESTDY': Decimal('12')}]")
+        assert rows == [{"AESTDTC": "2023-01-05", "AESTDY": "12"}]
+
+    def test_non_result_text(self):
+        assert parse_query_result("No data found") == []
+        assert parse_query_result("Error: timeout") == []
+
+
+class TestRenderNarrative:
+    def test_lab_flags_out_of_range(self):
+        query_data = {"ModuleType": 1, "QuestionType": "prior", "Usubject": "01-001", "AESTDTC": "2023-03-10"}
+        text = render_narrative(query_data, LAB_RESULT)
+        assert text.startswith("Subject 01-001 had 1 laboratory result on or before 2023-03-10.")
+        assert "Hemoglobin: 10.1 g/dL on 2023-03-04 (below the reference range)" in text
+
+    def test_adverse_events_within_days(self):
+        query_data = {"ModuleType": 4, "QuestionType": "within_days", "Usubject": "01-002", "AESTDTC": "2023-02-01", "Days": -7}
+        result = ("[{'Grade/Severity': '3', 'Start Date': '2023-01-28', 'Start Date Study Day': 20, 'End Date Study Day': None, 'Preferred Term': 'NAUSEA'}, "
+                  "{'Grade/Severity': '1', 'Start Date': '2023-01-30', 'Start Date Study Day': 22, 'End Date Study Day': 25, 'Preferred Term': 'HEADACHE'}]")
+        text = render_narrative(query_data, result)
+        assert "2 adverse events within 7 days before 2023-02-01" in text
+        assert "NAUSEA (grade 3), onset 2023-01-28 (study day 20)." in text
+
+    def test_every_module_has_a_template(self):
+        for module_type in range(1, 8):
+            text = render_narrative({"ModuleType": module_type, "QuestionType": "study", "Usubject": "S1"}, "[{'x': '1'}]")
+            assert text.startswith("Subject S1")
+
+    def test_no_rows(self):
+        assert render_narrative({"ModuleType": 2, "QuestionType": "during"}, "No data found") == "No data found for the specified criteria."
@@ -0,0 +1,94 @@
+# app/tests/unit/test_placeholder_values.py
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+from app.api.routers import standard_query
+from app.models.user import QueryModule, QueryCategory, LabAnalytes, PredefinedQuery, QueryPlaceholder
+from app.services import placeholder_values
+from app.services.query_catalog import clear_query_catalog
+from app.services.placeholder_values import PlaceholderSource, distinct_statement, resolve_placeholder_values
+
+
+@pytest.fixture()
+def files_engine(monkeypatch):
+    monkeypatch.setattr(placeholder_values, "get_dataset_version", lambda ProjectNumber, FolderName: "1")
+    clear_query_catalog()
+    # The batch runs its lookups on worker threads
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", lambda conn, _: conn.execute("ATTACH DATABASE ':memory:' AS p2_sdtm"))
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE p2_sdtm.lb (USUBJID TEXT, LBCAT TEXT, LBTEST TEXT, LBSPEC TEXT)")
+        conn.exec_driver_sql("CREATE TABLE p2_sdtm.cm (USUBJID TEXT, CMCAT TEXT)")
+        conn.exec_driver_sql(
+            "INSERT INTO p2_sdtm.lb VALUES ('01-001', 'HEMATOLOGY', 'Hemoglobin', 'BLOOD'), ('01-001', 'HEMATOLOGY', 'Platelets', 'BLOOD'), "
+            "('01-001', 'CHEMISTRY', 'Glucose', 'SERUM'), ('01-001', 'URINALYSIS', 'Glucose', 'URINE'), ('01-001', 'HEMATOLOGY', '', 'BLOOD')"
+        )
+        conn.exec_driver_sql("INSERT INTO p2_sdtm.cm VALUES ('01-001', NULL)")
+    return engine
+
+
+class TestPlaceholderValues:
+    def test_filters_and_empty_defaults(self, db_session, files_engine):
+        values = resolve_placeholder_values(db_session, files_engine, "p2", "sdtm", "01-001", {
+            "tests": PlaceholderSource("lb", "LBTEST", "LBCAT", ("HEMATOLOGY", "CHEMISTRY")),
+            "urine": PlaceholderSource("lb", "LBTEST", "LBCAT", ("URINALYSIS",), "LBSPEC", "URINE"),
+            "categories": PlaceholderSource("cm", "CMCAT"),
+        })
+        assert sorted(values["tests"]) == ["Glucose", "Hemoglobin", "Platelets"]
+        assert values["urine"] == ["Glucose"]
+        assert values["categories"] == ["No categories"]
+
+    def test_lab_analytes_restrict_values(self, db_session, files_engine):
+        db_session.add_all([
+            QueryModule(Id=951, Name="Lab Results", Status=True),
+            QueryCategory(Id=951, ModuleId=951, Name="Hematology", LBCAT="HEMATOLOGY", Status=True),
+            LabAnalytes(CategoryId=951, LabTest=["HEMOGLOBIN"]),
+        ])
+        db_session.flush()
+        values = resolve_placeholder_values(db_session, files_engine, "p2", "sdtm", "01-001", {
+            "tests": PlaceholderSource("lb", "LBTEST", "LBCAT", ("HEMATOLOGY",), analytes_category=951),
+        })
+        assert values["tests"] == ["Hemoglobin"]
+
+    def test_values_returned_as_fetched(self, db_session, files_engine):
+        with files_engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE p2_sdtm.ex (USUBJID TEXT, EXTRT TEXT, EXDOSE REAL)")
+            conn.exec_driver_sql("INSERT INTO p2_sdtm.ex VALUES ('01-001', 'Drug ''A'', 10mg', 2.5), ('01-001', 'None', 10)")
+        sources = {"treatments": PlaceholderSource("ex", "EXTRT"), "doses": PlaceholderSource("ex", "EXDOSE")}
+        first = resolve_placeholder_values(db_session, files_engine, "p2", "sdtm", "01-001", sources)
+        assert sorted(first["treatments"]) == ["Drug 'A', 10mg", "None"]
+        assert sorted(first["doses"]) == [2.5, 10.0]
+        # Served from the result cache unchanged
+        with files_engine.begin() as conn:
+            conn.exec_driver_sql("DELETE FROM p2_sdtm.ex")
+        assert resolve_placeholder_values(db_session, files_engine, "p2", "sdtm", "01-001", sources) == first
+
+    def test_names_are_validated_and_values_bound(self):
+        sql, params = distinct_statement("p2_sdtm", "01-001", PlaceholderSource("lb", "LBTEST", "LBCAT", ("A", "B")))
+        assert sql == "SELECT DISTINCT [LBTEST] AS value FROM [p2_sdtm].[lb] WHERE USUBJID = :usubjid AND [LBCAT] IN :category_filter"
+        assert params == {"usubjid": "01-001", "category_filter": ["A", "B"]}
+        with pytest.raises(ValueError, match="Invalid table or column name"):
+            distinct_statement("p2_sdtm", "01-001", PlaceholderSource("lb", "LBTEST; DROP TABLE lb"))
+
+    def test_batch_endpoint_skips_text_fields(self, client, auth_headers, db_session, files_engine, monkeypatch):
+        monkeypatch.setattr(standard_query, "engine_files", files_engine)
+        # Shaped like the seeded 'within +/- days' query: the day offset is typed in and stored with 'NULL' sources
+        db_session.add_all([
+            QueryModule(Id=952, Name="Lab Results", Status=True),
+            QueryCategory(Id=952, ModuleId=952, Name="Hematology", LBCAT="HEMATOLOGY", Status=True),
+            PredefinedQuery(Id=952, CategoryId=952, TemplateText="<hematology lab values> within <+/- dd> days"),
+            QueryPlaceholder(Id=9521, QueryId=952, PlaceholderText="<hematology lab values>", InputType="multi-select",
+                             SourceTable="LB", SourceColumn="LBTEST", CategoryFilter=952),
+            QueryPlaceholder(Id=9522, QueryId=952, PlaceholderText="<+/- dd>", InputType="text-field",
+                             SourceTable="NULL", SourceColumn="NULL"),
+            QueryPlaceholder(Id=9523, QueryId=952, PlaceholderText="<note>", InputType="single-select",
+                             SourceTable="null", SourceColumn="null"),
+        ])
+        db_session.flush()
+        response = client.get("/api/Projects/GetPlaceholderValuesBatch", headers=auth_headers, params={
+            "ProjectNumber": "p2", "DatasetType": "SDTM", "USUBJID": "01-001", "QueryId": 952,
+        })
+        assert response.status_code == 200
+        values = {p["id"]: p["values"] for p in response.json()["placeholders"]}
+        assert sorted(values[9521]) == ["Hemoglobin", "Platelets"]
+        assert values[9522] == [] and values[9523] == []
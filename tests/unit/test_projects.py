@@ -1170,6 +1170,31 @@ class TestDownloadExcelFromDB:
         assert len(call_args) == 1
         assert isinstance(call_args[0], TextClause)
         assert str(call_args[0]) == "SELECT 1 FROM [test001_sdtm].[dm] WHERE 1=0"
+
+    @patch('app.api.routers.projects.pd.read_sql')
+    def test_download_leaves_out_computed_columns(self, mock_read_sql):
+        mock_read_sql.return_value = pd.DataFrame({'LBDTC': ['2023-01-01'], 'LBTEST': ['Hemoglobin']})
+        mock_execute = MagicMock()
+        mock_execute.fetchall.return_value = [
+            MagicMock(ColumnName='LBDTC', Description='Date/Time', IsComputed=False),
+            MagicMock(ColumnName='LBTEST', Description=None, IsComputed=False),
+            MagicMock(ColumnName='LBDT', Description=None, IsComputed=True),
+        ]
+        self.mock_db.execute.return_value = mock_execute
+        self.mock_db.bind = MagicMock()
+        main_db = MagicMock(spec=Session)
+        main_db.query.return_value.filter.return_value.first.return_value = None
+        app.dependency_overrides[get_db] = lambda: main_db
+
+        response = client.get(
+            "/api/Projects/DownloadExcelFromDB",
+            params={"project_number": "TEST001", "foldername": "SDTM", "filename": "lb"},
+            headers={"Authorization": "Bearer test-token"}
+        )
+
+        assert response.status_code == 200
+        assert str(mock_read_sql.call_args[0][0]) == "SELECT [LBDTC], [LBTEST] FROM [test001_sdtm].[lb]"
+
     def test_download_nonexistent_table(self):
         # Arrange
         self.mock_db.execute.side_effect = Exception("Table not found")
@@ -1820,4 +1845,106 @@ class TestViewSasDatasets:
         )
 
         assert response.status_code == 500
-        assert "Unexpected error" in response.json()["detail"]
\ No newline at end of file
+        assert "Unexpected error" in response.json()["detail"]
+
+
+class TestRedisAdminEndpoints:
+    auth_user = {
+        "UserEmail": "test@example.com",
+        "UserName": "Test User",
+        "ObjectId": "test-object-id",
+        "UserType": "Admin"
+    }
+
+    @patch('app.api.routers.projects.get_redis_client')
+    @patch('app.core.security.verify_token')
+    def test_list_keys_uses_scan_page(self, mock_verify, mock_redis):
+        mock_verify.return_value = self.auth_user
+        mock_redis.return_value.scan.return_value = (42, ["checkpoint:1", "checkpoint:2"])
+
+        response = client.get(
+            "/api/Projects/redis/keys",
+            params={"pattern": "checkpoint:*", "page_size": 50},
+            headers={"Authorization": "Bearer test-token"}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"keys": ["checkpoint:1", "checkpoint:2"], "next_cursor": 42, "complete": False}
+        mock_redis.return_value.scan.assert_called_once_with(cursor=0, match="checkpoint:*", count=50)
+        mock_redis.return_value.keys.assert_not_called()
+
+    @patch('app.api.routers.projects.get_redis_client')
+    @patch('app.core.security.verify_token')
+    def test_checkpoint_values_fetched_with_mget(self, mock_verify, mock_redis):
+        mock_verify.return_value = self.auth_user
+        r = mock_redis.return_value
+        r.scan_iter.return_value = iter(["checkpoint_blob:7:a", "checkpoint_blob:7:b"])
+        r.json.return_value.mget.return_value = [{"v": 1}, {"v": 2}]
+
+        response = client.get(
+            "/api/Projects/redis/checkpoint/7",
+            headers={"Authorization": "Bearer test-token"}
+        )
+
+        assert response.status_code == 200
+        # Same {key: value} map as before pagination was added
+        assert response.json() == {"checkpoint_blob:7:a": {"v": 1}, "checkpoint_blob:7:b": {"v": 2}}
+        r.json.return_value.mget.assert_called_once()
+        r.json.return_value.get.assert_not_called()
+        r.keys.assert_not_called()
+
+    @patch('app.api.routers.projects.get_redis_client')
+    @patch('app.core.security.verify_token')
+    def test_checkpoint_page_with_cursor(self, mock_verify, mock_redis):
+        mock_verify.return_value = self.auth_user
+        r = mock_redis.return_value
+        r.scan.return_value = (0, ["checkpoint_blob:7:a", "checkpoint_blob:7:b"])
+        r.json.return_value.mget.return_value = [{"v": 1}, {"v": 2}]
+
+        response = client.get(
+            "/api/Projects/redis/checkpoint/7",
+            params={"cursor": 0},
+            headers={"Authorization": "Bearer test-token"}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["checkpoints"] == {"checkpoint_blob:7:a": {"v": 1}, "checkpoint_blob:7:b": {"v": 2}}
+        assert data["complete"] is True
+
+    @patch('app.api.routers.projects.get_redis_client')
+    @patch('app.core.security.verify_token')
+    def test_checkpoint_summary_returns_sizes(self, mock_verify, mock_redis):
+        mock_verify.return_value = self.auth_user
+        r = mock_redis.return_value
+        r.scan_iter.return_value = iter(["checkpoint_blob:7:a"])
+        r.pipeline.return_value.execute.return_value = [2048]
+
+        response = client.get(
+            "/api/Projects/redis/checkpoint/7",
+            params={"summary": True},
+            headers={"Authorization": "Bearer test-token"}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"checkpoint_blob:7:a": {"bytes": 2048}}
+        r.json.return_value.mget.assert_not_called()
+
+    @patch('app.api.routers.projects.get_redis_client')
+    @patch('app.core.security.verify_token')
+    def test_delete_all_unlinks_in_batches(self, mock_verify, mock_redis):
+        mock_verify.return_value = self.auth_user
+        r = mock_redis.return_value
+        r.scan_iter.return_value = iter(["k1", "k2", "k3"])
+        r.unlink.side_effect = lambda *keys: len(keys)
+
+        response = client.delete(
+            "/api/Projects/redis/delete-all",
+            params={"pattern": "checkpoint*", "batch_size": 2},
+            headers={"Authorization": "Bearer test-token"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["deleted"] == 3
+        assert r.unlink.call_args_list == [call("k1", "k2"), call("k3")]
+        r.flushdb.assert_not_called()
@@ -0,0 +1,71 @@
+# app/tests/unit/test_query_catalog.py
+import pytest
+from unittest.mock import MagicMock
+from app.models.user import QueryModule, QueryCategory, PredefinedQuery, QueryPlaceholder, LabAnalytes
+from app.services import query_catalog
+from app.services.query_catalog import clear_query_catalog, load_query_catalog, get_query_catalog
+
+
+@pytest.fixture()
+def seeded(db_session):
+    clear_query_catalog()
+    db_session.add_all([
+        QueryModule(Id=971, Name="Lab Results", Status=True),
+        QueryCategory(Id=971, ModuleId=971, Name="Hematology", LBCAT="HEMATOLOGY", Status=True),
+        QueryCategory(Id=972, ModuleId=971, Name="Retired", LBCAT="", Status=False),
+        PredefinedQuery(Id=971, CategoryId=971, TemplateText="Lab values for [Subject]", TablesInvolved="LB", QueryType="study", Status=True),
+        PredefinedQuery(Id=972, CategoryId=971, TemplateText="old", TablesInvolved="LB", QueryType="study", Status=False),
+        QueryPlaceholder(Id=971, QueryId=971, PlaceholderText="[Subject]", InputType="dropdown", SourceTable="DM", SourceColumn="USUBJID"),
+        QueryPlaceholder(Id=972, QueryId=971, PlaceholderText="[Test]", InputType="dropdown", SourceTable="LB", SourceColumn="LBTEST", CategoryFilter=971),
+        LabAnalytes(CategoryId=971, LabTest=["Hemoglobin", "Platelets"]),
+    ])
+    db_session.flush()
+    yield db_session
+    clear_query_catalog()
+
+
+class TestQueryCatalog:
+    def test_tree(self, seeded):
+        catalog = load_query_catalog(seeded)
+        module = next(module for module in catalog.modules if module["id"] == 971)
+        assert module["categories"] == [{"id": 971, "Name": "Hematology", "LBCAT": "HEMATOLOGY"}]
+        (query,) = catalog.queries[971]
+        assert query["queryId"] == 971
+        assert [p["categoryColumn"] for p in query["placeholders"]] == [None, "LBCAT"]
+        assert query["placeholders"][1]["categoryFilter"] == "HEMATOLOGY"
+        assert catalog.analytes[971] == {"hemoglobin", "platelets"}
+
+    def test_version_follows_content(self, seeded):
+        before = load_query_catalog(seeded).version
+        assert load_query_catalog(seeded).version == before
+        seeded.add(QueryPlaceholder(Id=973, QueryId=971, PlaceholderText="[Date]", InputType="date"))
+        seeded.flush()
+        assert load_query_catalog(seeded).version != before
+
+    def test_reload_in_another_worker(self, seeded, monkeypatch):
+        redis = MagicMock()
+        redis.get.return_value = "1"
+        monkeypatch.setattr(query_catalog.settings, "REDIS_CONFIG", True)
+        monkeypatch.setattr(query_catalog, "get_redis_client", lambda: redis)
+        before = get_query_catalog(seeded)
+        assert get_query_catalog(seeded) is before
+
+        # Another worker reloaded: the counter moved on, this worker's cached copy is not used
+        seeded.add(QueryPlaceholder(Id=974, QueryId=971, PlaceholderText="[Visit]", InputType="dropdown"))
+        seeded.flush()
+        redis.get.return_value = "2"
+        query_catalog._counter_cache.clear()
+        assert get_query_catalog(seeded).version != before.version
+
+        clear_query_catalog()
+        redis.incr.assert_called_once_with(query_catalog.QUERY_CATALOG_VERSION_KEY)
+
+    def test_etag_and_not_modified(self, client, seeded, auth_headers):
+        response = client.get("/api/Projects/GetPredefinedQueries", params={"CategoryId": 971}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()[0]["queryId"] == 971
+        etag = response.headers["ETag"]
+
+        response = client.get("/api/Projects/GetQueryModules", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
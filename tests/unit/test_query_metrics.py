@@ -0,0 +1,73 @@
+# app/tests/unit/test_query_metrics.py
+from datetime import datetime, timedelta, timezone
+from app.models.user import ClinicalQuerySession, ClinicalQueryMessage
+from app.services.query_metrics import build_run_metrics, percentile, aggregate_query_metrics
+
+
+NODE_METRICS = {
+    "generate_query": {"model": "gpt-4o", "calls": 2, "latency_ms": 900, "prompt_tokens": 3000, "completion_tokens": 200},
+    "wrap_tooltips": {"model": "gpt-4o-mini", "calls": 1, "latency_ms": 400, "prompt_tokens": 800, "completion_tokens": 150},
+}
+TIMINGS = {"generate_query": {"runs": 2, "ms": 950.0}, "execute_query": {"runs": 1, "ms": 120.0}, "wrap_tooltips": {"runs": 1, "ms": 410.0}}
+QUERIES = [{"ms": 110, "rows": 42, "cache": "miss"}]
+
+
+class TestBuildRunMetrics:
+    def test_combines_timings_tokens_and_sql(self):
+        metrics = build_run_metrics(1500.04, TIMINGS, NODE_METRICS, QUERIES)
+        assert metrics["TotalMs"] == 1500.0
+        assert metrics["LlmCalls"] == 3
+        assert metrics["PromptTokens"] == 3800
+        assert metrics["Sql"] == {"Queries": 1, "DbMs": 110, "Rows": 42, "CacheHits": 0}
+        assert metrics["Nodes"]["generate_query"]["ms"] == 950.0
+        assert metrics["Nodes"]["generate_query"]["completion_tokens"] == 200
+        assert "model" not in metrics["Nodes"]["execute_query"]
+
+    def test_cache_hits_do_not_count_as_db_time(self):
+        metrics = build_run_metrics(10, {}, {}, [{"ms": 1, "rows": 5, "cache": "hit"}])
+        assert metrics["Sql"] == {"Queries": 1, "DbMs": 0, "Rows": 5, "CacheHits": 1}
+
+    def test_rows_summed_over_queries(self):
+        metrics = build_run_metrics(10, {}, {}, [{"ms": 5, "rows": 3, "cache": "miss"}, {"ms": 1, "rows": 4, "cache": "hit"}])
+        assert metrics["Sql"]["Rows"] == 7
+
+
+class TestPercentile:
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile([7], 95) == 7
+        assert percentile([], 50) is None
+
+
+class TestAggregateQueryMetrics:
+    def add_answer(self, db_session, session, message_id, total_ms, coalesced=False, days_ago=0):
+        metadata = {"ModelName": "gpt-4o", "Metrics": build_run_metrics(total_ms, TIMINGS, NODE_METRICS, QUERIES)}
+        if coalesced:
+            metadata["Coalesced"] = True
+        db_session.add(ClinicalQueryMessage(
+            Id=message_id, SessionId=session.Id, Sender="assistant", Content="{}", Metadata=metadata, FlowType="AI",
+            CreatedAt=datetime.now(timezone.utc) - timedelta(days=days_ago),
+        ))
+
+    def test_distributions_per_project_and_node(self, db_session):
+        session = ClinicalQuerySession(ProjectNumber="PM1", Title="t")
+        db_session.add(session)
+        db_session.flush()
+        for i, total_ms in enumerate([1000, 2000, 3000, 4000]):
+            self.add_answer(db_session, session, 9000 + i, total_ms)
+        self.add_answer(db_session, session, 9010, 50, coalesced=True)
+        self.add_answer(db_session, session, 9011, 99999, days_ago=30)
+        db_session.flush()
+
+        result = aggregate_query_metrics(db_session, "PM1", days=7)
+        run = result["runs"][0]
+        assert (run["ProjectNumber"], run["ModelName"], run["FlowType"]) == ("PM1", "gpt-4o", "AI")
+        assert run["count"] == 5 and run["coalesced"] == 1
+        assert run["total_ms"] == {"p50": 2000, "p95": 4000}
+
+        nodes = {node["Node"]: node for node in result["nodes"]}
+        assert nodes["wrap_tooltips"]["ModelName"] == "gpt-4o-mini"
+        assert nodes["execute_query"]["ms"]["p50"] == 120.0
+        assert nodes["generate_query"]["prompt_tokens"]["p95"] == 3000
@@ -0,0 +1,96 @@
+# app/tests/unit/test_result_cache.py
+from unittest.mock import MagicMock
+from app.services import result_cache
+from app.services.result_cache import canonicalize_sql, CachedSQLDatabase, get_result_cache_metrics, collect_query_metrics, note_fetched_rows
+
+
+class FakeDatabase:
+    dialect = "mssql"
+
+    def __init__(self, result="[{'USUBJID': '01-001'}]", rows=1):
+        self.result = result
+        self.rows = rows
+        self.calls = 0
+
+    def run_no_throw(self, command, fetch="all", include_columns=False):
+        return self.run(command, fetch, include_columns)
+
+    def run(self, command, fetch="all", include_columns=False):
+        self.calls += 1
+        note_fetched_rows(self.rows)
+        return self.result
+
+
+class TestCanonicalizeSql:
+    def test_whitespace_and_semicolon(self):
+        assert canonicalize_sql("SELECT  *\n  FROM p1_sdtm.DM ;") == "SELECT * FROM p1_sdtm.DM"
+
+    def test_literals_preserved(self):
+        query = "SELECT AETERM as 'Reported  Term' FROM p1_sdtm.AE WHERE USUBJID = 'A  1'"
+        assert "'Reported  Term'" in canonicalize_sql(query)
+        assert "'A  1'" in canonicalize_sql(query)
+
+
+class TestCachedSQLDatabase:
+    def test_repeat_query_served_from_cache(self):
+        fake = FakeDatabase()
+        db = CachedSQLDatabase(fake, "rc1_sdtm", "1.0")
+        first = db.run_no_throw("SELECT * FROM rc1_sdtm.DM", fetch="all", include_columns=True)
+        second = db.run_no_throw("SELECT *   FROM rc1_sdtm.DM;", fetch="all", include_columns=True)
+
+        assert first == second
+        assert fake.calls == 1
+        assert db.dialect == "mssql"
+        assert get_result_cache_metrics()["hits"] >= 1
+
+    def test_new_dataset_version_misses(self):
+        fake = FakeDatabase()
+        CachedSQLDatabase(fake, "rc2_sdtm", "1.0").run_no_throw("SELECT 1")
+        CachedSQLDatabase(fake, "rc2_sdtm", "2.0").run_no_throw("SELECT 1")
+        assert fake.calls == 2
+
+    def test_errors_not_cached(self):
+        fake = FakeDatabase(result="Error: (pyodbc.ProgrammingError) invalid object")
+        db = CachedSQLDatabase(fake, "rc3_sdtm", "1.0")
+        db.run_no_throw("SELECT * FROM rc3_sdtm.XX")
+        db.run_no_throw("SELECT * FROM rc3_sdtm.XX")
+        assert fake.calls == 2
+
+
+class TestQueryMetrics:
+    def test_collects_rows_and_cache_outcome(self):
+        # The separator inside a value must not be counted as a row boundary
+        fake = FakeDatabase("[{'USUBJID': '01-001'}, {'USUBJID': '}, {'}]", rows=2)
+        db = CachedSQLDatabase(fake, "rc3_sdtm", "1.0")
+        with collect_query_metrics() as queries:
+            db.run_no_throw("SELECT USUBJID FROM rc3_sdtm.DM", fetch="all", include_columns=True)
+            db.run_no_throw("SELECT USUBJID FROM rc3_sdtm.DM", fetch="all", include_columns=True)
+        assert [(query["rows"], query["cache"]) for query in queries] == [(2, "miss"), (2, "hit")]
+
+    def test_nothing_collected_outside_block(self):
+        db = CachedSQLDatabase(FakeDatabase(), "rc4_sdtm", "1.0")
+        db.run_no_throw("SELECT 1")
+        with collect_query_metrics() as queries:
+            pass
+        assert queries == []
+
+
+class TestMetricsFlush:
+    def test_lookups_do_not_call_redis(self, monkeypatch):
+        redis = MagicMock()
+        redis.hgetall.return_value = {"hits": "1"}
+        monkeypatch.setattr(result_cache.settings, "REDIS_CONFIG", True)
+        monkeypatch.setattr(result_cache.settings, "RESULT_CACHE_METRICS_FLUSH_SECONDS", 3600)
+        monkeypatch.setattr(result_cache, "get_redis_client", lambda **kwargs: redis)
+        monkeypatch.setattr(result_cache, "_pending_metrics", {})
+        monkeypatch.setattr(result_cache, "_flush_state", {"at": result_cache.time.monotonic(), "running": False})
+
+        result_cache._record_metrics(hits=1)
+        result_cache._record_metrics(hits=2, misses=1)
+        redis.pipeline.assert_not_called()
+
+        result_cache.get_result_cache_metrics()
+        pipe = redis.pipeline.return_value
+        pipe.hincrby.assert_any_call(result_cache.RESULT_CACHE_METRICS_KEY, "hits", 3)
+        pipe.hincrby.assert_any_call(result_cache.RESULT_CACHE_METRICS_KEY, "misses", 1)
+        assert pipe.execute.call_count == 1
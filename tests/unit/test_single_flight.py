@@ -0,0 +1,53 @@
+# app/tests/unit/test_single_flight.py
+import time
+import threading
+import pytest
+from app.utils.single_flight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, count):
+    results = []
+    barrier = threading.Barrier(count)
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TestSingleFlight:
+    def test_concurrent_duplicates_share_one_call(self):
+        calls = []
+
+        def slow_query():
+            calls.append(1)
+            time.sleep(0.2)
+            return ["answer", {"SqlCache": "miss"}]
+
+        results = run_concurrently(SingleFlight("test", 5, 5, 5), "same", slow_query, 4)
+
+        assert len(calls) == 1
+        assert all(result == ["answer", {"SqlCache": "miss"}] for result, _ in results)
+        assert sum(1 for _, shared in results if shared) == 3
+
+    def test_leader_exception_propagates_to_followers(self):
+        def failing_query():
+            time.sleep(0.2)
+            raise ValueError("boom")
+
+        results = run_concurrently(SingleFlight("test", 5, 5, 5), "fail", failing_query, 3)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight("test", 5, 5, 5)
+        assert flight.do("seq", lambda: 1) == (1, False)
+        assert flight.do("seq", lambda: 2) == (2, False)
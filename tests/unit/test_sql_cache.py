@@ -0,0 +1,21 @@
+# app/tests/unit/test_sql_cache.py
+from app.ai.langgraph_workflow.sql_cache import normalize_question, get_cached_sql, put_cached_sql
+
+
+class TestQuestionNormalization:
+    def test_case_whitespace_and_trailing_punctuation(self):
+        assert normalize_question("  How many subjects had  Grade 3 AEs?? ") == "how many subjects had grade 3 aes"
+
+    def test_subject_ids_preserved(self):
+        assert normalize_question("Show labs for subject 02-002.") == "show labs for subject 02-002"
+
+
+class TestSqlCache:
+    def test_hit_after_put_with_equivalent_question(self):
+        put_cached_sql("p1_sdtm", "1.0", "How many subjects had grade 3 AEs?", "Azure OpenAI", "gpt-4o", "Table", "SELECT 1")
+        assert get_cached_sql("p1_sdtm", "1.0", "how many subjects had grade 3 AEs", "Azure OpenAI", "gpt-4o", "Table") == "SELECT 1"
+
+    def test_dataset_version_and_view_type_isolate_entries(self):
+        put_cached_sql("p2_sdtm", "1.0", "count subjects", "Azure OpenAI", "gpt-4o", "Table", "SELECT 2")
+        assert get_cached_sql("p2_sdtm", "2.0", "count subjects", "Azure OpenAI", "gpt-4o", "Table") is None
+        assert get_cached_sql("p2_sdtm", "1.0", "count subjects", "Azure OpenAI", "gpt-4o", "Summary") is None
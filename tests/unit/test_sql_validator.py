@@ -0,0 +1,57 @@
+# app/tests/unit/test_sql_validator.py
+from app.ai.langgraph_workflow.sql_validator import validate_sql, SchemaCatalog
+
+COLUMNS = {
+    "AE": ["ROWID", "USUBJID", "AEDECOD", "AESTDTC", "AEENDTC", "AETOXGR"],
+    "DM": ["ROWID", "USUBJID", "AGE", "SEX", "RFSTDTC"],
+}
+SCHEMA = "P1_SDTM"
+
+
+def catalog():
+    return SchemaCatalog(COLUMNS, lambda table: COLUMNS[table])
+
+
+class TestValidateSql:
+    def test_valid_query_gets_top_limit(self):
+        result = validate_sql("SELECT ROWID, USUBJID, AEDECOD FROM P1_SDTM.AE WHERE USUBJID LIKE '%02-002'", SCHEMA, catalog(), 1000)
+        assert result.ok
+        assert result.query.startswith("SELECT TOP 1000 ROWID")
+
+    def test_existing_limits_and_aggregates_untouched(self):
+        for query in [
+            "SELECT TOP 5 a.USUBJID, d.AGE FROM P1_SDTM.AE a JOIN P1_SDTM.DM d ON a.USUBJID = d.USUBJID",
+            "SELECT COUNT(DISTINCT USUBJID) AS SubjectCount FROM P1_SDTM.AE",
+            "SELECT AEDECOD FROM P1_SDTM.AE ORDER BY AEDECOD OFFSET 0 ROWS FETCH NEXT 10 ROWS ONLY",
+        ]:
+            result = validate_sql(query, SCHEMA, catalog(), 1000)
+            assert result.ok and result.query == query
+
+    def test_dml_rejected(self):
+        for query in ["DELETE FROM P1_SDTM.AE", "SELECT 1; DROP TABLE P1_SDTM.AE", "UPDATE P1_SDTM.DM SET AGE = 1"]:
+            assert not validate_sql(query, SCHEMA, catalog()).ok
+
+    def test_unknown_table_and_columns_reported(self):
+        result = validate_sql("SELECT a.AETERM FROM P1_SDTM.AE a JOIN P1_SDTM.XX x ON a.USUBJID = x.USUBJID", SCHEMA, catalog())
+        assert not result.ok
+        assert any("Unknown table 'XX'" in error for error in result.errors)
+        assert any("Unknown column 'AETERM' in table AE" in error for error in result.errors)
+        assert result.message().startswith("Query validation failed")
+
+    def test_other_schema_rejected(self):
+        result = validate_sql("SELECT USUBJID FROM P2_SDTM.DM", SCHEMA, catalog())
+        assert not result.ok
+        assert "outside the project schema" in result.errors[0]
+
+    def test_syntax_error(self):
+        result = validate_sql("SELECT FROM WHERE", SCHEMA, catalog())
+        assert not result.ok
+        assert result.errors[0].startswith("Syntax error")
+
+    def test_aliases_and_ctes_not_flagged(self):
+        for query in [
+            "SELECT USUBJID, TRY_CAST(LEFT(AESTDTC, 10) AS DATE) AS StartDate FROM P1_SDTM.AE ORDER BY StartDate",
+            "WITH x AS (SELECT USUBJID FROM P1_SDTM.AE) SELECT USUBJID FROM x",
+            "SELECT t.USUBJID FROM (SELECT USUBJID FROM P1_SDTM.AE) t",
+        ]:
+            assert validate_sql(query, SCHEMA, catalog()).ok
@@ -0,0 +1,84 @@
+# app/tests/unit/test_standard_query_cohort.py
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+from app.api.routers import standard_query
+from app.standard_query.cohort import cohort_statement, stream_cohort
+from app.standard_query.templates import DEFAULT_MODULES, TemplateRegistry
+
+
+def compiled(module_type):
+    return TemplateRegistry.from_domains(DEFAULT_MODULES).get(module_type)
+
+
+class TestCohortStatement:
+    def test_lab_values_at_serious_ae_onset(self):
+        sql, params = cohort_statement(
+            compiled(1), "p1_sdtm", {"QuestionType": "at_time", "LBTEST": "Hemoglobin", "LBCAT": "HEMATOLOGY"},
+            subjects=["01-001", "01-002"], serious_only=True,
+        )
+        assert sql.startswith("WITH anchors AS (SELECT x.*, ROW_NUMBER() OVER (ORDER BY x.USUBJID, x.ANCHOR_DATE, x.ANCHOR_TERM) AS ANCHOR_ID")
+        assert "FROM p1_sdtm.AE WHERE NULLIF(AESTDTC, '') IS NOT NULL AND USUBJID IN :subjects AND AESER = 'Y'" in sql
+        assert "JOIN p1_sdtm.LB t ON t.USUBJID = a.USUBJID WHERE LBTEST IN :lbtest AND LBCAT = :lbcat" in sql
+        assert "PARTITION BY a.ANCHOR_ID, LBTEST ORDER BY CASE WHEN TRY_CAST(LEFT(LBDTC, 10) AS DATE) = a.START_DATE" in sql
+        assert ":start" not in sql
+        assert params == {"lbtest": ["Hemoglobin"], "lbcat": "HEMATOLOGY", "subjects": ["01-001", "01-002"]}
+
+    def test_persisted_dates_and_within_days(self):
+        sql, params = cohort_statement(compiled(5), "p1_sdtm", {"QuestionType": "within_days", "VSTEST": "Pulse Rate", "Days": -7}, persisted=True)
+        assert "VSDT BETWEEN DATEADD(day, :days, a.START_DATE) AND a.START_DATE" in sql
+        assert "USUBJID IN :subjects" not in sql
+        assert params["days"] == -7
+
+    def test_template_anchor_keeps_undated_subjects(self):
+        sql, _ = cohort_statement(compiled(3), "p1_sdtm", {"QuestionType": "study"})
+        assert "FROM p1_sdtm.DM" in sql
+        assert "(a.START_DATE IS NULL OR a.END_DATE IS NULL OR TRY_CAST(LEFT(PRSTDTC, 10) AS DATE) BETWEEN a.START_DATE AND a.END_DATE)" in sql
+
+    def test_undated_question_types_group_by_subject(self):
+        sql, params = cohort_statement(compiled(7), "p1_sdtm", {"QuestionType": "summary"}, subjects=["01-001"])
+        assert sql.startswith("SELECT USUBJID as 'Subject', EXTRT as 'Treatment (EXTRT)'")
+        assert sql.endswith("FROM p1_sdtm.EX WHERE USUBJID IN :subjects GROUP BY USUBJID, EXTRT ORDER BY USUBJID, MIN(EXSTDTC)")
+        assert params == {"subjects": ["01-001"]}
+
+    def test_days_still_required(self):
+        with pytest.raises(ValueError, match="Days is required"):
+            cohort_statement(compiled(1), "p1_sdtm", {"QuestionType": "within_days"})
+
+
+class TestStream:
+    @pytest.fixture()
+    def engine(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE lb (USUBJID TEXT, LBTEST TEXT, LBSTRESN REAL)")
+            conn.exec_driver_sql("INSERT INTO lb VALUES ('01-001', 'Hemoglobin', 13.1), ('01-002', 'Hemoglobin', NULL), ('01-003', 'Hemoglobin', 12.0)")
+        return engine
+
+    def test_csv(self, engine):
+        body = "".join(stream_cohort(engine, "SELECT USUBJID, LBSTRESN FROM lb WHERE USUBJID IN :subjects ORDER BY USUBJID", {"subjects": ["01-001", "01-002"]}, chunk_rows=1))
+        assert body.splitlines() == ["USUBJID,LBSTRESN", "01-001,13.1", "01-002,"]
+
+    def test_csv_truncated(self, engine):
+        body = "".join(stream_cohort(engine, "SELECT USUBJID FROM lb ORDER BY USUBJID", {}, max_rows=2))
+        assert body.splitlines() == ["USUBJID", "01-001", "01-002", "# Truncated: only the first 2 rows are included"]
+
+    def test_json_truncated(self, engine):
+        body = json.loads("".join(stream_cohort(engine, "SELECT USUBJID FROM lb ORDER BY USUBJID", {}, fmt="json", max_rows=2)))
+        assert body == {"columns": ["USUBJID"], "rows": [["01-001"], ["01-002"]], "truncated": True}
+
+    def test_statement_errors_raised_before_streaming(self, engine):
+        with pytest.raises(OperationalError):
+            stream_cohort(engine, "SELECT USUBJID FROM missing", {})
+
+    def test_endpoint_fails_with_status(self, engine, client, auth_headers, monkeypatch):
+        monkeypatch.setattr(standard_query, "engine_files", engine)
+        monkeypatch.setattr(standard_query, "get_dataset_version", lambda ProjectNumber, FolderName: "1")
+        monkeypatch.setattr(standard_query, "persisted_date_columns", lambda engine, schema, version: set())
+        response = client.post("/api/Projects/StandardQueryCohort", headers=auth_headers, json={
+            "ProjectNumber": "p2", "FolderName": "sdtm", "STANDARD_QUERY_DATA": {"ModuleType": 7, "QuestionType": "summary"},
+        })
+        assert response.status_code == 500
+        assert response.json()["detail"].startswith("Cohort query failed")
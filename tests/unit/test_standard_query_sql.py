@@ -0,0 +1,81 @@
+# app/tests/unit/test_standard_query_sql.py
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import mssql
+from app.services.result_cache import CachedSQLDatabase, collect_query_metrics
+from app.standard_query.sql_runner import StatementRunner, RowCountingSQLDatabase, render_sql
+from app.standard_query.templates import get_template_registry
+
+
+class RecordingDatabase:
+    dialect = mssql.dialect()
+
+    def __init__(self, result=""):
+        self.result = result
+        self.calls = []
+
+    def run_no_throw(self, command, fetch="all", include_columns=False, parameters=None):
+        self.calls.append((command, parameters))
+        return self.result
+
+
+def lb_engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE LB (USUBJID TEXT, LBTEST TEXT, LBDTC TEXT)")
+        conn.exec_driver_sql("INSERT INTO LB VALUES ('S1', 'Hemoglobin', '2023-01-01'), ('S1', 'Platelets', '2023-01-02'), ('S2', 'Hemoglobin', '2023-01-03')")
+    return engine
+
+
+class TestStatementRunner:
+    def test_bound_values_and_expanding_list(self):
+        runner = StatementRunner(lb_engine())
+        result = runner.run_no_throw(
+            "SELECT LBTEST as 'Test', LBDTC FROM LB WHERE USUBJID = :usubjid AND LBTEST IN :tests ORDER BY LBDTC",
+            include_columns=True, parameters={"usubjid": "S1", "tests": ["Hemoglobin", "Platelets"]},
+        )
+        assert result == "[{'Test': 'Hemoglobin', 'LBDTC': '2023-01-01'}, {'Test': 'Platelets', 'LBDTC': '2023-01-02'}]"
+
+    def test_fetch_one_and_errors(self):
+        runner = StatementRunner(lb_engine())
+        assert runner.run_no_throw("SELECT LBDTC FROM LB WHERE USUBJID = :usubjid", fetch="one", parameters={"usubjid": "S2"}) == "[('2023-01-03',)]"
+        assert runner.run_no_throw("SELECT 1 FROM LB WHERE USUBJID = :usubjid", parameters={"usubjid": "S9"}) == ""
+        assert runner.run_no_throw("SELECT * FROM MISSING").startswith("Error:")
+
+    def test_cache_keyed_on_parameters(self):
+        db = CachedSQLDatabase(StatementRunner(lb_engine()), "sq1_sdtm", "1.0")
+        query = "SELECT LBTEST FROM LB WHERE USUBJID = :usubjid"
+        assert db.run_no_throw(query, parameters={"usubjid": "S1"}) == "[('Hemoglobin',), ('Platelets',)]"
+        assert db.run_no_throw(query, parameters={"usubjid": "S2"}) == "[('Hemoglobin',)]"
+
+    def test_fetched_rows_reported_to_query_metrics(self):
+        engine = lb_engine()
+        query = "SELECT LBTEST FROM LB WHERE USUBJID = 'S1'"
+        with collect_query_metrics() as queries:
+            CachedSQLDatabase(StatementRunner(engine), "sq2_sdtm", "1.0").run_no_throw(query)
+            CachedSQLDatabase(StatementRunner(engine), "sq2_sdtm", "1.0").run_no_throw(query)
+            CachedSQLDatabase(RowCountingSQLDatabase(engine), "sq3_sdtm", "1.0").run_no_throw("SELECT * FROM LB")
+        assert [(query["rows"], query["cache"]) for query in queries] == [(2, "miss"), (2, "hit"), (3, "miss")]
+
+
+class TestModuleStatements:
+    def test_same_statement_for_every_subject_and_date(self):
+        db = RecordingDatabase()
+        for usubject, aestdtc in [("01-001", "2023-01-05"), ("01-002", "2023-06-30")]:
+            query_data = {"ModuleType": 1, "QuestionType": "prior", "Usubject": usubject, "AESTDTC": aestdtc, "LBTEST": "Hemoglobin, Platelets", "LBCAT": "HEMATOLOGY"}
+            get_template_registry().run(db, "p1_sdtm", query_data)
+        (first, first_params), (second, second_params) = db.calls
+        assert first == second
+        assert "01-001" not in first and "2023-01-05" not in first
+        assert first_params == {"usubjid": "01-001", "lbtest": ["Hemoglobin", "Platelets"], "lbcat": "HEMATOLOGY", "start": "2023-01-05"}
+
+    def test_display_query_has_values_inlined(self):
+        db = RecordingDatabase()
+        query_data = {"ModuleType": 3, "QuestionType": "within_days", "Usubject": "01-001", "AESTDTC": "2023-01-05", "Days": -7, "PRCAT": "SURGERY"}
+        result = get_template_registry().run(db, "p1_sdtm", query_data)
+        assert result["query_result"] == "No data found"
+        assert "USUBJID = '01-001' AND PRCAT IN ('SURGERY')" in result["query"]
+        assert "BETWEEN DATEADD(day, -7, '2023-01-05') AND '2023-01-05'" in result["query"]
+
+    def test_render_escapes_quotes(self):
+        rendered = render_sql("SELECT 1 WHERE USUBJID = :usubjid", {"usubjid": "O'NEIL"}, mssql.dialect())
+        assert rendered == "SELECT 1 WHERE USUBJID = 'O''NEIL'"
@@ -0,0 +1,105 @@
+# app/tests/unit/test_standard_query_templates.py
+import pytest
+from sqlalchemy.dialects import mssql
+from app.models.user import QueryModule, QueryCategory, PredefinedQuery
+from app.standard_query.templates import DEFAULT_MODULES, TemplateRegistry, load_template_registry
+
+
+class LookupDatabase:
+    dialect = mssql.dialect()
+
+    def __init__(self, lookup="[('2022-01-10', '2022-12-20')]"):
+        self.lookup = lookup
+        self.calls = []
+
+    def run_no_throw(self, command, fetch="all", include_columns=False, parameters=None):
+        self.calls.append((command, parameters))
+        return self.lookup if fetch == "one" else ""
+
+
+def registry():
+    return TemplateRegistry.from_domains(DEFAULT_MODULES)
+
+
+class TestCompiledStatements:
+    def test_statements_compiled_up_front(self):
+        lab = registry().get(1)
+        assert ("prior", None, frozenset()) in lab.statements
+        assert {("within_days", "after", frozenset()), ("within_days", "before", frozenset())} <= set(lab.statements)
+        # Optional CMCAT/CMINDC filters: one statement per combination
+        assert len([key for key in registry().get(2).statements if key[0] == "during"]) == 4
+
+    def test_ranked_query(self):
+        sql, params = registry().get(4).statement("p1_sdtm", {"QuestionType": "at_time", "Usubject": "01-001", "AESTDTC": "2023-01-05T10:00"})
+        assert "ROW_NUMBER() OVER (PARTITION BY AEDECOD ORDER BY CASE WHEN TRY_CAST(LEFT(AESTDTC, 10) AS DATE) = :start" in sql
+        assert "FROM p1_sdtm.AE WHERE USUBJID = :usubjid" in sql
+        assert params == {"usubjid": "01-001", "start": "2023-01-05"}
+
+    def test_missing_input_and_unsupported_type(self):
+        with pytest.raises(ValueError, match="AESTDTC and AEENDTC are required"):
+            registry().get(1).statement("p1_sdtm", {"QuestionType": "during", "Usubject": "01-001"})
+        with pytest.raises(ValueError, match="not supported"):
+            registry().get(6).statement("p1_sdtm", {"QuestionType": "during", "Usubject": "01-001"})
+        with pytest.raises(ValueError, match="Unsupported ModuleType"):
+            registry().get(99)
+
+
+class TestAnchors:
+    def test_study_period_minus_30_days(self):
+        db = LookupDatabase()
+        registry().run(db, "p1_sdtm", {"ModuleType": 2, "QuestionType": "prior_during", "Usubject": "01-001"})
+        lookup, final = db.calls
+        assert lookup[0] == "SELECT RFSTDTC, RFENDTC FROM p1_sdtm.DM WHERE USUBJID = :usubjid"
+        assert final[1] == {"usubjid": "01-001", "start": "2021-12-11", "end": "2022-12-20"}
+
+    def test_missing_study_dates_drop_the_window(self):
+        db = LookupDatabase("[(None, None)]")
+        result = registry().run(db, "p1_sdtm", {"ModuleType": 3, "QuestionType": "study", "Usubject": "01-001"})
+        assert result["query"].endswith("FROM p1_sdtm.PR WHERE USUBJID = '01-001' ORDER BY PRSTDTC")
+
+    def test_first_dose(self):
+        db = LookupDatabase("[('2022-03-01T09:00',)]")
+        result = registry().run(db, "p1_sdtm", {"ModuleType": 3, "QuestionType": "prior_first", "Usubject": "01-001"})
+        assert "TRY_CAST(LEFT(PRSTDTC, 10) AS DATE) < '2022-03-01'" in result["query"]
+
+
+class TestLoadFromTables:
+    def test_modules_and_question_types_from_tables(self, db_session):
+        db_session.add_all([
+            QueryModule(Id=901, Name="Lab Results", Status=True),
+            QueryModule(Id=902, Name="ECG", Status=True),
+            QueryCategory(Id=901, ModuleId=901, Name="Hematology", LBCAT="Hematology", Status=True),
+            QueryCategory(Id=902, ModuleId=902, Name="ECG", LBCAT="", Status=True),
+            PredefinedQuery(CategoryId=901, TemplateText="t", TablesInvolved="AE,LB", QueryType="prior", Status=True),
+            PredefinedQuery(CategoryId=901, TemplateText="t", TablesInvolved="LB", QueryType="study", Status=True),
+            PredefinedQuery(CategoryId=902, TemplateText="t", TablesInvolved="EG", QueryType="study", Status=True),
+        ])
+        db_session.flush()
+        loaded = load_template_registry(db_session)
+        assert loaded.get(901).template.domain == "LB"
+        assert set(loaded.get(901).question_types) == {"prior", "study"}
+        assert 902 not in loaded.modules
+
+
+class TestPersistedDates:
+    def test_persisted_statement_uses_date_key(self):
+        sql, params = registry().get(1).statement(
+            "p1_sdtm", {"QuestionType": "during", "Usubject": "01-001", "AESTDTC": "2023-01-01", "AEENDTC": "2023-02-01"}, persisted=True
+        )
+        assert "LBDT BETWEEN :start AND :end" in sql
+        assert "TRY_CAST" not in sql
+        assert params["start"] == "2023-01-01"
+
+    def test_persisted_only_for_listed_domains(self):
+        db = LookupDatabase()
+        query_data = {"QuestionType": "at_time", "Usubject": "01-001", "AESTDTC": "2023-01-05"}
+        registry().run(db, "p1_sdtm", {**query_data, "ModuleType": 4}, frozenset({"LB"}))
+        registry().run(db, "p1_sdtm", {**query_data, "ModuleType": 1}, frozenset({"LB"}))
+        assert "TRY_CAST(LEFT(AESTDTC, 10) AS DATE) = :start" in db.calls[0][0]
+        assert "CASE WHEN LBDT = :start" in db.calls[1][0]
+
+    def test_domains_without_date_key_keep_expression(self):
+        exposure = registry().get(7)
+        assert exposure.persisted_statements == {}
+        sql, _ = exposure.statement("p1_sdtm", {"QuestionType": "summary", "Usubject": "01-001"}, persisted=True)
+        assert sql == exposure.statements[("summary", None, frozenset())].replace("{schema}", "p1_sdtm")
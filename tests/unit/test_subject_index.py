@@ -0,0 +1,93 @@
+# app/tests/unit/test_subject_index.py
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import StaticPool
+from app.models.user import SubjectIndex
+from app.services import subject_index
+from app.services.subject_index import get_subject_index, subjects_in_all, find_subject
+
+
+@pytest.fixture()
+def files_engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    event.listen(engine, "connect", lambda conn, _: conn.execute("ATTACH DATABASE ':memory:' AS p1_sdtm"))
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE p1_sdtm.dm (USUBJID TEXT, ARM TEXT)")
+        conn.exec_driver_sql("CREATE TABLE p1_sdtm.ae (USUBJID TEXT, AEDECOD TEXT)")
+        conn.exec_driver_sql("CREATE TABLE p1_sdtm.ts (TSPARMCD TEXT)")
+        conn.exec_driver_sql("INSERT INTO p1_sdtm.dm VALUES ('01-001', 'A'), ('01-002', 'B'), ('01-003', 'A')")
+        conn.exec_driver_sql("INSERT INTO p1_sdtm.ae VALUES ('01-001', 'Headache'), ('01-001', 'Nausea'), ('01-003', NULL)")
+    return engine
+
+
+@pytest.fixture()
+def version(monkeypatch):
+    current = {"value": "1"}
+    monkeypatch.setattr(subject_index, "get_dataset_version", lambda ProjectNumber, FolderName: current["value"])
+    subject_index._local_indexes.clear()
+    return current
+
+
+class TestSubjectIndex:
+    def test_built_once_and_stored(self, db_session, files_engine, version):
+        index = get_subject_index(db_session, files_engine, "p1", "sdtm")
+        assert index == {"01-001": {"AE", "DM"}, "01-002": {"DM"}, "01-003": {"AE", "DM"}}
+        rows = db_session.query(SubjectIndex).filter(SubjectIndex.SchemaName == "p1_sdtm").all()
+        assert {row.USUBJID: row.Domains for row in rows}["01-001"] == "AE,DM"
+
+        # Another worker reads the stored rows instead of the domain tables
+        subject_index._local_indexes.clear()
+        with files_engine.begin() as conn:
+            conn.exec_driver_sql("DELETE FROM p1_sdtm.ae")
+        assert get_subject_index(db_session, files_engine, "p1", "sdtm")["01-001"] == {"AE", "DM"}
+
+    def test_rebuilt_for_new_dataset_version(self, db_session, files_engine, version):
+        get_subject_index(db_session, files_engine, "p1", "sdtm")
+        with files_engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO p1_sdtm.ae VALUES ('01-002', 'Fatigue')")
+        version["value"] = "2"
+        assert get_subject_index(db_session, files_engine, "p1", "sdtm")["01-002"] == {"AE", "DM"}
+
+    def test_schema_without_subjects_not_rescanned(self, db_session, files_engine, version):
+        with files_engine.begin() as conn:
+            conn.exec_driver_sql("DELETE FROM p1_sdtm.dm")
+            conn.exec_driver_sql("DELETE FROM p1_sdtm.ae")
+        assert get_subject_index(db_session, files_engine, "p1", "sdtm") == {}
+
+        subject_index._local_indexes.clear()
+        with files_engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO p1_sdtm.dm VALUES ('01-001', 'A')")
+        assert get_subject_index(db_session, files_engine, "p1", "sdtm") == {}
+
+    def test_spellings_differing_in_case_are_one_subject(self, db_session, files_engine, version):
+        with files_engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO p1_sdtm.ae VALUES ('ABC-01', 'Headache')")
+            conn.exec_driver_sql("INSERT INTO p1_sdtm.dm VALUES ('abc-01', 'B')")
+        index = get_subject_index(db_session, files_engine, "p1", "sdtm")
+        assert index["ABC-01"] == {"AE", "DM"}
+        assert "abc-01" not in index
+        assert db_session.query(SubjectIndex).filter(SubjectIndex.SchemaName == "p1_sdtm").count() == 4
+
+    def test_concurrent_rebuild_uses_stored_rows(self, db_session, files_engine, version, monkeypatch):
+        rebuild = subject_index.refresh_subject_index
+
+        def rebuilt_elsewhere(db, engine, ProjectNumber, FolderName):
+            # Another worker commits the schema's rows while this one is scanning
+            rebuild(db, engine, ProjectNumber, FolderName)
+            subject_index._local_indexes.clear()
+            raise IntegrityError("INSERT INTO SubjectIndex", {}, Exception("duplicate key"))
+
+        monkeypatch.setattr(subject_index, "refresh_subject_index", rebuilt_elsewhere)
+        assert get_subject_index(db_session, files_engine, "p1", "sdtm")["01-001"] == {"AE", "DM"}
+
+    def test_find_subject_ignores_case_and_spaces(self):
+        index = {"01-001": frozenset({"DM"}), "ABC-01": frozenset({"DM"})}
+        assert find_subject(index, "01-001 ") == "01-001"
+        assert find_subject(index, "abc-01") == "ABC-01"
+        assert find_subject(index, "01-002") is None
+
+    def test_subjects_in_all_tables(self):
+        index = {"01-001": frozenset({"AE", "DM"}), "01-002": frozenset({"DM"})}
+        assert subjects_in_all(index, ["dm"]) == ["01-001", "01-002"]
+        assert subjects_in_all(index, ["dm", " ae "]) == ["01-001"]
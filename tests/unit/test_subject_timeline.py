@@ -0,0 +1,83 @@
+# app/tests/unit/test_subject_timeline.py
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+from app.models.user import SubjectTimeline
+from app.services import subject_timeline
+from app.services.subject_timeline import get_subject_timeline, refresh_subject_timelines
+
+
+@pytest.fixture()
+def files_engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    event.listen(engine, "connect", lambda conn, _: conn.execute("ATTACH DATABASE ':memory:' AS p1_sdtm"))
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE p1_sdtm.dm (ROWID INTEGER, USUBJID TEXT, RFSTDTC TEXT)")
+        conn.exec_driver_sql("CREATE TABLE p1_sdtm.ae (ROWID INTEGER, USUBJID TEXT, AEDECOD TEXT, AESTDTC TEXT, AEENDTC TEXT, AESEV TEXT, AESER TEXT)")
+        conn.exec_driver_sql("CREATE TABLE p1_sdtm.ex (ROWID INTEGER, USUBJID TEXT, EXTRT TEXT, EXSTDTC TEXT, EXENDTC TEXT, EXDOSE TEXT)")
+        conn.exec_driver_sql("CREATE TABLE p1_sdtm.ds (ROWID INTEGER, USUBJID TEXT, DSTERM TEXT, DSSTDTC TEXT)")
+        conn.exec_driver_sql("INSERT INTO p1_sdtm.dm VALUES (1, '01-001', '2024-01-10'), (2, '01-002', '2024-02-01')")
+        conn.exec_driver_sql(
+            "INSERT INTO p1_sdtm.ae VALUES (1, '01-001', 'Headache', '2024-01-12T08:30', '2024-01-14', 'MILD', 'N'), "
+            "(2, '01-001', 'Nausea', '2024-03-01', '', 'MODERATE', NULL), (3, '01-001', 'Rash', '2024-02', '', NULL, NULL), "
+            "(4, '01-002', 'Fatigue', '2024-02-03', '2024-02-04', 'MILD', 'N')"
+        )
+        conn.exec_driver_sql("INSERT INTO p1_sdtm.ex VALUES (1, '01-001', 'Drug A', '2024-01-10', '2024-01-10', '10'), (2, '01-001', 'Drug A', '2024-01-09', '2024-01-09', '10')")
+        conn.exec_driver_sql("INSERT INTO p1_sdtm.ds VALUES (1, '01-001', 'COMPLETED', '2024-04-01')")
+    return engine
+
+
+@pytest.fixture()
+def version(monkeypatch):
+    current = {"value": "1"}
+    monkeypatch.setattr(subject_timeline, "get_dataset_version", lambda ProjectNumber, FolderName: current["value"])
+    return current
+
+
+class TestSubjectTimeline:
+    def test_sorted_events_with_study_days(self, db_session, files_engine, version):
+        assert refresh_subject_timelines(db_session, files_engine, "p1", "sdtm") == 7
+        events = get_subject_timeline(db_session, files_engine, "p1", "sdtm", "01-001")
+        assert [(e["domain"], e["term"], e["startDay"]) for e in events] == [
+            ("EX", "Drug A", -1), ("EX", "Drug A", 1), ("AE", "Headache", 3), ("AE", "Nausea", 52),
+            ("DS", "COMPLETED", 83), ("AE", "Rash", None),
+        ]
+        headache = events[2]
+        assert headache["startDTC"] == "2024-01-12T08:30" and headache["startDate"] == "2024-01-12"
+        assert headache["endDay"] == 5 and headache["rowId"] == "1"
+        assert headache["detail"] == "AESEV=MILD; AESER=N"
+        assert events[0]["detail"] == "EXDOSE=10"
+
+    def test_window_and_domains(self, db_session, files_engine, version):
+        refresh_subject_timelines(db_session, files_engine, "p1", "sdtm")
+        window = get_subject_timeline(db_session, files_engine, "p1", "sdtm", "01-001", date(2024, 1, 13), date(2024, 3, 15))
+        # Headache ends in the window, Nausea is ongoing; the partial-date Rash is left out
+        assert [e["term"] for e in window] == ["Headache", "Nausea"]
+        later = get_subject_timeline(db_session, files_engine, "p1", "sdtm", "01-001", date(2024, 3, 20), None, ["ae", "ds"])
+        assert [e["term"] for e in later] == ["Nausea", "COMPLETED"]
+
+    def test_rebuilt_per_subject_when_missing_or_stale(self, db_session, files_engine, version):
+        assert [e["term"] for e in get_subject_timeline(db_session, files_engine, "p1", "sdtm", "01-002")] == ["Fatigue"]
+        assert db_session.query(SubjectTimeline).filter(SubjectTimeline.USUBJID == "01-001").count() == 0
+
+        with files_engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO p1_sdtm.ae VALUES (5, '01-002', 'Cough', '2024-02-10', NULL, NULL, NULL)")
+        assert [e["term"] for e in get_subject_timeline(db_session, files_engine, "p1", "sdtm", "01-002")] == ["Fatigue"]
+        version["value"] = "2"
+        assert [e["term"] for e in get_subject_timeline(db_session, files_engine, "p1", "sdtm", "01-002")] == ["Fatigue", "Cough"]
+
+    def test_subject_without_events_built_once(self, db_session, files_engine, version, monkeypatch):
+        calls = []
+        collect = subject_timeline.collect_timeline
+        monkeypatch.setattr(subject_timeline, "collect_timeline", lambda *args: calls.append(args) or collect(*args))
+        assert get_subject_timeline(db_session, files_engine, "p1", "sdtm", "01-009") == []
+        assert get_subject_timeline(db_session, files_engine, "p1", "sdtm", "01-009") == []
+        assert len(calls) == 1
+
+    def test_long_values_cut_to_column_length(self, db_session, files_engine, version):
+        with files_engine.begin() as conn:
+            conn.exec_driver_sql(f"INSERT INTO p1_sdtm.ae VALUES (6, '01-003', '{'X' * 600}', '2024-02-10T08:30:00.000000+01:00:00:00:00:00:00:00:00:00', NULL, NULL, NULL)")
+        (event,) = get_subject_timeline(db_session, files_engine, "p1", "sdtm", "01-003")
+        assert len(event["term"]) == 500
+        assert len(event["startDTC"]) == 50
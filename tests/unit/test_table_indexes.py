@@ -0,0 +1,38 @@
+# app/tests/unit/test_table_indexes.py
+from sqlalchemy import create_engine
+from app.core.config import settings
+from app.services.table_indexes import create_index_sql, index_report, lookup_keys, plan_table_indexes, provision_table_indexes
+
+
+class TestPlan:
+    def test_findings_domain(self):
+        plan = plan_table_indexes("lb", {"ROWID", "USUBJID", "LBCAT", "LBTEST", "LBDTC"})
+        assert plan == {
+            "CIX_LB_ROWID": {"type": "CLUSTERED", "keys": ["ROWID"]},
+            "IX_LB_USUBJID": {"type": "NONCLUSTERED", "keys": ["USUBJID", "LBCAT", "LBTEST"]},
+        }
+
+    def test_lookup_keys_per_domain(self):
+        assert lookup_keys("ae", {"USUBJID", "AEDECOD", "AETERM"}) == ["USUBJID", "AEDECOD"]
+        assert lookup_keys("adlb", {"USUBJID", "PARAMCD", "AVAL"}) == ["USUBJID", "PARAMCD"]
+        assert lookup_keys("dm", {"USUBJID", "ARM"}) == ["USUBJID"]
+
+    def test_columnstore_only_for_large_listed_tables(self, monkeypatch):
+        monkeypatch.setattr(settings, "INDEX_COLUMNSTORE_TABLES", "LB,VS")
+        monkeypatch.setattr(settings, "INDEX_COLUMNSTORE_MIN_ROWS", 1000)
+        assert "CCI_LB" in plan_table_indexes("lb", {"ROWID", "USUBJID"}, rows=5000)
+        assert "CIX_LB_ROWID" in plan_table_indexes("lb", {"ROWID", "USUBJID"}, rows=10)
+        assert "CIX_AE_ROWID" in plan_table_indexes("ae", {"ROWID", "USUBJID"}, rows=5000)
+
+    def test_create_index_sql(self):
+        assert create_index_sql("p1_sdtm", "lb", "CIX_LB_ROWID", {"type": "CLUSTERED", "keys": ["ROWID"]}, unique=True) == \
+            "CREATE UNIQUE CLUSTERED INDEX [CIX_LB_ROWID] ON [p1_sdtm].[lb] ([ROWID])"
+        assert create_index_sql("p1_sdtm", "lb", "CCI_LB", {"type": "CLUSTERED COLUMNSTORE", "keys": []}) == \
+            "CREATE CLUSTERED COLUMNSTORE INDEX [CCI_LB] ON [p1_sdtm].[lb]"
+
+
+class TestOtherDialects:
+    def test_sqlite_is_left_alone(self):
+        engine = create_engine("sqlite://")
+        assert provision_table_indexes(engine, "main")["status"] == "unsupported"
+        assert index_report(engine, "main")["status"] == "unsupported"
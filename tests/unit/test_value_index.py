@@ -0,0 +1,69 @@
+# app/tests/unit/test_value_index.py
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from app.services.value_index import ValueIndex, trigrams, collect_values, get_value_index, find_value_index, build_value_index_in_background
+
+
+VALUES = {
+    "AE.AEDECOD": ["HEADACHE", "NAUSEA", "HYPERTENSION", "DIZZINESS"],
+    "AE.AETOXGR": ["1", "2", "3"],
+    "LB.LBTEST": ["Alanine Aminotransferase", "Hemoglobin", "Glucose"],
+    "DS.DSDECOD": ["COMPLETED", "ADVERSE EVENT", "WITHDRAWAL BY SUBJECT"],
+}
+
+
+class TestValueIndex:
+    def test_trigrams_are_case_insensitive(self):
+        assert trigrams("Headache") == trigrams("HEADACHE")
+
+    def test_lookup_tolerates_plurals_and_typos(self):
+        index = ValueIndex(VALUES)
+        assert index.lookup("headaches")[0][:3] == ("AE", "AEDECOD", "HEADACHE")
+        assert index.lookup("hemoglobn")[0][2] == "Hemoglobin"
+
+    def test_resolve_maps_question_phrases(self):
+        hints = ValueIndex(VALUES).resolve("How many subjects withdrew due to an adverse event or had headaches?")
+        values = {(hint["column"], hint["value"]) for hint in hints}
+        assert ("AEDECOD", "HEADACHE") in values
+        assert ("DSDECOD", "ADVERSE EVENT") in values
+
+    def test_short_codes_are_not_fuzzy_matched(self):
+        assert ValueIndex(VALUES).resolve("grade 3 events") == []
+
+
+def sdtm_engine():
+    # In-memory SQLite keeps one connection per thread, so the attached schema persists
+    # One connection shared by all threads, so background builds see the attached schema
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.execute(text("ATTACH DATABASE ':memory:' AS p1_sdtm"))
+        conn.execute(text("CREATE TABLE p1_sdtm.ae (USUBJID TEXT, AEDECOD TEXT, AETERM TEXT)"))
+        conn.execute(text(
+            "INSERT INTO p1_sdtm.ae VALUES ('01', 'HEADACHE', 'head ache'), ('02', 'HEADACHE', 'headache'), "
+            "('03', 'NAUSEA', 'sick'), ('04', NULL, 'x')"
+        ))
+    return engine
+
+
+class TestCollectValues:
+    def test_distinct_values_of_configured_columns(self):
+        assert collect_values(sdtm_engine(), "p1_sdtm") == {"AE.AEDECOD": ["HEADACHE", "NAUSEA"]}
+
+    def test_index_is_built_once_per_dataset_version(self):
+        engine = sdtm_engine()
+        index = get_value_index(engine, "p1_sdtm", "v1")
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE p1_sdtm.ae"))
+        assert get_value_index(engine, "p1_sdtm", "v1") is index
+        assert get_value_index(engine, "p1_sdtm", "v2").values == {}
+
+    def test_lookup_never_builds(self):
+        engine = sdtm_engine()
+        assert find_value_index("p1_sdtm", "v3") is None
+        build_value_index_in_background(engine, "p1_sdtm", "v3")
+        for _ in range(100):
+            if find_value_index("p1_sdtm", "v3") is not None:
+                break
+            time.sleep(0.02)
+        assert find_value_index("p1_sdtm", "v3").values == {"AE.AEDECOD": ["HEADACHE", "NAUSEA"]}